@@ -1,8 +1,12 @@
+import concurrent.futures
+import hashlib
 import os
 import platform
 import re
 import subprocess
 import sys
+import threading
+import time
 
 HOST_OS = sys.platform
 if HOST_OS == 'win32':
@@ -103,6 +107,7 @@ class GPUTest(Program):
     }
 
     CONFIG_FILE = 'config.json'
+    TARGET_CACHE_FILE = 'target_cache.json'
 
     index = 0
     TARGET_INDEX_OS = index
@@ -120,10 +125,18 @@ class GPUTest(Program):
     TARGET_INDEX_SHARD_COUNT = index
     TARGET_INDEX_MAX = index
 
+    SHARD_INDEX_OP = 0
+    SHARD_INDEX_CMD = 1
+    SHARD_INDEX_RESULT_FILE = 2
+    SHARD_INDEX_OUTPUT_FILE = 3
+
     RESULT_FILE_SUFFIX = '.json'
     RESULT_FILE_PATTERN = r'^.*-(.*)%s$' % RESULT_FILE_SUFFIX
     MAX_FAIL_IN_REPORT = 30000
 
+    # Parallel shards append to exec.log from their threads
+    _exec_log_lock = threading.Lock()
+
     SEPARATOR = '|'
 
     def __init__(self):
@@ -157,6 +170,27 @@ class GPUTest(Program):
             help='run mesa revision, can be system, latest or any specific revision',
             default='system',
         )
+        parser.add_argument(
+            '--run-shard-jobs',
+            dest='run_shard_jobs',
+            help='max shards of a telemetry or blink target to run concurrently, keep it low to not overload the GPU',
+            type=int,
+            default=1,
+        )
+        parser.add_argument(
+            '--run-stall-timeout',
+            dest='run_stall_timeout',
+            help='minutes without test progress before a shard is killed, 0 to disable',
+            type=int,
+            default=0,
+        )
+        parser.add_argument(
+            '--run-max-fail-rate',
+            dest='run_max_fail_rate',
+            help='failure percentage that aborts a shard, 0 to disable',
+            type=int,
+            default=0,
+        )
         parser.add_argument('--dryrun', dest='dryrun', help='dryrun', action='store_true')
         parser.add_argument(
             '--dryrun-with-shard', dest='dryrun_with_shard', help='dryrun with shard', action='store_true'
@@ -167,6 +201,8 @@ examples:
 {0} {1} --sync --build --backup --upload --email
 {0} {1} --run --email
 {0} {1} --run --location=source --email
+{0} {1} --run --run-shard-jobs 2
+{0} {1} --run --run-stall-timeout 20 --run-max-fail-rate 50
 '''.format(
             Util.PYTHON, parser.prog
         )
@@ -183,6 +219,7 @@ examples:
         self.result_dir = '%s/%s/%s' % (ScriptRepo.IGNORE_DIR, self.GPUTEST_FOLDER, self.timestamp)
         Util.ensure_dir(self.result_dir)
         self.exec_log = '%s/exec.log' % self.result_dir
+        self.progress_file = '%s/progress.jsonl' % self.result_dir
         Util.ensure_nofile(self.exec_log)
         Util.append_file(self.exec_log, 'OS%s%s' % (self.SEPARATOR, Util.HOST_OS_RELEASE))
         self.targets = []
@@ -484,8 +521,18 @@ examples:
             shard_count = int(self.os_targets[target_index][self.TARGET_INDEX_SHARD_COUNT])
             if real_type in ['gtest_angle', 'gtest_chrome']:
                 shard_count = 1
+            if args.dryrun and not args.dryrun_with_shard:
+                run_shard_count = 1
+            else:
+                run_shard_count = shard_count
+            # Shards of the same target only run side by side when they don't share an output location
+            if real_type in ['telemetry_gpu_integration_test', 'webgpu_blink_web_tests']:
+                shard_jobs = min(args.run_shard_jobs, run_shard_count)
+            else:
+                shard_jobs = 1
 
-            for shard_index in range(shard_count):
+            shards = []
+            for shard_index in range(run_shard_count):
                 shard_args = ''
                 op = '%s' % target_index
 
@@ -501,33 +548,72 @@ examples:
                     shard_args += ' %s=%s' % (output_arg, result_file)
                     Util.ensure_file(result_file)
 
+                if real_type == 'gtest_angle':
+                    output_file = '%s/out/%s/output%s' % (
+                        project_run_root_dir,
+                        self.build_type_cap,
+                        self.RESULT_FILE_SUFFIX,
+                    )
+                elif real_type == 'webgpu_blink_web_tests':
+                    results_dir = '%s/out/%s/layout-test-results' % (project_run_root_dir, self.build_type_cap)
+                    if shard_jobs > 1:
+                        results_dir += '-%s' % op
+                        shard_args += ' --results-directory=%s' % results_dir
+                    output_file = '%s/full_results%s' % (results_dir, self.RESULT_FILE_SUFFIX)
+                else:
+                    output_file = ''
+
                 cmd = '%s --run-args="%s%s"' % (config_cmd, config_args, shard_args)
-                timer = Timer()
-                self._execute(cmd, exit_on_error=False)
-                self._log_exec(timer.stop(), 'Run %s' % op, cmd)
-
-                if real_type in ['gtest_angle', 'webgpu_blink_web_tests']:
-                    if real_type == 'gtest_angle':
-                        output_file = '%s/out/%s/output%s' % (
-                            project_run_root_dir,
-                            self.build_type_cap,
-                            self.RESULT_FILE_SUFFIX,
-                        )
-                    elif real_type == 'webgpu_blink_web_tests':
-                        output_file = '%s/out/%s/layout-test-results/full_results%s' % (
-                            project_run_root_dir,
-                            self.build_type_cap,
-                            self.RESULT_FILE_SUFFIX,
-                        )
-                    if os.path.exists(output_file):
-                        shutil.move(output_file, result_file)
-                    else:
-                        Util.ensure_file(result_file)
-                if args.dryrun and not args.dryrun_with_shard:
-                    break
+                shards.append([op, cmd, result_file, output_file])
+
+            self._run_shards(shards, shard_jobs)
 
         self._log_exec(all_timer.stop(), 'Total Run')
 
+    def _run_shards(self, shards, shard_jobs):
+        if shard_jobs > 1:
+            Util.info('Run %s shards with %s jobs' % (len(shards), shard_jobs))
+            with concurrent.futures.ThreadPoolExecutor(max_workers=shard_jobs) as executor:
+                list(executor.map(self._run_shard, shards, [True] * len(shards)))
+        else:
+            for shard in shards:
+                self._run_shard(shard, False)
+
+    def _run_shard(self, shard, parallel):
+        op = shard[self.SHARD_INDEX_OP]
+        cmd = shard[self.SHARD_INDEX_CMD]
+        result_file = shard[self.SHARD_INDEX_RESULT_FILE]
+        output_file = shard[self.SHARD_INDEX_OUTPUT_FILE]
+
+        supervisor = TestSupervisor(
+            op,
+            self.progress_file,
+            stall_timeout=self.args.run_stall_timeout,
+            max_fail_rate=self.args.run_max_fail_rate,
+            watch_files=[output_file or result_file],
+        )
+        start = time.strftime('%Y-%m-%d %H:%M:%S')
+        timer = Timer()
+        if parallel:
+            # Interleaved console output is unreadable, so each shard gets its own log
+            log_file = '%s/%s.log' % (self.result_dir, op)
+            Util.info('Start %s, log: %s' % (op, log_file))
+        else:
+            log_file = ''
+            Util.info(cmd)
+        _, status = supervisor.run(cmd, log_file=log_file)
+        time_info = timer.stop()
+        end = time.strftime('%Y-%m-%d %H:%M:%S')
+
+        if output_file:
+            if os.path.exists(output_file):
+                shutil.move(output_file, result_file)
+            else:
+                Util.ensure_file(result_file)
+
+        # Logged as soon as the shard is done, so a crash or Ctrl-C later still leaves its record
+        self._log_exec(time_info, 'Run %s' % op, cmd, start=start, end=end, status=status)
+
     def batch(self):
         self.sync()
         self.build()
@@ -582,7 +668,7 @@ examples:
     </tr>'''
 
         regression_count = 0
-        for line in open(self.exec_log):
+        for line in sorted(open(self.exec_log), key=self._get_report_order):
             fields = line.split(self.SEPARATOR)
             name = fields[0]
             if re.match('run', name, re.I):
@@ -611,6 +697,9 @@ examples:
 
                 regression_count += len(result.pass_fail)
                 time = fields[1]
+                # A shard killed by the supervisor has partial results, make it visible
+                if len(fields) > 5 and fields[5].strip() != TestSupervisor.STATUS_DONE:
+                    time = '%s (%s)' % (time, fields[5].strip())
                 pass_fail_info = '%s<p>%s' % (
                     len(result.pass_fail),
                     '<p>'.join(result.pass_fail[: self.MAX_FAIL_IN_REPORT]),
@@ -662,11 +751,7 @@ examples:
         self._send_email(subject, html)
 
     def _update_target(self):
-        targets = []
-        recorded_os_virtual_name = []
-        if self.args.debug:
-            recorded_virtual_name = []
-
+        config_files = []
         for project in self.projects:
             if self.args.location == 'source':
                 config_dir = self.PROJECT_INFO[project][self.PROJECT_INFO_INDEX_ROOT_DIR]
@@ -679,126 +764,44 @@ examples:
 
                 config_dir = '%s/%s/%s' % (Util.BACKUP_DIR, relative_path, rev_name)
 
-            config_files = self.PROJECT_INFO[project][self.PROJECT_INFO_INDEX_CONFIG_FILES]
-            for config_file in config_files:
-                config_file = '%s/%s' % (config_dir, config_file)
-                configs = Util.load_json(config_file)
-                for config in configs:
-                    if not re.search('intel', config, re.IGNORECASE):
-                        continue
-                    if re.search('angle-chromium', config):
-                        continue
-
-                    if re.search('linux', config, re.IGNORECASE):
-                        target_os = Util.LINUX
-                    elif re.search('win10', config, re.IGNORECASE):
-                        target_os = Util.WINDOWS
-                    else:
-                        continue
-
-                    if self.args.debug:
-                        Util.debug(config)
-
-                    target_types = configs[config]
-                    for target_type in target_types:
-                        for target_detail in target_types[target_type]:
-                            if 'name' in target_detail:
-                                tmp_name = target_detail['name']
-                            else:
-                                tmp_name = ''
-                            if 'test' in target_detail:
-                                tmp_test = target_detail['test']
-                            else:
-                                tmp_test = ''
-                            if 'isolate_name' in target_detail:
-                                tmp_isolate_name = target_detail['isolate_name']
-                            else:
-                                tmp_isolate_name = ''
-
-                            virtual_name = tmp_name or tmp_test
-                            real_name = tmp_isolate_name or tmp_test or tmp_name
-
-                            if virtual_name not in self.VIRTUAL_NAME_INFO.keys():
-                                continue
-
-                            if self.args.debug:
-                                Util.debug(virtual_name)
-
-                            if self.args.debug and virtual_name not in recorded_virtual_name:
-                                recorded_virtual_name.append(virtual_name)
-
-                            if [target_os, virtual_name] in recorded_os_virtual_name:
-                                continue
-                            else:
-                                recorded_os_virtual_name.append([target_os, virtual_name])
-
-                            # init
-                            target = [0] * (self.TARGET_INDEX_MAX + 1)
-                            target[self.TARGET_INDEX_OS] = target_os
-                            target[self.TARGET_INDEX_PROJECT] = project
-                            target[self.TARGET_INDEX_VIRTUAL_NAME] = virtual_name
-                            target[self.TARGET_INDEX_REAL_NAME] = real_name
-                            target[self.TARGET_INDEX_REAL_TYPE] = self.VIRTUAL_NAME_INFO[virtual_name][
-                                self.VIRTUAL_NAME_INFO_INDEX_REAL_TYPE
-                            ]
-                            if 'args' in target_detail:
-                                target_run_args = target_detail['args']
-                            else:
-                                target_run_args = []
-                            target[self.TARGET_INDEX_RUN_ARGS] = target_run_args
-                            if 'swarming' in target_detail and 'shards' in target_detail['swarming']:
-                                target_shard_count = target_detail['swarming']['shards']
-                            else:
-                                target_shard_count = 1
-                            target[self.TARGET_INDEX_SHARD_COUNT] = target_shard_count
-                            targets.append(target)
-
-                            # dawn_end2end_tests suppressed tests
-                            if target[self.TARGET_INDEX_VIRTUAL_NAME] == 'dawn_end2end_tests':
-                                target_runsuppressed = [0] * (self.TARGET_INDEX_MAX + 1)
-                                target_runsuppressed[self.TARGET_INDEX_OS] = target_os
-                                target_runsuppressed[self.TARGET_INDEX_PROJECT] = 'chromium'
-                                target_runsuppressed[self.TARGET_INDEX_VIRTUAL_NAME] = virtual_name + '_runsuppressed'
-                                target_runsuppressed[self.TARGET_INDEX_REAL_NAME] = real_name
-                                target_runsuppressed[self.TARGET_INDEX_REAL_TYPE] = self.VIRTUAL_NAME_INFO[
-                                    virtual_name
-                                ][self.VIRTUAL_NAME_INFO_INDEX_REAL_TYPE]
-                                target_runsuppressed[self.TARGET_INDEX_RUN_ARGS] = target_run_args + [
-                                    '--run-suppressed-tests',
-                                    '--bot-mode',
-                                ]
-                                target_runsuppressed[self.TARGET_INDEX_SHARD_COUNT] = target_shard_count
-                                targets.append(target_runsuppressed)
-
-        targets = sorted(
-            targets,
-            key=operator.itemgetter(
-                self.TARGET_INDEX_OS,
-                self.TARGET_INDEX_PROJECT,
-                self.TARGET_INDEX_REAL_TYPE,
-                self.TARGET_INDEX_VIRTUAL_NAME,
-            ),
-        )
-        Util.dump_json('%s/%s/config.json' % (ScriptRepo.IGNORE_DIR, self.GPUTEST_FOLDER), targets)
+            for config_file in self.PROJECT_INFO[project][self.PROJECT_INFO_INDEX_CONFIG_FILES]:
+                config_files.append([project, '%s/%s' % (config_dir, config_file)])
+
+        # The parsed table only depends on the content of the config files and VIRTUAL_NAME_INFO,
+        # so it's reused as long as their hash doesn't change.
+        config_contents = []
+        hasher = hashlib.sha1(json.dumps(self.VIRTUAL_NAME_INFO, sort_keys=True).encode('utf-8'))
+        for project, config_file in config_files:
+            with open(config_file, 'rb') as f:
+                content = f.read()
+            config_contents.append([project, content])
+            hasher.update(('%s|%s|' % (project, config_file)).encode('utf-8'))
+            hasher.update(hashlib.sha1(content).digest())
+        cache_key = hasher.hexdigest()
+
+        cache_file = '%s/%s/%s' % (ScriptRepo.IGNORE_DIR, self.GPUTEST_FOLDER, self.TARGET_CACHE_FILE)
+        targets = None
+        if not self.args.debug and os.path.exists(cache_file):
+            try:
+                with open(cache_file, encoding='utf-8') as f:
+                    cache = json.load(f)
+                if cache.get('key') == cache_key:
+                    targets = cache['targets']
+            except (OSError, ValueError, KeyError):
+                targets = None
+
+        if targets is None:
+            targets = self._parse_targets(config_contents)
+            Util.dump_json('%s/%s/%s' % (ScriptRepo.IGNORE_DIR, self.GPUTEST_FOLDER, self.CONFIG_FILE), targets)
+            Util.dump_json(cache_file, {'key': cache_key, 'targets': targets})
         self.targets = targets
-
-        if self.args.debug:
-            Util.debug(len(recorded_virtual_name))
-            recorded_virtual_name = sorted(recorded_virtual_name)
-            for virtual_name in recorded_virtual_name:
-                Util.debug(virtual_name)
-            for target in targets:
-                Util.debug(target)
+        self._index_targets(targets)
 
         target_os = self.target_os
         if target_os == 'default':
             target_os = Util.HOST_OS
 
-        os_targets = []
-        for target in self.targets:
-            if target[self.TARGET_INDEX_OS] == target_os:
-                os_targets.append(target)
-        self.os_targets = os_targets
+        self.os_targets = self.targets_by_os.get(target_os, [])
 
         target_indexes = []
         arg_target = self.args.target
@@ -816,12 +819,146 @@ examples:
         target_indexes = sorted(target_indexes)
         self.target_indexes = target_indexes
 
-    def _log_exec(self, time, op, cmd=''):
+    def _parse_targets(self, config_contents):
+        targets = []
+        recorded_os_virtual_name = set()
+        if self.args.debug:
+            recorded_virtual_name = set()
+
+        for project, content in config_contents:
+            configs = json.loads(content)
+            for config in configs:
+                if not re.search('intel', config, re.IGNORECASE):
+                    continue
+                if re.search('angle-chromium', config):
+                    continue
+
+                if re.search('linux', config, re.IGNORECASE):
+                    target_os = Util.LINUX
+                elif re.search('win10', config, re.IGNORECASE):
+                    target_os = Util.WINDOWS
+                else:
+                    continue
+
+                if self.args.debug:
+                    Util.debug(config)
+
+                target_types = configs[config]
+                for target_type in target_types:
+                    for target_detail in target_types[target_type]:
+                        if 'name' in target_detail:
+                            tmp_name = target_detail['name']
+                        else:
+                            tmp_name = ''
+                        if 'test' in target_detail:
+                            tmp_test = target_detail['test']
+                        else:
+                            tmp_test = ''
+                        if 'isolate_name' in target_detail:
+                            tmp_isolate_name = target_detail['isolate_name']
+                        else:
+                            tmp_isolate_name = ''
+
+                        virtual_name = tmp_name or tmp_test
+                        real_name = tmp_isolate_name or tmp_test or tmp_name
+
+                        if virtual_name not in self.VIRTUAL_NAME_INFO:
+                            continue
+
+                        if self.args.debug:
+                            Util.debug(virtual_name)
+                            recorded_virtual_name.add(virtual_name)
+
+                        if (target_os, virtual_name) in recorded_os_virtual_name:
+                            continue
+                        recorded_os_virtual_name.add((target_os, virtual_name))
+
+                        # init
+                        target = [0] * (self.TARGET_INDEX_MAX + 1)
+                        target[self.TARGET_INDEX_OS] = target_os
+                        target[self.TARGET_INDEX_PROJECT] = project
+                        target[self.TARGET_INDEX_VIRTUAL_NAME] = virtual_name
+                        target[self.TARGET_INDEX_REAL_NAME] = real_name
+                        target[self.TARGET_INDEX_REAL_TYPE] = self.VIRTUAL_NAME_INFO[virtual_name][
+                            self.VIRTUAL_NAME_INFO_INDEX_REAL_TYPE
+                        ]
+                        if 'args' in target_detail:
+                            target_run_args = target_detail['args']
+                        else:
+                            target_run_args = []
+                        target[self.TARGET_INDEX_RUN_ARGS] = target_run_args
+                        if 'swarming' in target_detail and 'shards' in target_detail['swarming']:
+                            target_shard_count = target_detail['swarming']['shards']
+                        else:
+                            target_shard_count = 1
+                        target[self.TARGET_INDEX_SHARD_COUNT] = target_shard_count
+                        targets.append(target)
+
+                        # dawn_end2end_tests suppressed tests
+                        if target[self.TARGET_INDEX_VIRTUAL_NAME] == 'dawn_end2end_tests':
+                            target_runsuppressed = [0] * (self.TARGET_INDEX_MAX + 1)
+                            target_runsuppressed[self.TARGET_INDEX_OS] = target_os
+                            target_runsuppressed[self.TARGET_INDEX_PROJECT] = 'chromium'
+                            target_runsuppressed[self.TARGET_INDEX_VIRTUAL_NAME] = virtual_name + '_runsuppressed'
+                            target_runsuppressed[self.TARGET_INDEX_REAL_NAME] = real_name
+                            target_runsuppressed[self.TARGET_INDEX_REAL_TYPE] = self.VIRTUAL_NAME_INFO[virtual_name][
+                                self.VIRTUAL_NAME_INFO_INDEX_REAL_TYPE
+                            ]
+                            target_runsuppressed[self.TARGET_INDEX_RUN_ARGS] = target_run_args + [
+                                '--run-suppressed-tests',
+                                '--bot-mode',
+                            ]
+                            target_runsuppressed[self.TARGET_INDEX_SHARD_COUNT] = target_shard_count
+                            targets.append(target_runsuppressed)
+
+        targets = sorted(
+            targets,
+            key=operator.itemgetter(
+                self.TARGET_INDEX_OS,
+                self.TARGET_INDEX_PROJECT,
+                self.TARGET_INDEX_REAL_TYPE,
+                self.TARGET_INDEX_VIRTUAL_NAME,
+            ),
+        )
+
+        if self.args.debug:
+            Util.debug(len(recorded_virtual_name))
+            for virtual_name in sorted(recorded_virtual_name):
+                Util.debug(virtual_name)
+            for target in targets:
+                Util.debug(target)
+
+        return targets
+
+    def _index_targets(self, targets):
+        self.targets_by_os = {}
+        self.targets_by_project = {}
+        self.targets_by_virtual_name = {}
+        for target in targets:
+            self.targets_by_os.setdefault(target[self.TARGET_INDEX_OS], []).append(target)
+            self.targets_by_project.setdefault(target[self.TARGET_INDEX_PROJECT], []).append(target)
+            self.targets_by_virtual_name.setdefault(target[self.TARGET_INDEX_VIRTUAL_NAME], []).append(target)
+
+    def _get_report_order(self, line):
+        # Parallel shards log as they finish, the report lists them by target and shard
+        name = line.split(self.SEPARATOR)[0]
+        if not re.match('run', name, re.I):
+            return [-1, '']
+        index = name[4:].split('-')[0]
+        return [int(index) if index.isdigit() else -1, name]
+
+    def _log_exec(self, time, op, cmd='', start='', end='', status=''):
         info = '%s%s%s' % (op, self.SEPARATOR, time)
         if cmd:
             info += '%s%s' % (self.SEPARATOR, cmd)
+        # Extra fields go after the ones _report reads
+        if start or end:
+            info += '%s%s%s%s' % (self.SEPARATOR, start, self.SEPARATOR, end)
+        if status:
+            info += '%s%s' % (self.SEPARATOR, status)
         Util.info(info)
-        Util.append_file(self.exec_log, info)
+        with self._exec_log_lock:
+            Util.append_file(self.exec_log, info)
 
     def _parse_result(self, result_file, verbose=False):
         file_name = os.path.basename(result_file)
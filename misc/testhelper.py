@@ -1,3 +1,12 @@
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import threading
+import time
+
 from util.base import *
 
 
@@ -289,6 +298,8 @@ class TestResult:
         self.fail_pass = []
         self.fail_fail = []
         self.pass_pass = []
+        # Test name -> duration in seconds, for the formats that record it
+        self.times = {}
 
         if not result_file or not real_type:
             return
@@ -302,6 +313,8 @@ class TestResult:
 
             elif real_type == 'gtest_chrome':
                 for key, val in json_result['per_iteration_data'][0].items():
+                    if 'elapsed_time_ms' in val[0]:
+                        self.times[key] = val[0]['elapsed_time_ms'] / 1000.0
                     if val[0]['status'] == 'SUCCESS':
                         self.pass_pass.append(key)
                     elif val[0]['status'] == 'FAILURE':
@@ -322,6 +335,9 @@ class TestResult:
                     suite_name = test_suite['name']
                     for test in test_suite['testsuite']:
                         test_name = '%s.%s' % (suite_name, test['name'])
+                        # gtest records the duration as a string like '0.012s'
+                        if 'time' in test:
+                            self.times[test_name] = float(str(test['time']).rstrip('s'))
                         if 'failures' in test:
                             self.pass_fail.append(test_name)
                         else:
@@ -334,6 +350,11 @@ class TestResult:
             return str(val).endswith('PASS')
 
         if 'expected' in val and 'actual' in val:
+            # times has one entry per try, time is the duration of the last one
+            if 'times' in val and val['times']:
+                self.times[path] = val['times'][-1]
+            elif 'time' in val:
+                self.times[path] = val['time']
             expected_pass = _is_pass(val['expected'])
             actual_pass = _is_pass(val['actual'])
             if not expected_pass and not actual_pass:
@@ -347,3 +368,190 @@ class TestResult:
         else:
             for new_key, new_val in val.items():
                 self._parse_result(new_key, new_val, '%s/%s' % (path, new_key))
+
+
+class TestSupervisor:
+    """Run a test command while tailing its output, reporting progress and aborting hung or broken runs."""
+
+    # [done/total] lines printed by typ (telemetry, blink web tests) and the Chromium test launcher
+    PROGRESS_PATTERN = re.compile(r'^\[(\d+)/(\d+)\]\s+(\S+)(.*)$')
+    PROGRESS_FAIL_KEYWORDS = ['failed unexpectedly', 'FAILED', 'FAILURE', 'CRASH', 'TIMEOUT', 'TIMED OUT']
+    # Plain gtest output, used by ANGLE and standalone Dawn
+    GTEST_TOTAL_PATTERN = re.compile(r'^\[=+\] Running (\d+) tests? from')
+    GTEST_OK_PATTERN = re.compile(r'^\[\s+OK\s+\] \S+ \(\d+ ms\)')
+    GTEST_FAILED_PATTERN = re.compile(r'^\[\s+FAILED\s+\] \S+ \(\d+ ms\)')
+
+    STATUS_DONE = 'done'
+    STATUS_STALLED = 'stalled'
+    STATUS_ABORTED = 'aborted'
+
+    # Shards may be supervised from several threads and share one progress file
+    _progress_lock = threading.Lock()
+
+    def __init__(
+        self, name, progress_file, stall_timeout=0, max_fail_rate=0, min_tests=20, interval=30, watch_files=None
+    ):
+        """
+        Args:
+            name: Name of the run in progress events
+            progress_file: JSONL file the progress events are appended to
+            stall_timeout: Minutes without progress before the run is killed, 0 to disable
+            max_fail_rate: Failure percentage that aborts the run, 0 to disable
+            min_tests: Finished tests needed before the failure rate is checked
+            interval: Seconds between two progress events
+            watch_files: Result files whose growth also counts as progress
+        """
+        self.name = name
+        self.progress_file = progress_file
+        self.stall_timeout = stall_timeout * 60
+        self.max_fail_rate = max_fail_rate
+        self.min_tests = min_tests
+        self.interval = interval
+        self.watch_files = watch_files or []
+
+        self.done = 0
+        self.total = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+        self._has_progress = False
+        self._last_activity = 0
+        self._watch_sizes = {}
+
+    def run(self, cmd, log_file=''):
+        """Run cmd in a shell and return (return code, status)."""
+        start_time = time.time()
+        self._last_activity = start_time
+        if Util.HOST_OS == Util.WINDOWS:
+            process = subprocess.Popen(
+                cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, errors='replace'
+            )
+        else:
+            # A new session lets the whole process group be killed, not only the shell
+            process = subprocess.Popen(
+                cmd,
+                shell=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                errors='replace',
+                start_new_session=True,
+            )
+
+        if log_file:
+            output = open(log_file, 'w', encoding='utf-8')
+        else:
+            output = sys.stdout
+        reader = threading.Thread(target=self._read_output, args=(process, output), daemon=True)
+        reader.start()
+
+        status = self.STATUS_DONE
+        last_event_time = start_time
+        while True:
+            try:
+                process.wait(timeout=1)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+
+            now = time.time()
+            self._check_watch_files(now)
+            if now - last_event_time >= self.interval:
+                self._emit('progress', start_time)
+                last_event_time = now
+
+            if self.stall_timeout and now - self._last_activity > self.stall_timeout:
+                Util.warning('%s made no progress in %s minutes, killing it' % (self.name, self.stall_timeout // 60))
+                status = self.STATUS_STALLED
+            elif self.max_fail_rate and self.done >= self.min_tests and self._fail_rate() > self.max_fail_rate:
+                Util.warning(
+                    '%s failure rate %.1f%% exceeds %s%%, aborting it' % (self.name, self._fail_rate(), self.max_fail_rate)
+                )
+                status = self.STATUS_ABORTED
+            if status != self.STATUS_DONE:
+                self._kill(process)
+                break
+
+        # A grandchild may keep the pipe open after the kill, the reader then closes the log when the pipe ends
+        reader.join(timeout=10)
+        self._emit(status, start_time)
+        return process.returncode, status
+
+    def _read_output(self, process, output):
+        try:
+            for line in process.stdout:
+                output.write(line)
+                output.flush()
+                self._parse_line(line.strip())
+        finally:
+            if output is not sys.stdout:
+                output.close()
+
+    def _parse_line(self, line):
+        with self._lock:
+            match = self.PROGRESS_PATTERN.match(line)
+            if match:
+                self.done = int(match.group(1))
+                self.total = int(match.group(2))
+                for keyword in self.PROGRESS_FAIL_KEYWORDS:
+                    if keyword in match.group(4):
+                        self.failures += 1
+                        break
+                self._has_progress = True
+                self._last_activity = time.time()
+                return
+
+            match = self.GTEST_TOTAL_PATTERN.match(line)
+            if match:
+                self.total = int(match.group(1))
+            elif self.GTEST_OK_PATTERN.match(line) or self.GTEST_FAILED_PATTERN.match(line):
+                self.done += 1
+                if self.GTEST_FAILED_PATTERN.match(line):
+                    self.failures += 1
+                self._has_progress = True
+                self._last_activity = time.time()
+            elif not self._has_progress:
+                # Until the output format is recognized, any output means the run is alive
+                self._last_activity = time.time()
+
+    def _check_watch_files(self, now):
+        for watch_file in self.watch_files:
+            try:
+                size = os.path.getsize(watch_file)
+            except OSError:
+                continue
+            if self._watch_sizes.get(watch_file) != size:
+                self._watch_sizes[watch_file] = size
+                self._last_activity = now
+
+    def _fail_rate(self):
+        if not self.done:
+            return 0.0
+        return self.failures * 100.0 / self.done
+
+    def _emit(self, event, start_time):
+        elapsed = time.time() - start_time
+        record = {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'name': self.name,
+            'event': event,
+            'done': self.done,
+            'total': self.total,
+            'failures': self.failures,
+            'tests_per_second': round(self.done / elapsed, 3) if elapsed > 0 else 0.0,
+            'elapsed': round(elapsed, 1),
+        }
+        with self._progress_lock:
+            with open(self.progress_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + '\n')
+
+    def _kill(self, process):
+        if Util.HOST_OS == Util.WINDOWS:
+            subprocess.call(
+                'taskkill /F /T /PID %s' % process.pid, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+        else:
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except OSError:
+                pass
+        process.wait()
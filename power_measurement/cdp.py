@@ -0,0 +1,297 @@
+"""Minimal asyncio Chrome DevTools Protocol client, with nothing but the standard library.
+
+One websocket connection to the browser carries any number of commands at once, matched to their responses by id,
+and events, which go to the callbacks subscribed to them. Page targets are reached through flat sessions on the same
+connection, so tracing the browser and instrumenting its pages can run concurrently.
+
+    async with CdpClient(ws_url) as client:
+        page = await client.new_page('https://example.com')
+        page.on('Page.loadEventFired', lambda params: print('loaded'))
+        await page.send('Page.enable')
+"""
+
+import asyncio
+import base64
+import hashlib
+import inspect
+import json
+import logging
+import os
+import struct
+import urllib.parse
+import urllib.request
+
+logger = logging.getLogger(__name__)
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+OPCODE_CONTINUATION = 0x0
+OPCODE_TEXT = 0x1
+OPCODE_BINARY = 0x2
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+
+
+class CdpError(Exception):
+    """A command failed, with the error the browser returned."""
+
+    def __init__(self, method, error):
+        super().__init__(f'{method} failed: {error.get("message", error)}')
+        self.method = method
+        self.error = error
+
+
+def get_browser_ws_url(address, timeout=5):
+    """Return the browser websocket URL of a DevTools address (host:port), as ChromeDriver reports it."""
+    with urllib.request.urlopen(f'http://{address}/json/version', timeout=timeout) as response:
+        return json.loads(response.read().decode('utf-8'))['webSocketDebuggerUrl']
+
+
+class WebSocket:
+    """Client side of RFC 6455 over asyncio streams, only what DevTools needs: text messages, pings and close."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, url, timeout=10):
+        parts = urllib.parse.urlsplit(url)
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(parts.hostname, parts.port or 80), timeout)
+        key = base64.b64encode(os.urandom(16)).decode('ascii')
+        path = parts.path + (f'?{parts.query}' if parts.query else '')
+        # No Origin header, DevTools refuses websocket connections from origins it doesn't allow
+        writer.write((f'GET {path} HTTP/1.1\r\n'
+                      f'Host: {parts.netloc}\r\n'
+                      'Upgrade: websocket\r\n'
+                      'Connection: Upgrade\r\n'
+                      f'Sec-WebSocket-Key: {key}\r\n'
+                      'Sec-WebSocket-Version: 13\r\n\r\n').encode('ascii'))
+        await writer.drain()
+        head = (await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), timeout)).decode('latin-1')
+        status, *header_lines = head.split('\r\n')
+        if ' 101 ' not in f'{status} ':
+            writer.close()
+            raise ConnectionError(f'Websocket handshake with {url} failed: {status}')
+        headers = {name.strip().lower(): value.strip() for name, _, value in (line.partition(':') for line in header_lines if line)}
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode('ascii')).digest()).decode('ascii')
+        if headers.get('sec-websocket-accept') != accept:
+            writer.close()
+            raise ConnectionError(f'Websocket handshake with {url} failed: bad Sec-WebSocket-Accept')
+        return cls(reader, writer)
+
+    async def send(self, text, opcode=OPCODE_TEXT):
+        payload = text.encode('utf-8') if isinstance(text, str) else text
+        length = len(payload)
+        if length < 126:
+            header = struct.pack('!BB', 0x80 | opcode, 0x80 | length)
+        elif length < 65536:
+            header = struct.pack('!BBH', 0x80 | opcode, 0x80 | 126, length)
+        else:
+            header = struct.pack('!BBQ', 0x80 | opcode, 0x80 | 127, length)
+        # Clients must mask what they send, XOR-ing as one big integer is much faster than byte by byte
+        mask = os.urandom(4)
+        repeated = (mask * (length // 4 + 1))[:length]
+        masked = (int.from_bytes(payload, 'big') ^ int.from_bytes(repeated, 'big')).to_bytes(length, 'big')
+        self.writer.write(header + mask + masked)
+        await self.writer.drain()
+
+    async def receive(self):
+        """Return the next text message, or None once the connection is closed."""
+        fragments = []
+        while True:
+            first, second = await self.reader.readexactly(2)
+            opcode = first & 0x0F
+            length = second & 0x7F
+            if length == 126:
+                length = struct.unpack('!H', await self.reader.readexactly(2))[0]
+            elif length == 127:
+                length = struct.unpack('!Q', await self.reader.readexactly(8))[0]
+            mask = await self.reader.readexactly(4) if second & 0x80 else None
+            payload = await self.reader.readexactly(length)
+            if mask:
+                repeated = (mask * (length // 4 + 1))[:length]
+                payload = (int.from_bytes(payload, 'big') ^ int.from_bytes(repeated, 'big')).to_bytes(length, 'big')
+
+            if opcode == OPCODE_PING:
+                await self.send(payload, OPCODE_PONG)
+            elif opcode == OPCODE_CLOSE:
+                return None
+            elif opcode in [OPCODE_TEXT, OPCODE_BINARY, OPCODE_CONTINUATION]:
+                fragments.append(payload)
+                if first & 0x80:
+                    return b''.join(fragments).decode('utf-8')
+
+    async def close(self):
+        try:
+            await self.send(struct.pack('!H', 1000), OPCODE_CLOSE)
+        except (ConnectionError, RuntimeError):
+            pass
+        self.writer.close()
+
+
+class CdpSession:
+    """Commands and events of one target, over a flat session of the browser connection."""
+
+    def __init__(self, client, session_id, target_id):
+        self.client = client
+        self.session_id = session_id
+        self.target_id = target_id
+
+    async def send(self, method, params=None, timeout=None):
+        return await self.client.send(method, params, timeout, self.session_id)
+
+    def on(self, method, callback):
+        self.client.on(method, callback, self.session_id)
+
+    def off(self, method, callback):
+        self.client.off(method, callback, self.session_id)
+
+    def wait_for(self, method):
+        return self.client.wait_for(method, self.session_id)
+
+
+class CdpClient:
+    """A DevTools connection to the browser.
+
+    Commands may be sent from concurrent tasks, each awaits its own response. Events go to the callbacks subscribed
+    with on(), plain functions or coroutine functions, and to the futures of wait_for(). Once the connection is lost,
+    pending and later commands and waits fail with the reason instead of waiting forever.
+    """
+
+    def __init__(self, ws_url):
+        self.ws_url = ws_url
+        self.websocket = None
+        self.receiver = None
+        self.last_id = 0
+        # id -> [method, future]
+        self.pending = {}
+        # (session id, method) -> [callback, ...]
+        self.listeners = {}
+        # (session id, method) -> [future, ...]
+        self.waiters = {}
+        # Why the connection is unusable, once it is
+        self.error = None
+
+    async def connect(self, timeout=10):
+        self.websocket = await WebSocket.connect(self.ws_url, timeout)
+        self.receiver = asyncio.ensure_future(self._receive())
+        return self
+
+    async def close(self):
+        if self.receiver:
+            self.receiver.cancel()
+        if self.websocket:
+            await self.websocket.close()
+        self._fail_pending(ConnectionError('The DevTools connection is closed'))
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def send(self, method, params=None, timeout=None, session_id=None):
+        """Send a command and return its result. Raise CdpError if the browser returns an error, and the reason of the
+        failure if the connection is lost.
+        """
+        if self.error:
+            raise self.error
+        self.last_id += 1
+        message = {'id': self.last_id, 'method': method, 'params': params or {}}
+        if session_id:
+            message['sessionId'] = session_id
+        future = asyncio.get_running_loop().create_future()
+        self.pending[self.last_id] = [method, future]
+        await self.websocket.send(json.dumps(message))
+        return await asyncio.wait_for(future, timeout)
+
+    def on(self, method, callback, session_id=None):
+        self.listeners.setdefault((session_id, method), []).append(callback)
+
+    def off(self, method, callback, session_id=None):
+        callbacks = self.listeners.get((session_id, method), [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+    def wait_for(self, method, session_id=None):
+        """Return a future of the params of the next event, subscribed now so that an event right after a command isn't missed."""
+        future = asyncio.get_running_loop().create_future()
+        if self.error:
+            future.set_exception(self.error)
+            return future
+        self.waiters.setdefault((session_id, method), []).append(future)
+        return future
+
+    async def attach(self, target_id):
+        result = await self.send('Target.attachToTarget', {'targetId': target_id, 'flatten': True})
+        return CdpSession(self, result['sessionId'], target_id)
+
+    async def new_page(self, url='about:blank', close_others=False):
+        """Open url in a new tab and return a session attached to it. With close_others, the other tabs are closed."""
+        others = []
+        if close_others:
+            targets = (await self.send('Target.getTargets'))['targetInfos']
+            others = [target['targetId'] for target in targets if target['type'] == 'page']
+        target_id = (await self.send('Target.createTarget', {'url': url}))['targetId']
+        for other in others:
+            await self.send('Target.closeTarget', {'targetId': other})
+        return await self.attach(target_id)
+
+    async def _receive(self):
+        try:
+            while True:
+                text = await self.websocket.receive()
+                if text is None:
+                    break
+                message = json.loads(text)
+                if 'id' in message:
+                    method, future = self.pending.pop(message['id'], [None, None])
+                    if future and not future.done():
+                        if 'error' in message:
+                            future.set_exception(CdpError(method, message['error']))
+                        else:
+                            future.set_result(message.get('result', {}))
+                elif 'method' in message:
+                    self._dispatch(message.get('sessionId'), message['method'], message.get('params', {}))
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            self._fail_pending(ConnectionError(f'The DevTools connection was lost: {e}'))
+            return
+        except Exception as e:
+            # A message that can't be decoded leaves the connection in an unknown state
+            logger.error(f'Failed to receive from DevTools: {e!r}')
+            self._fail_pending(e)
+            return
+        self._fail_pending(ConnectionError('The browser closed the DevTools connection'))
+
+    def _dispatch(self, session_id, method, params):
+        for future in self.waiters.pop((session_id, method), []):
+            if not future.done():
+                future.set_result(params)
+        for callback in list(self.listeners.get((session_id, method), [])):
+            # A failing callback is the subscriber's bug, it doesn't stop the other callbacks or the connection
+            try:
+                result = callback(params)
+            except Exception as e:
+                logger.error(f'{method} callback failed: {e!r}')
+                continue
+            if inspect.isawaitable(result):
+                asyncio.ensure_future(result).add_done_callback(lambda task, method=method: self._log_callback_error(task, method))
+
+    @staticmethod
+    def _log_callback_error(task, method):
+        if not task.cancelled() and task.exception():
+            logger.error(f'{method} callback failed: {task.exception()!r}')
+
+    def _fail_pending(self, error):
+        self.error = self.error or error
+        for _, future in self.pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self.pending = {}
+        for futures in self.waiters.values():
+            for future in futures:
+                if not future.done():
+                    future.set_exception(error)
+        self.waiters = {}
@@ -0,0 +1,252 @@
+"""Sampler of what the host does besides the measurement, to tell the runs that background activity polluted.
+
+A thread samples the CPU utilization of the system, the CPU time of every process, the CPU frequency and the
+temperature while a run goes on. The measurement, this process and everything it started (the browser, its driver and
+their children), is the workload, every other process is background. psutil is used when it is installed, Linux
+falls back to /proc and /sys, elsewhere only psutil can tell.
+
+    monitor = HostNoiseMonitor({'background': 10})
+    monitor.start()
+    run()
+    noise = monitor.stop()
+    if noise['violations']:
+        print('Noisy run:', ', '.join(noise['violations']))
+"""
+
+import os
+import sys
+import threading
+import time
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Noise above which a run is noisy. background and cpu are % of the whole machine, temperature is the hottest sensor
+# in degrees C. A threshold of 0 is not checked.
+NOISE_THRESHOLDS = {
+    'background': 10.0,
+    'background_max': 50.0,
+    'cpu': 0.0,
+    'temperature': 95.0,
+}
+
+
+def parse_thresholds(text):
+    """Return NOISE_THRESHOLDS with the name=value pairs of a comma-separated string applied."""
+    thresholds = dict(NOISE_THRESHOLDS)
+    for pair in filter(None, (part.strip() for part in (text or '').split(','))):
+        name, _, value = pair.partition('=')
+        if name.strip() not in NOISE_THRESHOLDS:
+            raise ValueError(f'Unknown noise threshold {name.strip()}, known ones are {", ".join(NOISE_THRESHOLDS)}')
+        thresholds[name.strip()] = float(value)
+    return thresholds
+
+
+class HostNoiseMonitor:
+    """Sample the host in a thread between start() and stop(), and summarize what it did."""
+
+    # Background processes kept in a summary, the busiest first
+    TOP_PROCESSES = 5
+
+    def __init__(self, thresholds=None, interval=1.0):
+        self.thresholds = thresholds or dict(NOISE_THRESHOLDS)
+        self.interval = interval
+        if psutil:
+            self.source = 'psutil'
+        elif sys.platform.startswith('linux') and os.path.exists('/proc/stat'):
+            self.source = 'proc'
+            self.clock_ticks = os.sysconf('SC_CLK_TCK')
+        else:
+            self.source = None
+        self.cpu_count = os.cpu_count() or 1
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.samples = []
+        # process name -> CPU seconds in the background
+        self.background = {}
+
+    @property
+    def available(self):
+        return self.source is not None
+
+    def start(self):
+        self.samples = []
+        self.background = {}
+        if not self.available:
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._sample, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop sampling and return the summary of the run, or None if the host can't be sampled or the run was too short."""
+        if not self.thread:
+            return None
+        self.stop_event.set()
+        self.thread.join()
+        self.thread = None
+        return self.get_summary() if self.samples else None
+
+    def get_summary(self):
+        """Return the average and peak utilization (%), frequency (MHz), temperature (C), the busiest background
+        processes, [[name, % of the machine], ...], and the thresholds the run exceeded, as text.
+        """
+        summary = {'source': self.source, 'samples': len(self.samples)}
+        seconds = sum(sample['seconds'] for sample in self.samples)
+        for key in ['cpu', 'background']:
+            values = [sample[key] for sample in self.samples]
+            summary[key] = round(sum(value * sample['seconds'] for value, sample in zip(values, self.samples)) / seconds, 1) if seconds else None
+            summary[f'{key}_max'] = round(max(values), 1) if values else None
+        frequencies = [sample['frequency'] for sample in self.samples if sample['frequency']]
+        summary['frequency'] = round(sum(frequencies) / len(frequencies)) if frequencies else None
+        summary['frequency_min'] = round(min(frequencies)) if frequencies else None
+        temperatures = [sample['temperature'] for sample in self.samples if sample['temperature']]
+        summary['temperature'] = round(max(temperatures), 1) if temperatures else None
+        busiest = sorted(self.background.items(), key=lambda item: item[1], reverse=True)[:self.TOP_PROCESSES]
+        summary['top'] = [[name, round(cpu_seconds / seconds / self.cpu_count * 100, 1)] for name, cpu_seconds in busiest if seconds]
+        summary['violations'] = []
+        for name, threshold in self.thresholds.items():
+            value = summary.get(name)
+            if threshold and value is not None and value > threshold:
+                summary['violations'].append(f'{name} {value:g} > {threshold:g}')
+        return summary
+
+    def _sample(self):
+        try:
+            last_cpu = self._get_cpu_times()
+            last_processes = self._get_processes()
+            last_time = time.time()
+            while not self.stop_event.wait(self.interval):
+                cpu = self._get_cpu_times()
+                processes = self._get_processes()
+                now = time.time()
+                self._add_sample(now - last_time, last_cpu, cpu, last_processes, processes)
+                last_cpu, last_processes, last_time = cpu, processes, now
+            # The tail of the run, unless it is too short to say anything
+            now = time.time()
+            if now - last_time > self.interval / 4:
+                self._add_sample(now - last_time, last_cpu, self._get_cpu_times(), last_processes, self._get_processes())
+        except Exception:
+            # Noise is a diagnostic, it never fails the measurement, the run just has fewer samples
+            pass
+
+    def _add_sample(self, seconds, last_cpu, cpu, last_processes, processes):
+        total = cpu[1] - last_cpu[1]
+        workload = self._get_workload(processes)
+        background = 0.0
+        for pid, (name, _, cpu_seconds) in processes.items():
+            # A pid that is new, or reused by another process, has no CPU time to compare to
+            if pid in workload or pid not in last_processes or last_processes[pid][0] != name:
+                continue
+            used = max(cpu_seconds - last_processes[pid][2], 0.0)
+            if used:
+                background += used
+                self.background[name] = self.background.get(name, 0.0) + used
+        self.samples.append({
+            'seconds': seconds,
+            'cpu': (cpu[0] - last_cpu[0]) / total * 100 if total > 0 else 0.0,
+            'background': min(background / seconds / self.cpu_count * 100, 100.0) if seconds > 0 else 0.0,
+            'frequency': self._get_frequency(),
+            'temperature': self._get_temperature(),
+        })
+
+    def _get_workload(self, processes):
+        """Return the pids of this process and of all its descendants."""
+        children = {}
+        for pid, (_, ppid, _) in processes.items():
+            children.setdefault(ppid, []).append(pid)
+        workload = set()
+        pending = [os.getpid()]
+        while pending:
+            pid = pending.pop()
+            if pid not in workload:
+                workload.add(pid)
+                pending.extend(children.get(pid, []))
+        return workload
+
+    def _get_cpu_times(self):
+        """Return [busy, total] CPU seconds of the system since it started."""
+        if self.source == 'psutil':
+            times = psutil.cpu_times()
+            # Guest time is already counted in user time
+            total = sum(value for name, value in times._asdict().items() if not name.startswith('guest'))
+            return [total - times.idle - getattr(times, 'iowait', 0.0), total]
+        with open('/proc/stat') as f:
+            values = [int(value) for value in f.readline().split()[1:]]
+        # user nice system idle iowait irq softirq steal, guest time is already counted in user
+        total = sum(values[:8])
+        return [(total - values[3] - values[4]) / self.clock_ticks, total / self.clock_ticks]
+
+    def _get_processes(self):
+        """Return pid -> [name, parent pid, CPU seconds] of every process that can be read."""
+        processes = {}
+        if self.source == 'psutil':
+            for process in psutil.process_iter(['name', 'ppid', 'cpu_times']):
+                info = process.info
+                # The System Idle Process of Windows has the idle time as its CPU time
+                if process.pid and info['cpu_times'] is not None:
+                    processes[process.pid] = [info['name'] or '', info['ppid'] or 0, info['cpu_times'].user + info['cpu_times'].system]
+            return processes
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    stat = f.read()
+            except OSError:
+                continue
+            # The name is in parentheses and may have spaces and parentheses of its own
+            name = stat[stat.find('(') + 1:stat.rfind(')')]
+            fields = stat[stat.rfind(')') + 2:].split()
+            processes[int(entry)] = [name, int(fields[1]), (int(fields[11]) + int(fields[12])) / self.clock_ticks]
+        return processes
+
+    def _get_frequency(self):
+        """Return the average current CPU frequency in MHz, or None."""
+        if self.source == 'psutil':
+            try:
+                frequency = psutil.cpu_freq()
+            except (OSError, NotImplementedError):
+                return None
+            return frequency.current if frequency else None
+        frequencies = []
+        cpu_dir = '/sys/devices/system/cpu'
+        for name in os.listdir(cpu_dir):
+            if not name[3:].isdigit():
+                continue
+            try:
+                with open(f'{cpu_dir}/{name}/cpufreq/scaling_cur_freq') as f:
+                    frequencies.append(int(f.read()) / 1000)
+            except (OSError, ValueError):
+                continue
+        if not frequencies:
+            # Virtual machines have no cpufreq, cpuinfo still has the clock they were given
+            try:
+                with open('/proc/cpuinfo') as f:
+                    frequencies = [float(line.split(':')[1]) for line in f if line.startswith('cpu MHz')]
+            except (OSError, ValueError):
+                return None
+        return sum(frequencies) / len(frequencies) if frequencies else None
+
+    def _get_temperature(self):
+        """Return the hottest temperature sensor in degrees C, or None."""
+        if self.source == 'psutil':
+            sensors = getattr(psutil, 'sensors_temperatures', None)
+            try:
+                readings = [reading.current for entries in (sensors() if sensors else {}).values() for reading in entries]
+            except (OSError, NotImplementedError):
+                return None
+            return max(readings) if readings else None
+        temperatures = []
+        thermal_dir = '/sys/class/thermal'
+        for name in os.listdir(thermal_dir) if os.path.isdir(thermal_dir) else []:
+            if not name.startswith('thermal_zone'):
+                continue
+            try:
+                with open(f'{thermal_dir}/{name}/temp') as f:
+                    temperatures.append(int(f.read()) / 1000)
+            except (OSError, ValueError):
+                continue
+        return max(temperatures) if temperatures else None
@@ -1,16 +1,781 @@
 import argparse
+import asyncio
+import base64
+import bisect
+import codecs
+import gzip
+import hashlib
+import itertools
 import json
 import logging
+import math
 import os
+import platform
+import random
+import re
+import struct
 import subprocess
 import sys
+import threading
 import time
-import urllib.request
+import zlib
+from array import array
+from html import escape
+
+from cdp import CdpClient, CdpError
+from hostnoise import HostNoiseMonitor, parse_thresholds
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 # Setup basic logging
 logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
 logger = logging.getLogger(__name__)
 
+
+class TraceEventStream:
+    """Split the JSON text of a trace into its events while it is being read, so the whole trace is never in memory.
+
+    Text is fed in chunks of any size. Each complete event, an object in the top-level array or in the traceEvents
+    array, is passed as text to on_event.
+    """
+
+    SPECIAL_CHARS = re.compile(r'[{}\[\]"\\]')
+    EVENT_PARENTS = [['{', '['], ['[']]
+
+    def __init__(self, on_event):
+        self.on_event = on_event
+        self.stack = []
+        self.in_string = False
+        # The chunk ended with a backslash in a string, the first char of the next one is escaped
+        self.escape_pending = False
+        self.in_event = False
+        self.parts = []
+
+    def feed(self, text):
+        event_start = 0
+        escaped = -1
+        if self.escape_pending:
+            escaped = 0
+            self.escape_pending = False
+        for match in self.SPECIAL_CHARS.finditer(text):
+            i = match.start()
+            if i == escaped:
+                continue
+            char = text[i]
+            if self.in_string:
+                if char == '\\':
+                    escaped = i + 1
+                    self.escape_pending = escaped == len(text)
+                elif char == '"':
+                    self.in_string = False
+                continue
+
+            if char == '"':
+                self.in_string = True
+            elif char in '{[':
+                if char == '{' and not self.in_event and self.stack in self.EVENT_PARENTS:
+                    self.in_event = True
+                    event_start = i
+                self.stack.append(char)
+            else:
+                self.stack.pop()
+                if char == '}' and self.in_event and self.stack in self.EVENT_PARENTS:
+                    self.parts.append(text[event_start:i + 1])
+                    self.on_event(''.join(self.parts))
+                    self.parts = []
+                    self.in_event = False
+        if self.in_event:
+            self.parts.append(text[event_start:])
+
+
+class PowerEventCollector:
+    """Add the power events of a trace to the samples of an iteration, and count the rest without parsing them."""
+
+    CATEGORY_PATTERN = re.compile(r'"cat"\s*:\s*"([^"]*)"')
+    POWER_PATTERN = re.compile(r'power|energy', re.IGNORECASE)
+
+    def __init__(self, samples, iteration):
+        self.samples = samples
+        self.iteration = iteration
+        self.total = 0
+        self.categories = set()
+        self.power_count = 0
+        # The first power events, to show what the trace has
+        self.examples = []
+
+    def add(self, text):
+        self.total += 1
+        match = self.CATEGORY_PATTERN.search(text)
+        if match:
+            self.categories.add(match.group(1))
+            if match.group(1) in PowerSamples.MARKER_CATEGORIES:
+                self.samples.add_marker(json.loads(text), self.iteration)
+                return
+            if match.group(1) in PowerSamples.FRAME_CATEGORIES:
+                self.samples.add_frame(json.loads(text), self.iteration)
+                return
+        # Only events that may be power related are parsed
+        if not self.POWER_PATTERN.search(text):
+            return
+        event = json.loads(text)
+        cat = event.get('cat', '')
+        name = event.get('name', '')
+        if 'power' in cat.lower() or self.POWER_PATTERN.search(name):
+            self.power_count += 1
+            if len(self.examples) < 10:
+                self.examples.append(event)
+            self.samples.add_event(event, self.iteration)
+
+
+def read_varint(data, pos):
+    """Return the protobuf varint at pos of data and the position after it."""
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def iter_fields(data):
+    """Yield (field number, value) of a protobuf message.
+
+    Varints are ints, length-delimited fields are bytes and fixed-size fields are their raw 4 or 8 bytes.
+    """
+    pos = 0
+    end = len(data)
+    while pos < end:
+        key, pos = read_varint(data, pos)
+        wire_type = key & 7
+        if wire_type == 0:
+            value, pos = read_varint(data, pos)
+        elif wire_type == 2:
+            length, pos = read_varint(data, pos)
+            value = data[pos:pos + length]
+            pos += length
+        elif wire_type == 1:
+            value = data[pos:pos + 8]
+            pos += 8
+        elif wire_type == 5:
+            value = data[pos:pos + 4]
+            pos += 4
+        else:
+            raise ValueError(f'Unsupported protobuf wire type {wire_type}')
+        yield key >> 3, value
+
+
+class ProtoTraceStream:
+    """Split a Perfetto protobuf trace, fed in chunks of any size, into its TracePacket messages.
+
+    A trace is a sequence of `repeated TracePacket packet = 1`, so each packet is a tag, a length and the packet.
+    """
+
+    def __init__(self, on_packet):
+        self.on_packet = on_packet
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        self.buffer.extend(data)
+        buffer = self.buffer
+        pos = 0
+        while pos < len(buffer):
+            try:
+                key, start = read_varint(buffer, pos)
+                length, start = read_varint(buffer, start)
+            except IndexError:
+                break
+            if start + length > len(buffer):
+                break
+            if key == 0x0A:
+                self.on_packet(bytes(buffer[start:start + length]))
+            pos = start + length
+        del buffer[:pos]
+
+    @property
+    def complete(self):
+        """Whether the trace ended on a packet boundary, a cut trace leaves part of a packet behind."""
+        return not self.buffer
+
+
+class PowerCounterCollector:
+    """Add the power counter tracks of a Perfetto protobuf trace to the samples of an iteration.
+
+    Only the few packet fields that counters need are decoded: track descriptors for the track names, counter track
+    events, and the clock snapshots and packet defaults that incremental timestamps rely on.
+    """
+
+    # TracePacket fields
+    TIMESTAMP = 8
+    SEQUENCE_ID = 10
+    TRACK_EVENT = 11
+    SEQUENCE_FLAGS = 13
+    CLOCK_SNAPSHOT = 6
+    INCREMENTAL_STATE_CLEARED = 41
+    TIMESTAMP_CLOCK_ID = 58
+    PACKET_DEFAULTS = 59
+    TRACK_DESCRIPTOR = 60
+    PACKET_FIELDS = {TIMESTAMP, SEQUENCE_ID, TRACK_EVENT, SEQUENCE_FLAGS, CLOCK_SNAPSHOT, INCREMENTAL_STATE_CLEARED,
+                     TIMESTAMP_CLOCK_ID, PACKET_DEFAULTS, TRACK_DESCRIPTOR}
+    TYPE_COUNTER = 4
+    BOOTTIME = 6
+
+    def __init__(self, samples, iteration):
+        self.samples = samples
+        self.iteration = iteration
+        self.total = 0
+        self.categories = set()
+        self.power_count = 0
+        self.examples = []
+        # track uuid -> [name, unit multiplier, is incremental]
+        self.tracks = {}
+        # track uuid -> [timestamps (ns), values]
+        self.counters = {}
+        # sequence id -> {'clock': default clock, 'track': default track, 'incremental': {clock: [last, multiplier, offset]}}
+        self.sequences = {}
+
+    def add(self, packet):
+        self.total += 1
+        fields = {}
+        for field, value in iter_fields(packet):
+            if field in self.PACKET_FIELDS:
+                fields[field] = value
+        sequence = self.sequences.setdefault(fields.get(self.SEQUENCE_ID, 0), {'clock': None, 'track': None, 'incremental': {}})
+        if fields.get(self.INCREMENTAL_STATE_CLEARED) or fields.get(self.SEQUENCE_FLAGS, 0) & 1:
+            sequence['incremental'] = {}
+        if self.CLOCK_SNAPSHOT in fields:
+            self._add_clock_snapshot(sequence, fields[self.CLOCK_SNAPSHOT])
+        if self.PACKET_DEFAULTS in fields:
+            for field, value in iter_fields(fields[self.PACKET_DEFAULTS]):
+                if field == self.TIMESTAMP_CLOCK_ID:
+                    sequence['clock'] = value
+                elif field == 11:
+                    # TrackEventDefaults.track_uuid
+                    sequence['track'] = dict(iter_fields(value)).get(11, sequence['track'])
+        if self.TRACK_DESCRIPTOR in fields:
+            self._add_track(fields[self.TRACK_DESCRIPTOR])
+        if self.TRACK_EVENT in fields:
+            timestamp = self._get_timestamp(sequence, fields)
+            self._add_track_event(sequence, fields[self.TRACK_EVENT], timestamp)
+
+    def finish(self):
+        """Add the samples of the power counters, once all track names are known."""
+        for uuid, (timestamps, values) in self.counters.items():
+            name, multiplier, incremental = self.tracks.get(uuid, ['', 1, False])
+            if not PowerEventCollector.POWER_PATTERN.search(name):
+                continue
+            self.categories.add(name)
+            total = 0.0
+            for timestamp, value in zip(timestamps, values):
+                value *= multiplier
+                if incremental:
+                    total += value
+                    value = total
+                event = {'name': name, 'ts': timestamp / 1000, 'args': {'value': value}}
+                self.power_count += 1
+                if len(self.examples) < 10:
+                    self.examples.append(event)
+                self.samples.add_event(event, self.iteration)
+
+    def _add_clock_snapshot(self, sequence, snapshot):
+        clocks = {}
+        for field, value in iter_fields(snapshot):
+            if field == 1:
+                clock = dict(iter_fields(value))
+                clocks[clock.get(1)] = clock
+        boottime = clocks.get(self.BOOTTIME, {}).get(2)
+        for clock_id, clock in clocks.items():
+            if clock.get(3):
+                # Timestamps of an incremental clock are deltas from the previous packet, they start at the snapshot
+                multiplier = clock.get(4, 1)
+                offset = boottime - clock.get(2, 0) * multiplier if boottime is not None else 0
+                sequence['incremental'][clock_id] = [clock.get(2, 0), multiplier, offset]
+
+    def _get_timestamp(self, sequence, fields):
+        timestamp = fields.get(self.TIMESTAMP, 0)
+        clock = fields.get(self.TIMESTAMP_CLOCK_ID, sequence['clock'])
+        state = sequence['incremental'].get(clock)
+        if state:
+            state[0] += timestamp
+            return state[0] * state[1] + state[2]
+        return timestamp
+
+    def _add_track(self, descriptor):
+        fields = {}
+        for field, value in iter_fields(descriptor):
+            fields[field] = value
+        # name and static_name
+        name = fields.get(2) or fields.get(10) or b''
+        multiplier, incremental = 1, False
+        if 8 in fields:
+            counter = dict(iter_fields(fields[8]))
+            multiplier = counter.get(4, 1)
+            incremental = bool(counter.get(5))
+        self.tracks[fields.get(1)] = [name.decode('utf-8', errors='replace'), multiplier, incremental]
+
+    def _add_track_event(self, sequence, track_event, timestamp):
+        event_type = None
+        uuid = sequence['track']
+        value = None
+        for field, field_value in iter_fields(track_event):
+            if field == 9:
+                event_type = field_value
+            elif field == 11:
+                uuid = field_value
+            elif field == 30:
+                # int64 counter_value
+                value = field_value - (1 << 64) if field_value >= 1 << 63 else field_value
+            elif field == 44:
+                value = struct.unpack('<d', field_value)[0]
+        if event_type != self.TYPE_COUNTER or value is None:
+            return
+        counter = self.counters.setdefault(uuid, [array('d'), array('d')])
+        counter[0].append(timestamp)
+        counter[1].append(value)
+
+
+# Two-sided 95% t critical values by degrees of freedom, the normal one beyond the table
+T_95 = [0, 12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228, 2.201, 2.179, 2.160, 2.145, 2.131,
+        2.120, 2.110, 2.101, 2.093, 2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+
+def mean_ci(values):
+    """Return [mean, half width of its 95% confidence interval] of per-iteration values, with Student's t."""
+    stats = RunningStats()
+    for value in values:
+        stats.add(value)
+    if stats.count < 2:
+        return [stats.mean, 0.0]
+    t = T_95[stats.count - 1] if stats.count - 1 < len(T_95) else 1.960
+    return [stats.mean, t * stats.std / math.sqrt(stats.count)]
+
+
+class RunningStats:
+    """Count, mean, variance, min and max in one pass (Welford's algorithm)."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def std(self):
+        if self.count < 2:
+            return 0.0
+        return math.sqrt(self.m2 / (self.count - 1))
+
+
+class PowerSamples:
+    """Power samples grouped by metric and iteration, as compact arrays of timestamps (us) and values (mW).
+
+    Statistics are updated as samples arrive, only percentiles need the values again.
+    """
+
+    # Page-side events that mark the workload phases, on the same trace clock as the power samples
+    MARKER_CATEGORIES = ['blink.user_timing', 'loading']
+    # Marker -> phase that starts at it
+    PHASE_MARKERS = {
+        'navigationStart': 'Page load',
+        'firstContentfulPaint': 'After first frame',
+        'loadEventEnd': 'After load',
+    }
+    # Navigation timing events of blink.user_timing, everything else there is a performance.mark() of the page
+    NAVIGATION_TIMING = {
+        'navigationStart', 'unloadEventStart', 'unloadEventEnd', 'redirectStart', 'redirectEnd', 'fetchStart',
+        'domainLookupStart', 'domainLookupEnd', 'connectStart', 'connectEnd', 'secureConnectionStart', 'requestStart',
+        'responseStart', 'responseEnd', 'domLoading', 'domInteractive', 'domContentLoadedEventStart',
+        'domContentLoadedEventEnd', 'domComplete', 'loadEventStart', 'loadEventEnd', 'commitNavigationEnd',
+    }
+
+    # Frames the compositor draws, a light category that stays on for long captures
+    FRAME_CATEGORIES = ['disabled-by-default-devtools.timeline.frame']
+    FRAME_EVENTS = {'DrawFrame'}
+
+    def __init__(self):
+        # metric -> iteration -> [timestamps, values]
+        self.series = {}
+        self.stats = {}
+        self.iter_stats = {}
+        self.count = 0
+        # iteration -> [[ts, phase name], ...]
+        self.markers = {}
+        # iteration -> layer tree -> frame timestamps
+        self.frames = {}
+        # metric -> mW subtracted from each of its samples, the measurement overhead
+        self.offsets = {}
+
+    def add_event(self, event, iteration):
+        name = event.get('name')
+        value = event.get('args', {}).get('value')
+        if not name or value is None:
+            return
+        value = float(value) - self.offsets.get(name, 0.0)
+        timestamps, values = self._get_series(name, iteration)
+        timestamps.append(float(event.get('ts', 0)))
+        values.append(value)
+        self.stats[name].add(value)
+        self.iter_stats[name][iteration].add(value)
+        self.count += 1
+
+    def add_series(self, name, iteration, timestamps, values):
+        """Add the samples of a metric in bulk, from arrays of timestamps and values."""
+        offset = self.offsets.get(name, 0.0)
+        series = self._get_series(name, iteration)
+        series[0].extend(timestamps)
+        for value in values:
+            value -= offset
+            series[1].append(value)
+            self.stats[name].add(value)
+            self.iter_stats[name][iteration].add(value)
+        self.count += len(values)
+
+    def add_run(self, run, iteration, run_iteration=1):
+        """Add the samples, markers and frames of an iteration of another PowerSamples as an iteration."""
+        for name, iterations in run.series.items():
+            if run_iteration in iterations:
+                self.add_series(name, iteration, *iterations[run_iteration])
+        self.markers.setdefault(iteration, []).extend(run.markers.get(run_iteration, []))
+        for tree, timestamps in run.frames.get(run_iteration, {}).items():
+            self.frames.setdefault(iteration, {}).setdefault(tree, array('d')).extend(timestamps)
+
+    def _get_series(self, name, iteration):
+        if name not in self.series:
+            self.series[name] = {}
+            self.stats[name] = RunningStats()
+            self.iter_stats[name] = {}
+        if iteration not in self.series[name]:
+            self.series[name][iteration] = [array('d'), array('d')]
+            self.iter_stats[name][iteration] = RunningStats()
+        return self.series[name][iteration]
+
+    def add_marker(self, event, iteration):
+        name = event.get('name', '')
+        if event.get('ph') in ['b', 'e', 'B', 'E'] or 'ts' not in event:
+            return
+        markers = self.markers.setdefault(iteration, [])
+        if name in self.PHASE_MARKERS:
+            # Frames all report their navigation timing, the first one is the page's
+            phase = self.PHASE_MARKERS[name]
+            if all(marker[1] != phase for marker in markers):
+                markers.append([float(event['ts']), phase])
+        elif event.get('cat') == 'blink.user_timing' and name not in self.NAVIGATION_TIMING:
+            markers.append([float(event['ts']), f'Mark: {name}'])
+
+    def add_frame(self, event, iteration):
+        # Async frames come as begin/end pairs, each frame is counted at its start
+        if event.get('name') not in self.FRAME_EVENTS or event.get('ph') in ['e', 'E'] or 'ts' not in event:
+            return
+        tree = event.get('args', {}).get('layerTreeId', 0)
+        self.frames.setdefault(iteration, {}).setdefault(tree, array('d')).append(float(event['ts']))
+
+    def get_frame_count(self, iteration, start, end):
+        """Return the frames drawn between two timestamps.
+
+        The browser UI has a compositor of its own, the busiest one is taken as the page's.
+        """
+        trees = self.frames.get(iteration)
+        if not trees:
+            return 0
+        timestamps = sorted(max(trees.values(), key=len))
+        return bisect.bisect_left(timestamps, end) - bisect.bisect_left(timestamps, start)
+
+    def get_range(self, iteration):
+        """Return [start, end] timestamps of an iteration, from its first power sample or marker to its last sample."""
+        starts = [series[iteration][0][0] for series in self.series.values() if series.get(iteration) and series[iteration][0]]
+        ends = [series[iteration][0][-1] for series in self.series.values() if series.get(iteration) and series[iteration][0]]
+        starts += [marker[0] for marker in self.markers.get(iteration, [])]
+        if not ends:
+            return [0.0, 0.0]
+        return [min(starts), max(ends)]
+
+    def get_phases(self, iteration, warmup=0):
+        """Split an iteration into [name, start, end] phases at its markers.
+
+        The warm-up window starts at the page load (or at the start without one), the steady state follows it.
+        Return the phases and the start of the steady state.
+        """
+        start, end = self.get_range(iteration)
+        markers = sorted(marker for marker in self.markers.get(iteration, []) if start <= marker[0] < end)
+        loaded = [marker[0] for marker in markers if marker[1] == self.PHASE_MARKERS['loadEventEnd']]
+        steady_start = min((loaded[0] if loaded else start) + warmup * 1000000, end)
+        if warmup:
+            markers = sorted(markers + [[steady_start, 'Steady state']])
+        navigated = any(marker[1] == self.PHASE_MARKERS['navigationStart'] for marker in markers)
+        boundaries = [[start, 'Before navigation' if navigated else 'Run']] + markers + [[end, '']]
+        phases = []
+        for i in range(len(boundaries) - 1):
+            if boundaries[i + 1][0] > boundaries[i][0]:
+                phases.append([boundaries[i][1], boundaries[i][0], boundaries[i + 1][0]])
+        return phases, steady_start
+
+    def get_energy(self, name, iteration, start, end):
+        """Return [energy in mJ, average power in mW] of a metric between two timestamps.
+
+        Each sample holds its value until the next one.
+        """
+        timestamps, values = self._get_sorted(name, iteration)
+        if not timestamps or end <= start:
+            return [0.0, 0.0]
+        energy = 0.0
+        covered = 0.0
+        i = max(bisect.bisect_right(timestamps, start) - 1, 0)
+        while i < len(timestamps) and timestamps[i] < end:
+            segment_start = max(timestamps[i], start)
+            segment_end = min(timestamps[i + 1] if i + 1 < len(timestamps) else end, end)
+            if segment_end > segment_start:
+                seconds = (segment_end - segment_start) / 1000000
+                energy += values[i] * seconds
+                covered += seconds
+            i += 1
+        return [energy, energy / covered if covered else 0.0]
+
+    def _get_sorted(self, name, iteration):
+        if iteration not in self.series.get(name, {}):
+            return [array('d'), array('d')]
+        timestamps, values = self.series[name][iteration]
+        if any(timestamps[i] > timestamps[i + 1] for i in range(len(timestamps) - 1)):
+            order = sorted(range(len(timestamps)), key=timestamps.__getitem__)
+            timestamps = array('d', (timestamps[i] for i in order))
+            values = array('d', (values[i] for i in order))
+            self.series[name][iteration] = [timestamps, values]
+        return [timestamps, values]
+
+    def get_values(self, name, iteration=None):
+        if iteration is not None:
+            return self.series[name][iteration][1]
+        values = array('d')
+        for iteration in sorted(self.series[name]):
+            values.extend(self.series[name][iteration][1])
+        return values
+
+    def get_percentiles(self, name, percents, iteration=None):
+        values = self.get_values(name, iteration)
+        if not values:
+            return [0.0] * len(percents)
+        if np is not None:
+            return [float(p) for p in np.percentile(np.frombuffer(values, dtype=np.float64), percents)]
+        ordered = sorted(values)
+        result = []
+        for percent in percents:
+            position = (len(ordered) - 1) * percent / 100
+            lower = int(position)
+            upper = min(lower + 1, len(ordered) - 1)
+            result.append(ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower))
+        return result
+
+    def get_summary(self, name, iteration=None):
+        stats = self.stats[name] if iteration is None else self.iter_stats[name].get(iteration)
+        if not stats or not stats.count:
+            return {'avg': 0, 'min': 0, 'max': 0, 'std': 0, 'med': 0, 'p5': 0, 'p95': 0, 'count': 0}
+        p5, med, p95 = self.get_percentiles(name, [5, 50, 95], iteration)
+        return {
+            'avg': stats.mean,
+            'min': stats.min,
+            'max': stats.max,
+            'std': stats.std,
+            'med': med,
+            'p5': p5,
+            'p95': p95,
+            'count': stats.count,
+        }
+
+
+class PowerCache:
+    """What a trace holds for the analysis, its power samples, markers and frames, saved next to it as <trace>.power.
+
+    The file is a JSON header line followed by the raw arrays, read back without parsing the trace again. A cache
+    belongs to the trace of the size and mtime it records, or failing that, of the SHA-256 it records.
+    """
+
+    EXTENSION = '.power'
+    VERSION = 1
+
+    @staticmethod
+    def get_hash(trace_file):
+        sha256 = hashlib.sha256()
+        with open(trace_file, 'rb') as f:
+            while True:
+                data = f.read(1024 * 1024)
+                if not data:
+                    break
+                sha256.update(data)
+        return sha256.hexdigest()
+
+    @classmethod
+    def load(cls, trace_file):
+        """Return the cached PowerSamples of a trace, as iteration 1, or None if there is no valid cache."""
+        cache_file = trace_file + cls.EXTENSION
+        try:
+            with open(cache_file, 'rb') as f:
+                header = json.loads(f.readline())
+                data = f.read()
+            if header.get('version') != cls.VERSION:
+                return None
+            stat = os.stat(trace_file)
+            if [header['size'], header['mtime']] != [stat.st_size, stat.st_mtime_ns]:
+                # Copied or touched, only the content tells
+                if header['size'] != stat.st_size or header['sha256'] != cls.get_hash(trace_file):
+                    return None
+                header['mtime'] = stat.st_mtime_ns
+                cls._write(cache_file, header, data)
+        except (OSError, ValueError, KeyError):
+            return None
+
+        position = 0
+
+        def read_array(count):
+            nonlocal position
+            values = array('d')
+            values.frombytes(data[position:position + count * values.itemsize])
+            if header['byteorder'] != sys.byteorder:
+                values.byteswap()
+            position += count * values.itemsize
+            return values
+
+        samples = PowerSamples()
+        for name, count in header['series']:
+            timestamps = read_array(count)
+            samples.add_series(name, 1, timestamps, read_array(count))
+        if header['markers']:
+            samples.markers[1] = header['markers']
+        for tree, count in header['frames']:
+            samples.frames.setdefault(1, {})[tree] = read_array(count)
+        return samples
+
+    @classmethod
+    def save(cls, trace_file, samples, sha256):
+        """Save iteration 1 of samples as the cache of a trace."""
+        stat = os.stat(trace_file)
+        header = {
+            'version': cls.VERSION,
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns,
+            'sha256': sha256,
+            'byteorder': sys.byteorder,
+            'series': [],
+            'markers': samples.markers.get(1, []),
+            'frames': [],
+        }
+        parts = []
+        for name, iterations in samples.series.items():
+            timestamps, values = iterations[1]
+            header['series'].append([name, len(values)])
+            parts.extend([timestamps.tobytes(), values.tobytes()])
+        for tree, timestamps in samples.frames.get(1, {}).items():
+            header['frames'].append([tree, len(timestamps)])
+            parts.append(timestamps.tobytes())
+        cls._write(trace_file + cls.EXTENSION, header, b''.join(parts))
+
+    @staticmethod
+    def _write(cache_file, header, data):
+        # Written aside and swapped in, so an interrupted write never leaves a broken cache
+        with open(cache_file + '.tmp', 'wb') as f:
+            f.write(json.dumps(header).encode('utf-8') + b'\n')
+            f.write(data)
+        os.replace(cache_file + '.tmp', cache_file)
+
+
+class RaplMeter:
+    """Package energy of the host from Linux RAPL (powercap), a power source that doesn't need the browser to trace.
+
+    energy_uj is readable by root only on recent kernels, the meter is unavailable otherwise.
+    """
+
+    POWERCAP_DIR = '/sys/class/powercap'
+    # Top-level zones are the packages, sub-zones (intel-rapl:0:0) are parts of them
+    ZONE_PATTERN = re.compile(r'^intel-rapl:\d+$')
+
+    def __init__(self):
+        self.zones = []
+        if not os.path.isdir(self.POWERCAP_DIR):
+            return
+        for zone in sorted(os.listdir(self.POWERCAP_DIR)):
+            energy_file = os.path.join(self.POWERCAP_DIR, zone, 'energy_uj')
+            if not self.ZONE_PATTERN.match(zone):
+                continue
+            try:
+                with open(energy_file) as f:
+                    int(f.read())
+                with open(os.path.join(self.POWERCAP_DIR, zone, 'max_energy_range_uj')) as f:
+                    max_energy = int(f.read())
+            except (OSError, ValueError):
+                continue
+            self.zones.append([energy_file, max_energy])
+
+    @property
+    def available(self):
+        return bool(self.zones)
+
+    def read(self):
+        """Return [time, energy (uJ) of each zone]."""
+        energies = []
+        for energy_file, _ in self.zones:
+            with open(energy_file) as f:
+                energies.append(int(f.read()))
+        return [time.time(), energies]
+
+    def get_power(self, start, end):
+        """Return the average power (mW) between two readings."""
+        seconds = end[0] - start[0]
+        if seconds <= 0:
+            return 0.0
+        energy = 0
+        for (_, max_energy), start_energy, end_energy in zip(self.zones, start[1], end[1]):
+            # The counter wraps around at max_energy_range_uj
+            energy += end_energy - start_energy if end_energy >= start_energy else end_energy + max_energy - start_energy
+        return energy / 1000 / seconds
+
+
+def lttb(xs, ys, threshold):
+    """Downsample a series to threshold points with Largest-Triangle-Three-Buckets, which keeps its visual shape."""
+    count = len(xs)
+    if threshold >= count or threshold < 3:
+        return list(xs), list(ys)
+
+    sampled_x = [xs[0]]
+    sampled_y = [ys[0]]
+    bucket_size = (count - 2) / (threshold - 2)
+    selected = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, count)
+        # The average of the next bucket is the third corner of the triangle
+        avg_x = sum(xs[end:next_end]) / (next_end - end)
+        avg_y = sum(ys[end:next_end]) / (next_end - end)
+        point_x = xs[selected]
+        point_y = ys[selected]
+        max_area = -1.0
+        for j in range(start, end):
+            area = abs((point_x - avg_x) * (ys[j] - point_y) - (point_x - xs[j]) * (avg_y - point_y))
+            if area > max_area:
+                max_area = area
+                selected_in_bucket = j
+        selected = selected_in_bucket
+        sampled_x.append(xs[selected])
+        sampled_y.append(ys[selected])
+    sampled_x.append(xs[-1])
+    sampled_y.append(ys[-1])
+    return sampled_x, sampled_y
+
+
 class BrowserPower:
     """Run Chrome tracing with system_power category to measure power consumption."""
 
@@ -61,6 +826,31 @@ class BrowserPower:
     }
 
     DEBUG_PORT = 9222
+    # Seconds to wait for the answer of a DevTools command, a browser that takes longer has hung
+    COMMAND_TIMEOUT = 60
+    POWER_CATEGORY = 'disabled-by-default-system_power'
+    TRACE_CATEGORIES = [POWER_CATEGORY] + PowerSamples.MARKER_CATEGORIES + PowerSamples.FRAME_CATEGORIES
+    # Browser arguments that exist only for the measurement, left out of the plain browser of calibrations
+    MEASUREMENT_ARGS = ['--remote-debugging-port', '--remote-allow-origins', '--enable-logging', '--enable-gpu-benchmarking']
+    # Each calibration round measures every state for 'seconds', after 'settle' seconds for the browser to calm down
+    CALIBRATION = {'rounds': 3, 'seconds': 10, 'settle': 5}
+    # Files --analyze picks up in folders, and the JSON files written next to traces that are not traces
+    TRACE_EXTENSIONS = ['.json', '.json.gz', '.pftrace']
+    NON_TRACE_FILES = re.compile(r'(^state|_config|_probe)\.json$')
+    DEVTOOLS_PATTERN = re.compile(r'DevTools listening on (ws://\S+)')
+    # Performance.getMetrics values kept per iteration, durations are seconds of main-thread work
+    PAGE_METRICS = ['TaskDuration', 'ScriptDuration', 'LayoutDuration', 'RecalcStyleDuration', 'JSHeapUsedSize']
+
+    # Times a noisy iteration is run again with --noisy rerun, before it is kept anyway
+    NOISE_RERUNS = 2
+
+    # Adaptive cooldown of campaigns, overridable by the 'cooldown' object of the campaign config
+    CAMPAIGN_COOLDOWN = {
+        'max': 180,           # seconds to wait at most before a run
+        'tolerance': 0.1,     # idle power may be this much above the baseline
+        'probe': 5,           # seconds of each idle power probe
+        'baseline_wait': 30,  # seconds to rest before the baseline is measured
+    }
 
     def __init__(self, parser):
         parser.add_argument('--browser', dest='browser', choices=['chrome', 'edge'], default='chrome',
@@ -85,6 +875,26 @@ class BrowserPower:
                             help='extra browser arguments (comma-separated)')
         parser.add_argument('--method', dest='method', choices=['cdp', 'perfetto'], default='cdp',
                             help='tracing method: cdp (DevTools Protocol, default and recommended) or perfetto (command-line, experimental - may not produce output on all platforms)')
+        parser.add_argument('--warmup', dest='warmup', type=float, default=0,
+                            help='seconds after the page load left out of the steady-state power (default: 0)')
+        parser.add_argument('--compress', dest='compress', action='store_true',
+                            help='save cdp traces gzip-compressed (.json.gz), as the browser streams them')
+        parser.add_argument('--cold-start', dest='cold_start', action='store_true',
+                            help='launch a new browser for every iteration instead of reusing one (always the case with perfetto)')
+        parser.add_argument('--prewarm', dest='prewarm', type=int, default=0,
+                            help='seconds to load the URL untraced before the first iteration, to fill the shader and HTTP caches of the profile (default: 0)')
+        parser.add_argument('--calibrate', dest='calibrate', action='store_true',
+                            help='measure the overhead of the measurement itself on about:blank, cache it per host and browser version, and exit')
+        parser.add_argument('--subtract-overhead', dest='subtract_overhead', action='store_true',
+                            help='subtract the cached measurement overhead from Package Power, calibrating first if there is none')
+        parser.add_argument('--noisy', dest='noisy', choices=['flag', 'rerun', 'off'], default='flag',
+                            help='what to do with iterations the background activity of the host made noisy: flag them, run them again, or not sample the host (default: flag)')
+        parser.add_argument('--noise-thresholds', dest='noise_thresholds', default='',
+                            help='comma-separated name=value noise thresholds, of background, background_max and cpu (%% of the machine) and temperature (C), 0 disables one')
+        parser.add_argument('--analyze', dest='analyze', nargs='+', default=[], metavar='TRACE',
+                            help='analyze traces captured before instead of running the browser, trace files or folders of them, each one compared to the others')
+        parser.add_argument('--campaign', dest='campaign', default='',
+                            help='campaign config file, to measure URLs x browsers x channels x extra args in one interleaved and resumable run')
 
         parser.epilog = f'''
 examples:
@@ -92,9 +902,17 @@ examples:
 {sys.executable} {parser.prog} --browser edge --channel stable --url https://www.youtube.com --duration 120
 {sys.executable} {parser.prog} --browser-path "C:/path/to/chrome.exe" --url https://example.com
 {sys.executable} {parser.prog} --method cdp --repeat 3 --cooldown 60 --browser chrome --channel canary --url https://example.com
+{sys.executable} {parser.prog} --repeat 5 --prewarm 20 --url https://webglsamples.org/aquarium/aquarium.html
+{sys.executable} {parser.prog} --campaign campaign.json
+{sys.executable} {parser.prog} --calibrate
+{sys.executable} {parser.prog} --analyze gitignore/log/build1 gitignore/log/build2 --warmup 10
 '''
 
         args = parser.parse_args()
+        try:
+            noise_thresholds = parse_thresholds(args.noise_thresholds)
+        except ValueError as e:
+            parser.error(str(e))
         self.browser = args.browser
         self.channel = args.channel
         self.url = args.url
@@ -106,8 +924,40 @@ examples:
         self.user_data_dir = args.user_data_dir
         self.extra_browser_args = args.extra_browser_args
         self.method = args.method
-
-        self._run()
+        self.cold_start = args.cold_start or self.method == 'perfetto'
+        self.prewarm = args.prewarm
+        self.compress = args.compress and self.method == 'cdp'
+        self.warmup = args.warmup
+
+        # Seconds from starting the browser process to DevTools being ready, one per launch
+        self.launch_times = []
+        self.time_saved = 0.0
+        # Browser websocket of DevTools, printed by the browser when it starts
+        self.ws_url = None
+        # iteration -> page load time and PAGE_METRICS of the traced page
+        self.page_metrics = {}
+        self.calibrate = args.calibrate
+        self.subtract_overhead = args.subtract_overhead
+        # Cached calibration of this host and browser, when used
+        self.calibration = None
+        # iteration -> what the host did besides the measurement
+        self.noise = {}
+        self.noisy = args.noisy
+        self.noise_monitor = None
+        if args.noisy != 'off':
+            self.noise_monitor = HostNoiseMonitor(noise_thresholds)
+            if not self.noise_monitor.available:
+                logger.warning('Host noise is not sampled, it needs psutil on this platform')
+                self.noise_monitor = None
+
+        if args.analyze:
+            self._run_analysis(args.analyze)
+        elif args.calibrate:
+            self._run_calibration()
+        elif args.campaign:
+            self._run_campaign(args.campaign)
+        else:
+            self._run()
 
     def _get_browser_path(self):
         """Get the browser executable path based on OS, browser type and channel."""
@@ -157,7 +1007,7 @@ examples:
         """Get the output trace file path."""
         if self.output and self.repeat == 1:
             # Normalize to OS-native path separators for Chrome compatibility
-            return os.path.normpath(self.output)
+            return os.path.normpath(self._strip_trace_extension(self.output) + self._get_trace_extension())
 
         script_dir = os.path.dirname(os.path.abspath(__file__))
         toolkit_dir = os.path.dirname(script_dir)
@@ -172,9 +1022,22 @@ examples:
                 log_dir = os.path.dirname(self.output)
                 
         iter_suffix = f"_iter{iteration}" if self.repeat > 1 else ""
-        output_path = os.path.normpath(os.path.join(log_dir, f'{prefix}_{timestamp}{iter_suffix}.json'))
+        extension = self._get_trace_extension()
+        output_path = os.path.normpath(os.path.join(log_dir, f'{prefix}_{timestamp}{iter_suffix}{extension}'))
         return output_path
 
+    def _get_trace_extension(self):
+        if self.method == 'perfetto':
+            return '.pftrace'
+        return '.json.gz' if self.compress else '.json'
+
+    @staticmethod
+    def _strip_trace_extension(path):
+        for extension in ['.json.gz', '.json', '.pftrace']:
+            if path.endswith(extension):
+                return path[:-len(extension)]
+        return path
+
     def _create_trace_config(self, trace_file):
         """Create a trace config file for system_power tracing."""
         # Chrome trace config format
@@ -185,7 +1048,7 @@ examples:
             "memory_dump_config": {}
         }
 
-        config_file = trace_file.replace('.json', '_config.json')
+        config_file = self._strip_trace_extension(trace_file) + '_config.json'
         with open(config_file, 'w') as f:
             json.dump(config, f)
         return config_file
@@ -229,7 +1092,8 @@ examples:
                 f'--trace-config-file={config_file_fwd}',
                 f'--trace-startup-file={trace_file_fwd}',
                 f'--trace-startup-duration={self.duration}',
-                '--trace-startup-format=json',
+                # Protobuf traces are several times smaller and quicker to write than JSON ones
+                '--trace-startup-format=proto',
             ])
 
         # Extra browser arguments
@@ -242,140 +1106,178 @@ examples:
                         arg = '--' + arg
                     cmd.append(arg)
 
-        # URL to load
-        cmd.append(self.url)
+        # URL to load. With cdp the browser starts blank and the page is opened once tracing runs, so the trace has the
+        # page load too.
+        cmd.append(self.url if trace_file else 'about:blank')
 
         return cmd
 
-    def _wait_for_devtools(self, timeout=30):
-        """Wait for DevTools to become available."""
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            try:
-                url = f'http://127.0.0.1:{self.DEBUG_PORT}/json/version'
-                with urllib.request.urlopen(url, timeout=2) as response:
-                    return json.loads(response.read().decode('utf-8'))
-            except Exception:
-                time.sleep(0.5)
-        return None
-
-    def _get_browser_ws_url(self):
-        """Get the browser WebSocket URL from DevTools."""
+    def _wait_for_devtools(self, process, timeout=30):
+        """Wait for the browser to print its DevTools websocket URL and return it, or None if it doesn't in time.
+
+        stderr is read until the browser exits, so its logging can never fill the pipe and block the browser.
+        """
+        ready = threading.Event()
+        found = []
+
+        def read_stderr():
+            for line in iter(process.stderr.readline, b''):
+                if not found:
+                    match = self.DEVTOOLS_PATTERN.search(line.decode('utf-8', errors='replace'))
+                    if match:
+                        found.append(match.group(1))
+                        ready.set()
+            ready.set()
+
+        threading.Thread(target=read_stderr, daemon=True).start()
+        ready.wait(timeout)
+        return found[0] if found else None
+
+    def _run_cdp(self, work):
+        """Run the coroutine function work(client) on a DevTools connection to the browser and return its result."""
+        async def run():
+            async with CdpClient(self.ws_url) as client:
+                return await work(client)
+        return asyncio.run(run())
+
+    def _open_page(self, url):
+        """Load url in a new tab and close the other ones, so a reused browser starts each iteration from a fresh page."""
         try:
-            url = f'http://127.0.0.1:{self.DEBUG_PORT}/json/version'
-            with urllib.request.urlopen(url, timeout=5) as response:
-                version_info = json.loads(response.read().decode('utf-8'))
-                return version_info.get('webSocketDebuggerUrl')
+            self._run_cdp(lambda client: client.new_page(url, close_others=True))
+            return True
         except Exception as e:
-            logger.warning(f'Failed to get browser WebSocket URL: {e}')
-        return None
-
-    def _get_page_target(self):
-        """Get the first page target from DevTools."""
-        try:
-            url = f'http://127.0.0.1:{self.DEBUG_PORT}/json'
-            with urllib.request.urlopen(url, timeout=5) as response:
-                targets = json.loads(response.read().decode('utf-8'))
-                for target in targets:
-                    if target.get('type') == 'page':
-                        return target
-        except Exception as e:
-            logger.warning(f'Failed to get page target: {e}')
-        return None
-
-    def _run_tracing_cdp_internal(self, ws_url, duration, trace_file):
-        """Run tracing using Chrome DevTools Protocol with a persistent connection."""
-        try:
-            import websocket
-        except ImportError:
-            logger.error('websocket-client package is required. Install with: pip install websocket-client')
+            logger.warning(f'Failed to open a new page: {e}')
             return False
 
+    def _run_tracing_cdp_internal(self, ws_url, duration, trace_file, url, categories=None):
+        """Run tracing using Chrome DevTools Protocol with a persistent connection.
+
+        url is opened once tracing runs, with None the browser stays where it is. categories default to TRACE_CATEGORIES.
+        The browser keeps the trace and hands
+        it over as a stream, which is read in chunks straight to disk while the power events are added to the samples.
+        Return the number of power events, or None if tracing failed.
+        """
         try:
-            ws = websocket.create_connection(ws_url, timeout=duration + 30, suppress_origin=True)
-            msg_id = 0
-
-            def send_command(method, params=None):
-                nonlocal msg_id
-                msg_id += 1
-                request = {'id': msg_id, 'method': method}
-                if params:
-                    request['params'] = params
-                ws.send(json.dumps(request))
-                return msg_id
-
-            def wait_for_response(expected_id):
-                while True:
-                    response = json.loads(ws.recv())
-                    if response.get('id') == expected_id:
-                        return response
-                    # Handle async events
-                    if 'method' in response:
-                        continue
+            return asyncio.run(self._trace(ws_url, duration, trace_file, url, categories or self.TRACE_CATEGORIES))
+        except asyncio.TimeoutError:
+            logger.error(f'Tracing failed: the browser didn\'t answer DevTools within {self.COMMAND_TIMEOUT}s')
+            return None
+        except Exception as e:
+            logger.error(f'Tracing failed: {e}')
+            return None
 
+    async def _trace(self, ws_url, duration, trace_file, url, categories):
+        async with CdpClient(ws_url) as client:
             # Start tracing with power categories
             # Use system_power category which provides CPU Power, iGPU Power, Package Power (mW)
             trace_config = {
                 'traceConfig': {
-                    'includedCategories': [
-                        'disabled-by-default-system_power',
-                    ],
+                    'includedCategories': categories,
                     'recordMode': 'recordContinuously',
-                }
+                },
+                'transferMode': 'ReturnAsStream',
+                'streamFormat': 'json',
+                'streamCompression': 'gzip' if self.compress else 'none',
             }
 
             logger.info('Sending Tracing.start command...')
-            start_id = send_command('Tracing.start', trace_config)
-            response = wait_for_response(start_id)
-
-            if 'error' in response:
-                logger.error(f'Failed to start tracing: {response["error"]}')
-                ws.close()
-                return False
-
+            try:
+                await client.send('Tracing.start', trace_config, timeout=self.COMMAND_TIMEOUT)
+            except CdpError as e:
+                logger.error(f'Failed to start tracing: {e}')
+                return None
             logger.info('Tracing started successfully')
 
+            # Navigate now, so the page load is in the trace next to the power samples. The page is instrumented on
+            # the same connection while the browser traces.
+            tracing_start_time = time.time()
+            page = None
+            if url:
+                try:
+                    page = await self._load_page(client, url)
+                except CdpError as e:
+                    logger.warning(f'The page could not be opened, the trace has no page load: {e}')
+
             # Wait for the specified duration
             logger.info(f'Running for {duration} seconds...')
-            time.sleep(duration)
+            await asyncio.sleep(max(duration - (time.time() - tracing_start_time), 0))
+            if page:
+                await self._collect_page_metrics(page)
 
-            # Stop tracing
+            # Stop tracing, the stream handle comes with tracingComplete
             logger.info('Stopping tracing...')
-            end_id = send_command('Tracing.end')
-
-            # Collect trace data chunks
-            trace_data = []
-            while True:
-                response = json.loads(ws.recv())
-                if response.get('method') == 'Tracing.dataCollected':
-                    trace_data.extend(response.get('params', {}).get('value', []))
-                elif response.get('method') == 'Tracing.tracingComplete':
-                    logger.info('Tracing complete')
-                    break
-                elif response.get('id') == end_id:
-                    if 'error' in response:
-                        logger.error(f'Failed to stop tracing: {response["error"]}')
-                        ws.close()
-                        return False
-
-            ws.close()
-
-            if trace_data:
-                # Save trace data to file
-                trace_output = {'traceEvents': trace_data}
-                with open(trace_file, 'w', encoding='utf-8') as f:
-                    json.dump(trace_output, f)
-
-                file_size = os.path.getsize(trace_file)
-                logger.info(f'Trace file created: {trace_file} ({file_size} bytes)')
-                return True
-            else:
-                logger.error('No trace data collected')
-                return False
-
-        except Exception as e:
-            logger.error(f'Tracing failed: {e}')
-            return False
+            complete = client.wait_for('Tracing.tracingComplete')
+            try:
+                await client.send('Tracing.end', timeout=self.COMMAND_TIMEOUT)
+            except CdpError as e:
+                logger.error(f'Failed to stop tracing: {e}')
+                return None
+            stream = (await asyncio.wait_for(complete, self.COMMAND_TIMEOUT)).get('stream')
+            logger.info('Tracing complete')
+            if not stream:
+                logger.error('No trace stream returned')
+                return None
+
+            collector = PowerEventCollector(self.samples, self.iteration)
+            events = TraceEventStream(collector.add)
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if self.compress else None
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+            with open(trace_file, 'wb') as f:
+                while True:
+                    try:
+                        result = await client.send('IO.read', {'handle': stream, 'size': 1024 * 1024}, timeout=self.COMMAND_TIMEOUT)
+                    except CdpError as e:
+                        logger.error(f'Failed to read trace stream: {e}')
+                        break
+                    if result.get('base64Encoded'):
+                        data = base64.b64decode(result.get('data', ''))
+                    else:
+                        data = result.get('data', '').encode('utf-8')
+                    f.write(data)
+                    if decompressor:
+                        data = decompressor.decompress(data)
+                    events.feed(decoder.decode(data))
+                    if result.get('eof'):
+                        break
+            await client.send('IO.close', {'handle': stream}, timeout=self.COMMAND_TIMEOUT)
+
+        file_size = os.path.getsize(trace_file)
+        logger.info(f'Trace file created: {trace_file} ({file_size} bytes)')
+        self._log_trace_summary(collector)
+        return collector.power_count
+
+    async def _load_page(self, client, url):
+        """Open url in a fresh tab with its load time and main-thread work recorded. Return the page session."""
+        page = await asyncio.wait_for(client.new_page('about:blank', close_others=True), self.COMMAND_TIMEOUT)
+        metrics = self.page_metrics.setdefault(self.iteration, {})
+
+        def on_load(params):
+            metrics['load'] = params['timestamp']
+
+        page.on('Page.loadEventFired', on_load)
+        await page.send('Page.enable', timeout=self.COMMAND_TIMEOUT)
+        await page.send('Performance.enable', {'timeDomain': 'timeTicks'}, timeout=self.COMMAND_TIMEOUT)
+        await page.send('Page.navigate', {'url': url}, timeout=self.COMMAND_TIMEOUT)
+        return page
+
+    async def _collect_page_metrics(self, page):
+        try:
+            result = await page.send('Performance.getMetrics', timeout=10)
+        except (CdpError, asyncio.TimeoutError) as e:
+            logger.warning(f'Failed to get the page metrics: {e}')
+            return
+        values = {metric['name']: metric['value'] for metric in result.get('metrics', [])}
+        metrics = self.page_metrics.setdefault(self.iteration, {})
+        # The load event and NavigationStart share the monotonic clock of timeTicks
+        if 'load' in metrics and values.get('NavigationStart'):
+            metrics['load'] = max(metrics['load'] - values['NavigationStart'], 0.0)
+        else:
+            metrics.pop('load', None)
+        for name in self.PAGE_METRICS:
+            if name in values:
+                metrics[name] = values[name]
+        summary = ', '.join(f'{name} {value:.2f}' for name, value in metrics.items() if name != 'JSHeapUsedSize')
+        logger.info(f'Page metrics (s): {summary}, JS heap {metrics.get("JSHeapUsedSize", 0) / 1048576:.1f} MB')
 
     def _run(self):
         """Run the power measurement."""
@@ -401,45 +1303,520 @@ examples:
             logger.warning('Perfetto method is experimental and may not produce trace output on all platforms. '
                            'Consider using --method cdp (default) for reliable results.')
 
-        all_power_events = []
+        if self.subtract_overhead:
+            self.calibration = self._get_calibration(browser_path, user_data_dir)
+        samples = self._new_samples()
         trace_files = []
 
-        for i in range(1, self.repeat + 1):
-            if self.repeat > 1:
-                logger.info(f'--- Starting iteration {i}/{self.repeat} ---')
-                
-            trace_file = self._get_output_path(iteration=i)
-            trace_files.append(trace_file)
-            
-            logger.info(f'Trace output: {trace_file}')
+        # With cdp one browser serves all iterations, each iteration gets a fresh tab of the same warm profile
+        process = None
+        if not self.cold_start:
+            process = self._start_browser(browser_path, user_data_dir)
+            if not process:
+                return
+            if self.prewarm:
+                logger.info(f'Prewarming for {self.prewarm} seconds...')
+                self._open_page(self.url)
+                time.sleep(self.prewarm)
+        elif self.prewarm:
+            self._prewarm(browser_path, user_data_dir)
 
-            if self.method == 'perfetto':
-                events = self._run_perfetto_tracing(browser_path, user_data_dir, trace_file)
-            else:
-                events = self._run_cdp_tracing(browser_path, user_data_dir, trace_file)
-                
-            if events:
-                # Add iteration info to each event
-                for event in events:
-                    event['_iteration'] = i
-                all_power_events.extend(events)
-                
-            if i < self.repeat:
-                logger.info(f'Cooling down for {self.cooldown} seconds before next iteration...')
-                time.sleep(self.cooldown)
-                
-        if all_power_events:
+        try:
+            for i in range(1, self.repeat + 1):
+                if self.repeat > 1:
+                    logger.info(f'--- Starting iteration {i}/{self.repeat} ---')
+
+                self.iteration = i
+                trace_file = self._get_output_path(iteration=i)
+                trace_files.append(trace_file)
+
+                logger.info(f'Trace output: {trace_file}')
+
+                # Power events go to self.samples under self.iteration as the trace is read
+                if self.method == 'perfetto':
+                    trace = lambda: self._run_perfetto_tracing(browser_path, user_data_dir, trace_file)
+                elif self.cold_start:
+                    trace = lambda: self._run_cdp_tracing(browser_path, user_data_dir, trace_file)
+                else:
+                    trace = lambda: self._trace_cdp(trace_file)
+                noise = self._trace_quietly(trace, trace_file)
+                if noise:
+                    self.noise[i] = noise
+                samples.add_run(self.samples, i, i)
+
+                if i < self.repeat:
+                    logger.info(f'Cooling down for {self.cooldown} seconds before next iteration...')
+                    time.sleep(self.cooldown)
+        finally:
+            if process:
+                self._stop_browser(process)
+
+        self.samples = samples
+        self._report_launch_times()
+
+        if self.samples.count:
             try:
                 # Generate final combined HTML report if multiple runs, otherwise just standard report
+                trace_base = self._strip_trace_extension(trace_files[0])
                 if self.repeat > 1:
-                    report_path = trace_files[0].replace(f'_iter1.json', '_combined_report.html')
+                    report_path = trace_base.replace('_iter1', '') + '_combined_report.html'
                 else:
-                    report_path = trace_files[0].replace('.json', '_report.html')
-                    
-                self._generate_html_report(all_power_events, report_path, trace_files)
+                    report_path = trace_base + '_report.html'
+
+                self._generate_html_report(self.samples, report_path, trace_files)
             except Exception as e:
                 logger.error(f'Failed to generate final HTML report: {e}')
 
+    def _run_campaign(self, config_file):
+        """Measure every configuration of a campaign, interleaved in random order, and compare them in one report.
+
+        Each round runs all configurations once, in its own shuffled order, so thermal drift over a long campaign is
+        spread over all of them. Before each run the browser idles on about:blank until the package power is back to
+        the baseline, instead of a fixed cooldown. The state is saved after every run, and running the same campaign
+        again resumes it.
+        """
+        campaign, configs = self._load_campaign(config_file)
+        if not configs:
+            return
+        if self.method != 'cdp':
+            logger.warning('Campaigns always trace with cdp')
+            self.method = 'cdp'
+        self.cold_start = True
+        self.compress = campaign.get('compress', self.compress)
+        cooldown = dict(self.CAMPAIGN_COOLDOWN, **campaign.get('cooldown', {}))
+
+        campaign_dir = self.output or os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'gitignore', 'log',
+                                                   'campaign_' + os.path.splitext(os.path.basename(config_file))[0])
+        os.makedirs(campaign_dir, exist_ok=True)
+        state_file = os.path.join(campaign_dir, 'state.json')
+        config_hash = hashlib.sha1(json.dumps(campaign, sort_keys=True).encode('utf-8')).hexdigest()
+
+        state = None
+        if os.path.exists(state_file):
+            with open(state_file, encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('hash') != config_hash:
+                logger.error(f'{state_file} belongs to another version of the campaign, move it away to start over')
+                return
+            logger.info(f'Resuming campaign, {len(state["runs"])}/{len(state["order"])} runs done')
+        else:
+            rng = random.Random(campaign.get('seed'))
+            order = []
+            for round_index in range(self.repeat):
+                indexes = list(range(len(configs)))
+                rng.shuffle(indexes)
+                order.extend([index, round_index] for index in indexes)
+            state = {'hash': config_hash, 'baseline': None, 'order': order, 'runs': {}}
+            self._save_campaign_state(state_file, state)
+
+        probe_file = os.path.join(campaign_dir, 'idle_probe.json')
+        for position, (index, round_index) in enumerate(state['order']):
+            if str(position) in state['runs']:
+                continue
+            config = configs[index]
+            logger.info(f'--- Run {position + 1}/{len(state["order"])}: {config["label"]} on {config["url"]} '
+                        f'(round {round_index + 1}/{self.repeat}) ---')
+            self._apply_config(config)
+            browser_path = self._get_browser_path()
+            if not browser_path or not os.path.exists(browser_path):
+                logger.error(f'Browser not found: {browser_path}, the campaign stops here and can be resumed')
+                break
+            user_data_dir = os.path.join(self._get_user_data_dir(), f'campaign_config{index + 1}')
+            if self.subtract_overhead:
+                # Each configuration has its own browser, and so its own calibration
+                self.calibration = self._get_calibration(browser_path, user_data_dir)
+            process = self._start_browser(browser_path, user_data_dir)
+            if not process:
+                break
+            try:
+                if state['baseline'] is None:
+                    logger.info(f'Resting {cooldown["baseline_wait"]} seconds before measuring the idle baseline...')
+                    time.sleep(cooldown['baseline_wait'])
+                    state['baseline'] = self._measure_idle(cooldown['probe'] * 2, probe_file)
+                    if state['baseline'] is None:
+                        logger.error('No idle power could be measured, the campaign needs the system_power category')
+                        break
+                    logger.info(f'Idle baseline: {state["baseline"]:.1f} mW')
+                    self._save_campaign_state(state_file, state)
+                waited, idle_power = self._cool_down(state['baseline'], cooldown, probe_file)
+
+                self.iteration = 1
+                extension = '.json.gz' if self.compress else '.json'
+                trace_file = os.path.join(campaign_dir, f'run{position + 1:03d}_config{index + 1}{extension}')
+                logger.info(f'Trace output: {trace_file}')
+                noise = self._trace_quietly(lambda: self._trace_cdp(trace_file), trace_file)
+                run = self._new_samples()
+                run.add_run(self.samples, 1)
+                self.samples = run
+            finally:
+                self._stop_browser(process)
+
+            if not self.samples.count:
+                logger.error('The run has no power samples, the campaign stops here and can be resumed')
+                break
+            record = self._summarize_run(self.samples)
+            record['page'] = self.page_metrics.pop(1, {})
+            record.update({'config': index, 'round': round_index, 'trace': trace_file, 'cooldown': waited, 'idle_power': idle_power, 'noise': noise})
+            state['runs'][str(position)] = record
+            self._save_campaign_state(state_file, state)
+
+        if os.path.exists(probe_file):
+            os.remove(probe_file)
+        if state['runs']:
+            self._generate_campaign_report(configs, state, os.path.join(campaign_dir, 'campaign_report.html'))
+
+    def _load_campaign(self, config_file):
+        """Read a campaign config and expand it into its configurations.
+
+        Lists missing from the config fall back to the command line. Browsers are names (chrome, edge), measured on
+        every channel, or {"name", "path"} objects for custom builds, which have no channel.
+        """
+        try:
+            with open(config_file, encoding='utf-8') as f:
+                campaign = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f'Failed to read campaign config {config_file}: {e}')
+            return None, []
+        self.duration = campaign.get('duration', self.duration)
+        self.repeat = campaign.get('repeat', self.repeat)
+        self.warmup = campaign.get('warmup', self.warmup)
+
+        browsers = campaign.get('browsers', [{'name': self.browser, 'path': self.browser_path}] if self.browser_path else [self.browser])
+        configs = []
+        for url, browser, extra_args in itertools.product(campaign.get('urls', [self.url]), browsers,
+                                                         campaign.get('extra_args', [self.extra_browser_args])):
+            if isinstance(browser, dict):
+                channels = [None]
+            else:
+                channels = campaign.get('channels', [self.channel])
+            for channel in channels:
+                config = {'url': url, 'extra_args': extra_args}
+                if channel is None:
+                    config.update({'browser': browser.get('browser', 'chrome'), 'channel': '', 'path': browser['path'], 'label': browser['name']})
+                else:
+                    config.update({'browser': browser, 'channel': channel, 'path': '', 'label': f'{browser} {channel}'})
+                if extra_args:
+                    config['label'] += f' ({extra_args})'
+                configs.append(config)
+        logger.info(f'Campaign: {len(configs)} configurations x {self.repeat} rounds of {self.duration}s')
+        return campaign, configs
+
+    def _apply_config(self, config):
+        self.url = config['url']
+        self.browser = config['browser']
+        self.channel = config['channel']
+        self.browser_path = config['path']
+        self.extra_browser_args = config['extra_args']
+
+    def _trace_quietly(self, trace, trace_file):
+        """Run trace() into new samples while the host noise is sampled, and run it again while the host was too busy
+        if asked to. Return the noise of the attempt that is kept, or None if the host wasn't sampled.
+        """
+        for attempt in range(self.NOISE_RERUNS + 1):
+            # Power events of each attempt go to samples of their own, only the kept ones are added to the results
+            self.samples = PowerSamples()
+            if self.noise_monitor:
+                self.noise_monitor.start()
+            trace()
+            noise = self.noise_monitor.stop() if self.noise_monitor else None
+            if not noise:
+                return None
+            logger.info(f'Host noise: {self._format_noise(noise)}')
+            if not noise['violations']:
+                return noise
+            if self.noisy != 'rerun' or attempt == self.NOISE_RERUNS:
+                logger.warning(f'Iteration {self.iteration} is flagged as noisy: {", ".join(noise["violations"])}')
+                return noise
+            logger.warning(f'Iteration {self.iteration} was noisy ({", ".join(noise["violations"])}), running it again...')
+            if os.path.exists(trace_file):
+                os.remove(trace_file)
+            time.sleep(self.cooldown)
+
+    def _format_noise(self, noise):
+        parts = [f'CPU {noise["cpu"]}%', f'background {noise["background"]}% (max {noise["background_max"]}%)']
+        if noise['frequency']:
+            parts.append(f'{noise["frequency"]:,} MHz (min {noise["frequency_min"]:,})')
+        if noise['temperature']:
+            parts.append(f'{noise["temperature"]} C')
+        if noise['top']:
+            parts.append('top ' + ', '.join(f'{name} {cpu}%' for name, cpu in noise['top']))
+        return ', '.join(parts)
+
+    def _measure_idle(self, seconds, probe_file):
+        """Trace the browser on about:blank and return the average package power (mW), or None without power samples."""
+        return self._measure_tracing(seconds, probe_file)[0]
+
+    def _measure_tracing(self, seconds, probe_file, categories=None, meter=None):
+        """Trace the browser where it is and return [package power (mW) of the trace, package power (mW) of the meter].
+
+        Each is None when it can't be measured. The meter covers the whole tracing, the transfer of the trace included.
+        """
+        samples = self.samples if hasattr(self, 'samples') else None
+        self.samples = PowerSamples()
+        self.iteration = 1
+        try:
+            start = meter.read() if meter else None
+            if self._run_tracing_cdp_internal(self.ws_url, seconds, probe_file, url=None, categories=categories) is None:
+                return [None, None]
+            meter_power = meter.get_power(start, meter.read()) if meter else None
+            if not self.samples.series:
+                return [None, meter_power]
+            name = 'Package Power' if 'Package Power' in self.samples.series else next(iter(self.samples.series))
+            return [self.samples.get_summary(name)['avg'], meter_power]
+        finally:
+            self.samples = samples
+
+    def _cool_down(self, baseline, cooldown, probe_file):
+        """Wait until the idle power is back within the tolerance of the baseline. Return [seconds waited, last idle power]."""
+        limit = baseline * (1 + cooldown['tolerance'])
+        start_time = time.time()
+        while True:
+            power = self._measure_idle(cooldown['probe'], probe_file)
+            waited = time.time() - start_time
+            if power is None or power <= limit:
+                break
+            if waited >= cooldown['max']:
+                logger.warning(f'Idle power is still {power:.1f} mW after {waited:.0f}s, above the baseline of {baseline:.1f} mW')
+                break
+            logger.info(f'Idle power {power:.1f} mW, cooling down to {limit:.1f} mW...')
+        logger.info(f'Cooled down in {waited:.0f}s')
+        return [waited, power]
+
+    def _summarize_run(self, samples):
+        """Return the steady-state power and energy of each metric, and the frames, of the single iteration in samples."""
+        steady_start, end = samples.get_phases(1, self.warmup)[1], samples.get_range(1)[1]
+        record = {
+            'steady': (end - steady_start) / 1000000,
+            'frames': samples.get_frame_count(1, steady_start, end),
+            'metrics': {},
+        }
+        for name in samples.series:
+            energy, power = samples.get_energy(name, 1, steady_start, end)
+            record['metrics'][name] = {'avg': samples.get_summary(name, 1)['avg'], 'power': power, 'energy': energy}
+        return record
+
+    def _save_campaign_state(self, state_file, state):
+        # Written aside and swapped in, so a crash never leaves half a state
+        with open(state_file + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=1)
+        os.replace(state_file + '.tmp', state_file)
+
+    def _run_analysis(self, paths):
+        """Analyze traces captured before, without a browser.
+
+        Each path, a trace or a folder of traces, is a group whose traces are its iterations and which gets a report of
+        its own. With several groups, a comparison report shows them side by side like the configurations of a
+        campaign. What each trace holds is cached next to it, so analyzing again, with another --warmup or against
+        other groups, doesn't parse the traces again.
+        """
+        if self.output:
+            base = self._strip_trace_extension(self.output)
+        else:
+            log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'gitignore', 'log')
+            os.makedirs(log_dir, exist_ok=True)
+            base = os.path.join(log_dir, f'analysis_{time.strftime("%Y%m%d_%H%M%S")}')
+
+        groups = []
+        for path in paths:
+            trace_files = self._find_traces(path)
+            if trace_files:
+                groups.append([path, trace_files])
+            else:
+                logger.warning(f'No traces found in {path}')
+
+        configs = []
+        state = {'baseline': None, 'order': [], 'runs': {}}
+        for path, trace_files in groups:
+            samples = PowerSamples()
+            loaded = []
+            for trace_file in trace_files:
+                run = self._load_trace(trace_file)
+                if not run:
+                    continue
+                loaded.append(trace_file)
+                samples.add_run(run, len(loaded))
+                record = self._summarize_run(run)
+                record.update({'config': len(configs), 'round': len(loaded) - 1, 'trace': trace_file, 'cooldown': None, 'idle_power': None})
+                state['runs'][str(len(state['order']))] = record
+                state['order'].append([len(configs), len(loaded) - 1])
+            if not loaded:
+                logger.warning(f'No power samples in the traces of {path}')
+                continue
+
+            logger.info(f'--- {path}: {len(loaded)} traces ---')
+            self.repeat = len(loaded)
+            ranges = [samples.get_range(it) for it in range(1, self.repeat + 1)]
+            self.duration = round(sum(end - start for start, end in ranges) / len(ranges) / 1000000)
+            report_path = f'{base}_report.html' if len(groups) == 1 else f'{base}_group{len(configs) + 1}_report.html'
+            self._generate_html_report(samples, report_path, loaded)
+            configs.append({'label': path, 'url': self.url})
+
+        if len(configs) > 1:
+            self._generate_campaign_report(configs, state, f'{base}_comparison_report.html',
+                                           f'{len(configs)} groups of traces, {len(state["runs"])} runs, analyzed offline')
+
+    def _find_traces(self, path):
+        """Return the trace of a path, or the traces in a folder in natural order, so that iter10 comes after iter9."""
+        if os.path.isfile(path):
+            return [path]
+        if not os.path.isdir(path):
+            return []
+        names = [name for name in os.listdir(path)
+                 if name.endswith(tuple(self.TRACE_EXTENSIONS)) and not self.NON_TRACE_FILES.search(name)]
+        names.sort(key=lambda name: [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', name)])
+        return [os.path.join(path, name) for name in names]
+
+    def _load_trace(self, trace_file):
+        """Return the PowerSamples of a trace as iteration 1, from its cache if it has a valid one, or None if it has no power samples."""
+        run = PowerCache.load(trace_file)
+        if run is not None:
+            logger.info(f'{trace_file}: {run.count:,} power samples from the cache')
+        else:
+            logger.info(f'Analyzing {trace_file}...')
+            run = PowerSamples()
+            self.samples = run
+            self.iteration = 1
+            self._analyze_trace(trace_file)
+            try:
+                PowerCache.save(trace_file, run, PowerCache.get_hash(trace_file))
+            except OSError as e:
+                logger.warning(f'Failed to cache {trace_file}: {e}')
+        return run if run.count else None
+
+    def _run_calibration(self):
+        browser_path = self._get_browser_path()
+        if not browser_path or not os.path.exists(browser_path):
+            logger.error(f'Browser not found at: {browser_path}')
+            return
+        self._calibrate(browser_path, self._get_user_data_dir())
+
+    def _calibrate(self, browser_path, user_data_dir):
+        """Measure what the measurement costs on about:blank, cache it for this host and browser version and return it.
+
+        The states, measured in turn in each round so drift spreads over all of them:
+        - plain: the browser without remote debugging and logging
+        - debugging: the browser as measured, not tracing
+        - power: tracing the system_power category only
+        - full: tracing all the categories of a measurement
+        With RAPL (Linux, readable energy_uj) every state is measured independently of the browser and the overhead is
+        full - plain. Otherwise only the traced states have a power, and the overhead is full - power, the cost of the
+        categories beyond system_power.
+        """
+        meter = RaplMeter()
+        if not meter.available:
+            logger.warning('RAPL is not available, only the overhead of the extra trace categories can be calibrated')
+        settings = self.CALIBRATION
+        probe_file = os.path.join(os.path.dirname(self._get_calibration_file()), 'calibration_probe.json')
+        states = {'plain': [], 'debugging': [], 'power': [], 'full': []}
+        trace_states = {'power': [], 'full': []}
+        for round_index in range(settings['rounds']):
+            logger.info(f'--- Calibration round {round_index + 1}/{settings["rounds"]} ---')
+            if meter.available:
+                cmd = [arg for arg in self._build_browser_command(browser_path, user_data_dir)
+                       if not any(arg.startswith(prefix) for prefix in self.MEASUREMENT_ARGS)]
+                process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                try:
+                    time.sleep(settings['settle'])
+                    start = meter.read()
+                    time.sleep(settings['seconds'])
+                    states['plain'].append(meter.get_power(start, meter.read()))
+                finally:
+                    self._stop_browser(process)
+
+            process = self._start_browser(browser_path, user_data_dir)
+            if not process:
+                return None
+            try:
+                time.sleep(settings['settle'])
+                if meter.available:
+                    start = meter.read()
+                    time.sleep(settings['seconds'])
+                    states['debugging'].append(meter.get_power(start, meter.read()))
+                for state, categories in [['power', [self.POWER_CATEGORY]], ['full', self.TRACE_CATEGORIES]]:
+                    trace_power, meter_power = self._measure_tracing(settings['seconds'], probe_file, categories, meter if meter.available else None)
+                    if meter_power is not None:
+                        states[state].append(meter_power)
+                    if trace_power is not None:
+                        trace_states[state].append(trace_power)
+            finally:
+                self._stop_browser(process)
+        if os.path.exists(probe_file):
+            os.remove(probe_file)
+
+        if meter.available:
+            source = 'rapl'
+            powers = {state: sum(values) / len(values) for state, values in states.items() if values}
+        else:
+            source = 'trace'
+            powers = {state: sum(values) / len(values) for state, values in trace_states.items() if values}
+        if 'full' not in powers:
+            logger.error('The calibration measured no power')
+            return None
+        baseline = powers.get('plain', powers.get('power'))
+        calibration = {
+            'overhead': max(powers['full'] - baseline, 0.0),
+            'source': source,
+            'states': powers,
+            'browser_version': self._get_browser_version(browser_path),
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        for state, power in powers.items():
+            logger.info(f'Calibration {state}: {power:,.1f} mW')
+        logger.info(f'Measurement overhead: {calibration["overhead"]:,.1f} mW ({source})')
+
+        cache = self._load_calibrations()
+        cache[self._get_calibration_key(browser_path, calibration['browser_version'])] = calibration
+        with open(self._get_calibration_file(), 'w', encoding='utf-8') as f:
+            json.dump(cache, f, indent=1)
+        return calibration
+
+    def _get_calibration(self, browser_path, user_data_dir):
+        """Return the cached calibration of this host and browser version, calibrating if there is none."""
+        key = self._get_calibration_key(browser_path, self._get_browser_version(browser_path))
+        calibration = self._load_calibrations().get(key)
+        if calibration:
+            logger.info(f'Measurement overhead: {calibration["overhead"]:,.1f} mW ({calibration["source"]}, calibrated {calibration["time"]})')
+            return calibration
+        logger.info('No calibration for this host and browser version yet, calibrating...')
+        return self._calibrate(browser_path, user_data_dir)
+
+    def _get_calibration_file(self):
+        toolkit_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        os.makedirs(os.path.join(toolkit_dir, 'gitignore'), exist_ok=True)
+        return os.path.join(toolkit_dir, 'gitignore', 'power_calibration.json')
+
+    def _load_calibrations(self):
+        try:
+            with open(self._get_calibration_file(), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _get_calibration_key(self, browser_path, browser_version):
+        return f'{platform.node()}|{os.path.normcase(browser_path)}|{browser_version}'
+
+    def _get_browser_version(self, browser_path):
+        """Return the browser version without starting it, 'unknown' if it can't be told."""
+        if sys.platform == 'win32':
+            # Windows installs keep the binaries of each version in a folder named after it next to the executable
+            versions = [name for name in os.listdir(os.path.dirname(browser_path)) if re.match(r'^\d+(\.\d+){3}$', name)]
+            if versions:
+                return max(versions, key=lambda version: [int(part) for part in version.split('.')])
+            return 'unknown'
+        try:
+            output = subprocess.run([browser_path, '--version'], capture_output=True, text=True, timeout=30).stdout
+        except (OSError, subprocess.SubprocessError):
+            return 'unknown'
+        match = re.search(r'\d+(\.\d+){3}', output)
+        return match.group(0) if match else 'unknown'
+
+    def _new_samples(self):
+        """Samples of a measurement, with the calibrated overhead subtracted from Package Power if asked to."""
+        samples = PowerSamples()
+        if self.calibration:
+            samples.offsets['Package Power'] = self.calibration['overhead']
+        return samples
+
     def _run_perfetto_tracing(self, browser_path, user_data_dir, trace_file):
         """Run tracing using command-line flags (perfetto/trace-startup)."""
         # Build command with trace-startup flags
@@ -449,79 +1826,71 @@ examples:
 
         process = None
         try:
-            # Start the browser process
-            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-            # Wait for trace-startup-duration to complete
-            # The trace file should be written after this duration
-            logger.info(f'Waiting for trace-startup-duration ({self.duration} seconds)...')
-            time.sleep(self.duration)
-
-            # Give Chrome a bit more time to finalize the trace
-            logger.info('Waiting for trace to finalize...')
-            time.sleep(3)
-
-            # Check if trace file was created before terminating
             if os.path.exists(trace_file):
-                logger.info('Trace file detected, terminating browser...')
-            else:
-                logger.info('Trace file not yet created, waiting longer...')
-                time.sleep(5)
-
-            # Terminate the browser gracefully to flush trace
-            logger.info('Terminating browser...')
-            process.terminate()
+                os.remove(trace_file)
+            # stderr is drained by the DevTools watcher, so the browser never blocks on it. Nothing waits for DevTools.
+            process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            self._wait_for_devtools(process, timeout=0)
 
-            try:
-                _, stderr = process.communicate(timeout=30)
-                if stderr:
-                    stderr_text = stderr.decode('utf-8', errors='ignore')
-                    if stderr_text.strip() and 'ERROR' in stderr_text:
-                        logger.warning(f'Browser stderr: {stderr_text[:500]}')
-            except subprocess.TimeoutExpired:
-                logger.warning('Browser did not terminate gracefully, killing...')
-                process.kill()
-                process.communicate()
-
-            # Wait for trace file to be flushed
-            time.sleep(3)
-
-            # Check if trace file was created
-            if os.path.exists(trace_file):
-                file_size = os.path.getsize(trace_file)
-                logger.info(f'Trace file created: {trace_file} ({file_size} bytes)')
-                return self._analyze_trace(trace_file)
-            else:
+            logger.info(f'Waiting for the trace of {self.duration} seconds...')
+            if not self._wait_for_trace_file(trace_file, process):
                 logger.error(f'Trace file was not created: {trace_file}')
-                # Check for trace files in other locations
-                self._search_trace_files(user_data_dir)
-                return []
+                return 0
+
+            # The trace is complete, the browser can go
+            self._stop_browser(process)
+            file_size = os.path.getsize(trace_file)
+            logger.info(f'Trace file created: {trace_file} ({file_size} bytes)')
+            return self._analyze_trace(trace_file)
 
         except Exception as e:
             logger.error(f'Error running browser: {e}')
-            return []
+            return 0
         finally:
             if process and process.poll() is None:
                 process.kill()
                 process.wait()
 
-    def _search_trace_files(self, user_data_dir):
-        """Search for trace files in common locations."""
-        search_paths = [
-            user_data_dir,
-            os.path.join(user_data_dir, 'Default'),
-            os.environ.get('TEMP', ''),
-            os.environ.get('LOCALAPPDATA', ''),
-        ]
-        logger.info('Searching for trace files...')
-        for path in search_paths:
-            if path and os.path.exists(path):
-                for f in os.listdir(path):
-                    if 'trace' in f.lower() and f.endswith('.json'):
-                        logger.info(f'Found trace file: {os.path.join(path, f)}')
+    def _wait_for_trace_file(self, trace_file, process, timeout=60, interval=0.5, stable=3):
+        """Wait until the browser has written the startup trace, once the trace duration is over.
+
+        The trace is complete when the browser has exited, or when its size hasn't changed for stable seconds: the
+        browser writes it in chunks and may pause between them. Return False if no complete trace shows up within
+        timeout seconds after the duration.
+        """
+        start_time = time.time()
+        last_size = -1
+        stable_since = None
+        while time.time() - start_time < self.duration + timeout:
+            time.sleep(interval)
+            exited = process.poll() is not None
+            if not os.path.exists(trace_file):
+                if exited:
+                    return False
+                continue
+            size = os.path.getsize(trace_file)
+            now = time.time()
+            if size != last_size:
+                last_size = size
+                stable_since = now
+            if not size or now - start_time < self.duration:
+                continue
+            if exited or now - stable_since >= stable:
+                return True
+        return False
 
     def _run_cdp_tracing(self, browser_path, user_data_dir, trace_file):
-        """Run tracing using Chrome DevTools Protocol."""
+        """Run tracing using Chrome DevTools Protocol in a browser launched for this iteration."""
+        process = self._start_browser(browser_path, user_data_dir)
+        if not process:
+            return 0
+        try:
+            return self._trace_cdp(trace_file)
+        finally:
+            self._stop_browser(process)
+
+    def _start_browser(self, browser_path, user_data_dir):
+        """Start the browser with remote debugging and wait for DevTools. Return the process, or None on failure."""
         # Build command without trace-startup flags
         cmd = self._build_browser_command(browser_path, user_data_dir, trace_file=None)
         logger.info('Starting browser...')
@@ -529,188 +1898,229 @@ examples:
 
         process = None
         try:
-            # Start the browser process
-            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            start_time = time.time()
+            process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
 
             # Wait for DevTools to be ready
             logger.info('Waiting for DevTools to be ready...')
-            version_info = self._wait_for_devtools()
-            if not version_info:
+            self.ws_url = self._wait_for_devtools(process)
+            if not self.ws_url:
                 logger.error('DevTools did not become available')
-                return
-
-            logger.info(f'Browser version: {version_info.get("Browser", "unknown")}')
+                self._stop_browser(process)
+                return None
+
+            self.launch_times.append(time.time() - start_time)
+            version_info = self._run_cdp(lambda client: client.send('Browser.getVersion'))
+            logger.info(f'Browser version: {version_info.get("product", "unknown")} '
+                        f'(ready in {self.launch_times[-1]:.2f}s)')
+            return process
+        except Exception as e:
+            logger.error(f'Error running browser: {e}')
+            if process:
+                self._stop_browser(process)
+            return None
 
-            # Get the browser WebSocket URL for tracing
-            ws_url = self._get_browser_ws_url()
-            if not ws_url:
-                logger.error('Could not get browser WebSocket URL')
-                return
+    def _stop_browser(self, process):
+        logger.info('Terminating browser...')
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
 
+    def _trace_cdp(self, trace_file):
+        """Trace the running browser for the duration. Return the number of power events."""
+        try:
             # Run tracing with a persistent connection
             logger.info('Starting power tracing via DevTools Protocol...')
-            if self._run_tracing_cdp_internal(ws_url, self.duration, trace_file):
-                return self._analyze_trace(trace_file)
-            else:
+            power_count = self._run_tracing_cdp_internal(self.ws_url, self.duration, trace_file, self.url)
+            if power_count is None:
                 logger.error('Tracing failed')
-                return []
-
+                return 0
+            return power_count
         except Exception as e:
-            logger.error(f'Error running browser: {e}')
-            return []
-        finally:
-            # Terminate the browser
-            if process:
-                logger.info('Terminating browser...')
-                process.terminate()
-                try:
-                    process.wait(timeout=10)
-                except subprocess.TimeoutExpired:
-                    process.kill()
-                    process.wait()
+            logger.error(f'Error tracing browser: {e}')
+            return 0
+
+    def _prewarm(self, browser_path, user_data_dir):
+        """Load the URL untraced in a throwaway browser, so the profile's caches are warm for cold-start iterations."""
+        process = self._start_browser(browser_path, user_data_dir)
+        if not process:
+            return
+        logger.info(f'Prewarming for {self.prewarm} seconds...')
+        self._open_page(self.url)
+        time.sleep(self.prewarm)
+        self._stop_browser(process)
+        self.launch_times.pop()
+
+    def _report_launch_times(self):
+        """Log the browser launch cost, and what reusing one browser saved compared to a launch per iteration."""
+        if not self.launch_times:
+            return
+        avg_launch = sum(self.launch_times) / len(self.launch_times)
+        if self.cold_start:
+            logger.info(f'Browser launches: {len(self.launch_times)}, {avg_launch:.2f}s on average')
+        else:
+            self.time_saved = avg_launch * (self.repeat - 1)
+            logger.info(f'Browser launches: 1 ({avg_launch:.2f}s), reused for {self.repeat} iterations, '
+                        f'saving about {self.time_saved:.2f}s')
 
     def _analyze_trace(self, trace_file):
         """Analyze the trace file and print power-related information."""
         try:
-            with open(trace_file, 'r', encoding='utf-8') as f:
-                trace_data = json.load(f)
-
-            # Get trace events
-            if 'traceEvents' in trace_data:
-                events = trace_data['traceEvents']
-            elif isinstance(trace_data, list):
-                events = trace_data
+            if trace_file.endswith('.pftrace'):
+                collector = PowerCounterCollector(self.samples, self.iteration)
+                packets = ProtoTraceStream(collector.add)
+                with open(trace_file, 'rb') as f:
+                    while True:
+                        data = f.read(1024 * 1024)
+                        if not data:
+                            break
+                        packets.feed(data)
+                if not packets.complete:
+                    logger.warning('The trace ends in the middle of a packet, it may be cut')
+                collector.finish()
             else:
-                events = []
-
-            logger.info(f'Total trace events: {len(events)}')
-
-            # Collect categories and look for power-related events
-            categories = set()
-            power_events = []
-            event_names = set()
-
-            for event in events:
-                if isinstance(event, dict):
-                    cat = event.get('cat', '')
-                    name = event.get('name', '')
-                    categories.add(cat)
-                    event_names.add(name)
-                    if 'power' in cat.lower() or 'power' in name.lower() or 'energy' in name.lower():
-                        power_events.append(event)
-
-            logger.info(f'Trace categories: {sorted(categories)}')
-            logger.info(f'Unique event names: {len(event_names)}')
-            logger.info(f'Power-related trace events: {len(power_events)}')
-
-            if power_events:
-                logger.info('Sample power events:')
-                for event in power_events[:10]:  # Show first 10 events
-                    logger.info(f'  - {event.get("name", "unknown")}: {event.get("args", {})}')
-            else:
-                logger.warning('No power events found. The system_power category may not be available on this platform.')
-                logger.info('The trace file can still be viewed in chrome://tracing or https://ui.perfetto.dev/')
-                
-            return power_events
+                collector = PowerEventCollector(self.samples, self.iteration)
+                events = TraceEventStream(collector.add)
+                opener = gzip.open if trace_file.endswith('.gz') else open
+                with opener(trace_file, 'rt', encoding='utf-8') as f:
+                    while True:
+                        text = f.read(1024 * 1024)
+                        if not text:
+                            break
+                        events.feed(text)
+            self._log_trace_summary(collector)
+            return collector.power_count
 
         except json.JSONDecodeError as e:
             logger.warning(f'Could not parse trace file as JSON: {e}')
-            return []
+            return 0
         except Exception as e:
             logger.warning(f'Error analyzing trace: {e}')
+            return 0
+
+    def _log_trace_summary(self, collector):
+        if isinstance(collector, PowerCounterCollector):
+            logger.info(f'Total trace packets: {collector.total}')
+            logger.info(f'Power counter tracks: {sorted(collector.categories)}')
+        else:
+            logger.info(f'Total trace events: {collector.total}')
+            logger.info(f'Trace categories: {sorted(collector.categories)}')
+        logger.info(f'Power-related trace events: {collector.power_count}')
+
+        if collector.examples:
+            logger.info('Sample power events:')
+            for event in collector.examples:
+                logger.info(f'  - {event.get("name", "unknown")}: {event.get("args", {})}')
+        else:
+            logger.warning('No power events found. The system_power category may not be available on this platform.')
+            logger.info('The trace file can still be viewed in chrome://tracing or https://ui.perfetto.dev/')
+
+    def _format_overhead(self):
+        if not self.calibration:
+            return ''
+        return f"""    <div class="info-card">
+      <div class="info-label">Measurement Overhead</div>
+      <div class="info-value">{self.calibration['overhead']:,.1f} mW ({self.calibration['source']}), subtracted from Package Power</div>
+    </div>
+"""
+
+    def _format_launches(self):
+        if not self.launch_times:
+            return 'N/A'
+        text = f'{len(self.launch_times)} &times; {sum(self.launch_times) / len(self.launch_times):.2f}s'
+        if self.time_saved:
+            text += f' ({self.time_saved:.1f}s saved)'
+        return text
+
+    def _get_phase_rows(self, samples, metric_names):
+        """Average duration, power and energy of each phase over the iterations, then the steady state and whole run."""
+        iterations = sorted({it for series in samples.series.values() for it in series})
+        # phase name -> [[duration, {metric: [power, energy]}] per iteration]
+        phases = {}
+        totals = {'Steady state (total)': [], 'Whole run': []}
+        for it in iterations:
+            it_phases, steady_start = samples.get_phases(it, self.warmup)
+            start, end = samples.get_range(it)
+            it_rows = {}
+            for name, phase_start, phase_end in it_phases:
+                # A mark may be set more than once, its phases add up
+                row = it_rows.setdefault(name, [0.0, {metric: [0.0, 0.0] for metric in metric_names}])
+                row[0] += (phase_end - phase_start) / 1000000
+                for metric in metric_names:
+                    row[1][metric][1] += samples.get_energy(metric, it, phase_start, phase_end)[0]
+            for name, row in it_rows.items():
+                phases.setdefault(name, []).append(row)
+            for name, (total_start, total_end) in [['Steady state (total)', (steady_start, end)], ['Whole run', (start, end)]]:
+                metrics = {metric: [0.0, samples.get_energy(metric, it, total_start, total_end)[0]] for metric in metric_names}
+                totals[name].append([(total_end - total_start) / 1000000, metrics])
+
+        rows = []
+        for name, it_rows in list(phases.items()) + list(totals.items()):
+            if not it_rows:
+                continue
+            row = {'name': name, 'runs': len(it_rows), 'total': name in totals, 'metrics': {}}
+            row['duration'] = sum(it_row[0] for it_row in it_rows) / len(it_rows)
+            for metric in metric_names:
+                energies = [it_row[1][metric][1] for it_row in it_rows]
+                powers = [it_row[1][metric][1] / it_row[0] for it_row in it_rows if it_row[0]]
+                row['metrics'][metric] = [sum(powers) / len(powers) if powers else 0.0, sum(energies) / len(energies)]
+            rows.append(row)
+        # Phases in the order they happen
+        first_starts = {}
+        for it in iterations:
+            for name, phase_start, _ in samples.get_phases(it, self.warmup)[0]:
+                first_starts.setdefault(name, phase_start - samples.get_range(it)[0])
+        rows.sort(key=lambda row: (row['total'], first_starts.get(row['name'], 0)))
+        return rows
+
+    def _get_frame_rows(self, samples, metric_names):
+        """Frame rate, energy per frame and frames per joule of each metric over the steady state of the iterations."""
+        if not samples.frames:
             return []
-
-    def _generate_html_report(self, power_events, html_path, trace_files):
-        """Generate an HTML report summarizing power consumption across iterations."""
-        import collections
-        import math
-
-        # Structure: metric_name -> iteration -> [values]
-        iter_stats = collections.defaultdict(lambda: collections.defaultdict(list))
-        global_stats = collections.defaultdict(list)
-
-        has_iterations = self.repeat > 1
-
-        for event in power_events:
-            name = event.get('name')
-            value = event.get('args', {}).get('value')
-            iteration = event.get('_iteration', 1)
-
-            if name and value is not None:
-                iter_stats[name][iteration].append(value)
-                global_stats[name].append(value)
-
-        def _std_dev(values):
-            if len(values) < 2:
-                return 0.0
-            mean = sum(values) / len(values)
-            return math.sqrt(sum((v - mean) ** 2 for v in values) / (len(values) - 1))
-
-        def _median(values):
-            s = sorted(values)
-            n = len(s)
-            if n % 2 == 1:
-                return s[n // 2]
-            return (s[n // 2 - 1] + s[n // 2]) / 2
-
-        summary = []
-        for name, values in global_stats.items():
-            avg_val = sum(values) / len(values)
-            min_val = min(values)
-            max_val = max(values)
-            std_val = _std_dev(values)
-            med_val = _median(values)
-
-            iter_data = {}
-            if has_iterations:
-                for it in range(1, self.repeat + 1):
-                    it_values = iter_stats[name].get(it, [])
-                    if it_values:
-                        iter_data[it] = {
-                            'avg': sum(it_values) / len(it_values),
-                            'min': min(it_values),
-                            'max': max(it_values),
-                            'std': _std_dev(it_values),
-                            'med': _median(it_values),
-                            'count': len(it_values),
-                        }
-                    else:
-                        iter_data[it] = {'avg': 0, 'min': 0, 'max': 0, 'std': 0, 'med': 0, 'count': 0}
-
-            summary.append({
-                'name': name,
-                'avg': avg_val,
-                'min': min_val,
-                'max': max_val,
-                'std': std_val,
-                'med': med_val,
-                'count': len(values),
-                'iters': iter_data,
+        iterations = sorted({it for series in samples.series.values() for it in series})
+        rates = []
+        # metric -> [[mJ per frame, frames per J] per iteration]
+        efficiency = {metric: [] for metric in metric_names}
+        for it in iterations:
+            steady_start, end = samples.get_phases(it, self.warmup)[1], samples.get_range(it)[1]
+            frames = samples.get_frame_count(it, steady_start, end)
+            if not frames or end <= steady_start:
+                continue
+            rates.append(frames / ((end - steady_start) / 1000000))
+            for metric in metric_names:
+                energy = samples.get_energy(metric, it, steady_start, end)[0]
+                if energy > 0:
+                    efficiency[metric].append([energy / frames, frames / (energy / 1000)])
+
+        rows = []
+        fps = mean_ci(rates)
+        for metric in metric_names:
+            if not efficiency[metric]:
+                continue
+            rows.append({
+                'name': metric,
+                'runs': len(efficiency[metric]),
+                'fps': fps,
+                'energy_per_frame': mean_ci([value[0] for value in efficiency[metric]]),
+                'frames_per_joule': mean_ci([value[1] for value in efficiency[metric]]),
             })
-
-        # Build per-iteration averages for chart data
-        metric_names = [s['name'] for s in summary]
-        chart_iter_data = {}
-        if has_iterations:
-            for it in range(1, self.repeat + 1):
-                chart_iter_data[it] = [s['iters'].get(it, {}).get('avg', 0) for s in summary]
-
-        # Color assignments per metric (up to 6)
-        metric_colors = ['#3498db', '#e74c3c', '#2ecc71', '#f39c12', '#9b59b6', '#1abc9c']
-
-        # Generate timestamp
-        report_time = time.strftime('%Y-%m-%d %H:%M:%S')
-
-        # ---- Build HTML ----
-        html = []
-        html.append(f"""<!DOCTYPE html>
-<html lang="en">
-<head>
-<meta charset="UTF-8">
-<meta name="viewport" content="width=device-width, initial-scale=1.0">
-<title>Power Consumption Report</title>
-<style>
-  :root {{
+        return rows
+
+    def _log_phases(self, samples, metric_names):
+        for row in self._get_phase_rows(samples, metric_names):
+            values = ', '.join(f'{metric} {power:,.1f} mW / {energy:,.1f} mJ' for metric, (power, energy) in row['metrics'].items())
+            logger.info(f'Phase {row["name"]} ({row["duration"]:.2f}s): {values}')
+        for row in self._get_frame_rows(samples, metric_names):
+            energy, energy_ci = row['energy_per_frame']
+            frames, frames_ci = row['frames_per_joule']
+            logger.info(f'{row["name"]}: {row["fps"][0]:.1f} FPS, {energy:.2f} +/- {energy_ci:.2f} mJ/frame, '
+                        f'{frames:.1f} +/- {frames_ci:.1f} frames/J over {row["runs"]} runs')
+
+    # Style of the HTML reports
+    REPORT_STYLE = """  :root {
     --bg: #0f172a;
     --surface: #1e293b;
     --surface2: #334155;
@@ -722,202 +2132,209 @@ examples:
     --green: #34d399;
     --red: #f87171;
     --orange: #fb923c;
-  }}
-  * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-  body {{
+  }
+  * { margin: 0; padding: 0; box-sizing: border-box; }
+  body {
     font-family: 'Segoe UI', -apple-system, BlinkMacSystemFont, sans-serif;
     background: var(--bg);
     color: var(--text);
     line-height: 1.6;
     padding: 0;
-  }}
-  .container {{ max-width: 1200px; margin: 0 auto; padding: 32px 24px; }}
-  header {{
+  }
+  .container { max-width: 1200px; margin: 0 auto; padding: 32px 24px; }
+  header {
     background: linear-gradient(135deg, #1e293b 0%, #0f172a 100%);
     border-bottom: 1px solid var(--border);
     padding: 32px 0;
-  }}
-  header .container {{ padding-top: 0; padding-bottom: 0; }}
-  h1 {{
+  }
+  header .container { padding-top: 0; padding-bottom: 0; }
+  h1 {
     font-size: 28px;
     font-weight: 700;
     background: linear-gradient(90deg, var(--accent), var(--accent2));
     -webkit-background-clip: text;
     -webkit-text-fill-color: transparent;
     margin-bottom: 4px;
-  }}
-  .subtitle {{ color: var(--text-dim); font-size: 14px; }}
+  }
+  .subtitle { color: var(--text-dim); font-size: 14px; }
 
   /* Info cards row */
-  .info-grid {{
+  .info-grid {
     display: grid;
     grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
     gap: 16px;
     margin: 24px 0;
-  }}
-  .info-card {{
+  }
+  .info-card {
     background: var(--surface);
     border: 1px solid var(--border);
     border-radius: 12px;
     padding: 16px 20px;
-  }}
-  .info-card .info-label {{
+  }
+  .info-card .info-label {
     font-size: 11px;
     text-transform: uppercase;
     letter-spacing: 1px;
     color: var(--text-dim);
     margin-bottom: 4px;
-  }}
-  .info-card .info-value {{
+  }
+  .info-card .info-value {
     font-size: 18px;
     font-weight: 600;
     color: var(--text);
     word-break: break-all;
-  }}
-  .info-card .info-value a {{
+  }
+  .info-card .info-value a {
     color: var(--accent);
     text-decoration: none;
-  }}
-  .info-card .info-value a:hover {{ text-decoration: underline; }}
+  }
+  .info-card .info-value a:hover { text-decoration: underline; }
 
   /* Metric highlight cards */
-  .metric-cards {{
+  .metric-cards {
     display: grid;
     grid-template-columns: repeat(auto-fit, minmax(300px, 1fr));
     gap: 20px;
     margin: 24px 0;
-  }}
-  .metric-card {{
+  }
+  .metric-card {
     background: var(--surface);
     border: 1px solid var(--border);
     border-radius: 12px;
     padding: 20px 24px;
     position: relative;
     overflow: hidden;
-  }}
-  .metric-card::before {{
+  }
+  .metric-card::before {
     content: '';
     position: absolute;
     top: 0; left: 0; right: 0;
     height: 3px;
-  }}
-  .metric-card .mc-name {{
+  }
+  .metric-card .mc-name {
     font-size: 14px;
     color: var(--text-dim);
     margin-bottom: 12px;
     font-weight: 500;
-  }}
-  .metric-card .mc-avg {{
+  }
+  .metric-card .mc-avg {
     font-size: 36px;
     font-weight: 700;
     margin-bottom: 4px;
-  }}
-  .metric-card .mc-unit {{
+  }
+  .metric-card .mc-unit {
     font-size: 14px;
     color: var(--text-dim);
     font-weight: 400;
-  }}
-  .metric-card .mc-stats {{
+  }
+  .metric-card .mc-stats {
     display: flex;
     gap: 16px;
     margin-top: 16px;
     padding-top: 12px;
     border-top: 1px solid var(--border);
-  }}
-  .mc-stat {{ flex: 1; }}
-  .mc-stat-label {{ font-size: 11px; color: var(--text-dim); text-transform: uppercase; letter-spacing: 0.5px; }}
-  .mc-stat-value {{ font-size: 15px; font-weight: 600; margin-top: 2px; }}
-  .mc-stat-value.min {{ color: var(--green); }}
-  .mc-stat-value.max {{ color: var(--red); }}
-  .mc-stat-value.med {{ color: var(--orange); }}
-  .mc-stat-value.std {{ color: var(--accent2); }}
+  }
+  .mc-stat { flex: 1; }
+  .mc-stat-label { font-size: 11px; color: var(--text-dim); text-transform: uppercase; letter-spacing: 0.5px; }
+  .mc-stat-value { font-size: 15px; font-weight: 600; margin-top: 2px; }
+  .mc-stat-value.min { color: var(--green); }
+  .mc-stat-value.max { color: var(--red); }
+  .mc-stat-value.med { color: var(--orange); }
+  .mc-stat-value.std { color: var(--accent2); }
 
   /* Section headers */
-  .section-title {{
+  .section-title {
     font-size: 20px;
     font-weight: 600;
     margin: 36px 0 16px;
     padding-bottom: 8px;
     border-bottom: 1px solid var(--border);
-  }}
+  }
 
   /* Bar chart */
-  .chart-container {{
+  .chart-container {
     background: var(--surface);
     border: 1px solid var(--border);
     border-radius: 12px;
     padding: 24px;
     margin: 16px 0;
-  }}
-  .chart-row {{
+  }
+  .chart-row {
     display: flex;
     align-items: center;
     margin-bottom: 8px;
-  }}
-  .chart-label {{
+  }
+  .chart-label {
     width: 140px;
     font-size: 13px;
     color: var(--text-dim);
     flex-shrink: 0;
     text-align: right;
     padding-right: 16px;
-  }}
-  .chart-bar-group {{
+  }
+  .chart-bar-group {
     flex: 1;
     display: flex;
     flex-direction: column;
     gap: 3px;
-  }}
-  .chart-bar-wrap {{
+  }
+  .chart-bar-wrap {
     display: flex;
     align-items: center;
     gap: 8px;
-  }}
-  .chart-bar {{
+  }
+  .chart-bar {
     height: 22px;
     border-radius: 4px;
     transition: width 0.6s ease;
     min-width: 2px;
-  }}
-  .chart-bar-val {{
+  }
+  .chart-bar-val {
     font-size: 12px;
     color: var(--text-dim);
     white-space: nowrap;
-  }}
-  .chart-legend {{
+  }
+  .chart-legend {
     display: flex;
     gap: 16px;
     margin-top: 16px;
     padding-top: 12px;
     border-top: 1px solid var(--border);
     flex-wrap: wrap;
-  }}
-  .chart-legend-item {{
+  }
+  .chart-legend-item {
     display: flex;
     align-items: center;
     gap: 6px;
     font-size: 12px;
     color: var(--text-dim);
-  }}
-  .chart-legend-dot {{
+  }
+  .chart-legend-dot {
     width: 10px;
     height: 10px;
     border-radius: 3px;
-  }}
+  }
+
+  /* Time series */
+  .series-title { font-size: 14px; color: var(--text-dim); margin-bottom: 8px; }
+  .series-chart { width: 100%; height: auto; display: block; }
+  .series-chart text { fill: var(--text-dim); font-size: 11px; }
+  .series-chart .grid { stroke: var(--border); stroke-width: 1; }
+  .series-chart polyline { fill: none; stroke-width: 1.5; }
 
   /* Detailed table */
-  .table-wrap {{
+  .table-wrap {
     background: var(--surface);
     border: 1px solid var(--border);
     border-radius: 12px;
     overflow: hidden;
     margin: 16px 0;
-  }}
-  table {{
+  }
+  table {
     width: 100%;
     border-collapse: collapse;
-  }}
-  th {{
+  }
+  th {
     background: var(--surface2);
     font-size: 11px;
     text-transform: uppercase;
@@ -927,50 +2344,50 @@ examples:
     text-align: right;
     font-weight: 600;
     border-bottom: 1px solid var(--border);
-  }}
-  th:first-child {{ text-align: left; }}
-  td {{
+  }
+  th:first-child { text-align: left; }
+  td {
     padding: 12px 16px;
     font-size: 14px;
     text-align: right;
     border-bottom: 1px solid rgba(71,85,105,0.4);
     font-variant-numeric: tabular-nums;
-  }}
-  td:first-child {{
+  }
+  td:first-child {
     text-align: left;
     font-weight: 600;
     color: var(--text);
-  }}
-  tr:last-child td {{ border-bottom: none; }}
-  tr:hover td {{ background: rgba(56,189,248,0.04); }}
-  .iter-header {{ color: var(--accent) !important; }}
+  }
+  tr:last-child td { border-bottom: none; }
+  tr:hover td { background: rgba(56,189,248,0.04); }
+  .iter-header { color: var(--accent) !important; }
 
   /* Trace files */
-  .trace-files {{
+  .trace-files {
     background: var(--surface);
     border: 1px solid var(--border);
     border-radius: 12px;
     padding: 16px 20px;
     margin-top: 20px;
-  }}
-  .trace-files summary {{
+  }
+  .trace-files summary {
     cursor: pointer;
     font-size: 14px;
     color: var(--text-dim);
     font-weight: 500;
-  }}
-  .trace-files ul {{
+  }
+  .trace-files ul {
     margin-top: 8px;
     padding-left: 20px;
-  }}
-  .trace-files li {{
+  }
+  .trace-files li {
     font-size: 13px;
     color: var(--text-dim);
     padding: 2px 0;
     font-family: 'Cascadia Code', 'Fira Code', monospace;
-  }}
+  }
 
-  footer {{
+  footer {
     margin-top: 40px;
     padding-top: 16px;
     border-top: 1px solid var(--border);
@@ -978,7 +2395,224 @@ examples:
     color: var(--text-dim);
     display: flex;
     justify-content: space-between;
-  }}
+  }"""
+
+    # Points per line of the time series charts, enough for the chart width and still quick to render
+    MAX_CHART_POINTS = 1000
+
+    def _build_time_series(self, samples, stat, color):
+        """Build an SVG chart of a metric over time with one line per iteration, each downsampled with LTTB."""
+        width, height = 1000, 220
+        left, right, top, bottom = 60, 10, 10, 30
+        lines = []
+        duration = 0.0
+        for it, (timestamps, values) in sorted(samples.series[stat['name']].items()):
+            if not timestamps:
+                continue
+            seconds = [(ts - timestamps[0]) / 1000000 for ts in timestamps]
+            duration = max(duration, seconds[-1])
+            lines.append((it, lttb(seconds, values, self.MAX_CHART_POINTS)))
+        low, high = stat['min'], stat['max']
+        if high <= low:
+            high = low + 1
+        duration = duration or 1
+
+        def x_pos(second):
+            return left + second / duration * (width - left - right)
+
+        def y_pos(value):
+            return top + (high - value) / (high - low) * (height - top - bottom)
+
+        def run_color(it):
+            return color if len(lines) == 1 else f'hsl({(207 + (it - 1) * 47) % 360}, 70%, 60%)'
+
+        svg = [f'<svg class="series-chart" viewBox="0 0 {width} {height}" preserveAspectRatio="none">']
+        for value in [low, (low + high) / 2, high]:
+            y = y_pos(value)
+            svg.append(f'<line class="grid" x1="{left}" y1="{y:.1f}" x2="{width - right}" y2="{y:.1f}"/>')
+            svg.append(f'<text x="{left - 6}" y="{y + 4:.1f}" text-anchor="end">{value:,.0f}</text>')
+        # Phase markers of the first run
+        if lines:
+            first_it = lines[0][0]
+            origin = samples.series[stat['name']][first_it][0][0]
+            for ts, name in sorted(samples.markers.get(first_it, [])):
+                second = (ts - origin) / 1000000
+                if 0 <= second <= duration:
+                    x = x_pos(second)
+                    svg.append(f'<line class="grid" x1="{x:.1f}" y1="{top}" x2="{x:.1f}" y2="{height - bottom}" stroke-dasharray="4 3"><title>{escape(name)}</title></line>')
+        svg.append(f'<text x="{left}" y="{height - 8}">0s</text>')
+        svg.append(f'<text x="{width - right}" y="{height - 8}" text-anchor="end">{duration:,.0f}s</text>')
+        for it, (xs, ys) in lines:
+            points = ' '.join(f'{x_pos(x):.1f},{y_pos(y):.1f}' for x, y in zip(xs, ys))
+            svg.append(f'<polyline points="{points}" style="stroke:{run_color(it)}"><title>Run {it}</title></polyline>')
+        svg.append('</svg>')
+
+        legend = ''
+        if len(lines) > 1:
+            items = ''.join(f'<div class="chart-legend-item"><div class="chart-legend-dot" style="background:{run_color(it)}"></div>Run {it}</div>'
+                            for it, _ in lines)
+            legend = f'<div class="chart-legend">{items}</div>'
+        return (f'  <div class="chart-container">\n    <div class="series-title">{escape(stat["name"])} (mW)</div>\n'
+                f'    {"".join(svg)}\n    {legend}\n  </div>\n')
+
+    def _get_campaign_rows(self, configs, state):
+        """Mean and 95% confidence interval of the steady-state power and energy per frame of each configuration and metric."""
+        runs = {}
+        for record in state['runs'].values():
+            runs.setdefault(record['config'], []).append(record)
+        metric_names = []
+        for record in state['runs'].values():
+            metric_names.extend(name for name in record['metrics'] if name not in metric_names)
+        rows = []
+        for index, config in enumerate(configs):
+            row = {'config': config, 'runs': len(runs.get(index, [])), 'metrics': {}}
+            for name in metric_names:
+                records = [record for record in runs.get(index, []) if name in record['metrics']]
+                per_frame = [record['metrics'][name]['energy'] / record['frames'] for record in records if record['frames']]
+                row['metrics'][name] = {
+                    'power': mean_ci([record['metrics'][name]['power'] for record in records]) if records else None,
+                    'energy_per_frame': mean_ci(per_frame) if per_frame else None,
+                }
+            rows.append(row)
+        return metric_names, rows
+
+    def _format_baseline(self, baseline):
+        if baseline is None:
+            return ''
+        return f"""    <div class="info-card">
+      <div class="info-label">Idle Baseline</div>
+      <div class="info-value">{baseline:,.1f} mW</div>
+    </div>
+"""
+
+    def _generate_campaign_report(self, configs, state, html_path, subtitle=None):
+        """Generate one HTML report comparing the configurations of a campaign, per URL to the first configuration."""
+        metric_names, rows = self._get_campaign_rows(configs, state)
+        subtitle = subtitle or (f'{len(configs)} configurations, {len(state["runs"])}/{len(state["order"])} runs of {self.duration}s, '
+                                'interleaved in random order')
+
+        def format_cell(value, reference):
+            if not value:
+                return '<td>-</td>'
+            delta = ''
+            if reference and reference[0] and value is not reference:
+                change = (value[0] / reference[0] - 1) * 100
+                color = 'var(--green)' if change < 0 else '#f87171'
+                delta = f' <span style="color:{color}">({change:+.1f}%)</span>'
+            return f'<td>{value[0]:,.2f} &plusmn; {value[1]:,.2f}{delta}</td>'
+
+        report_time = time.strftime('%Y-%m-%d %H:%M:%S')
+        parts = [f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>Power Campaign Report</title>
+<style>
+{self.REPORT_STYLE}
+</style>
+</head>
+<body>
+
+<header>
+<div class="container">
+  <h1>Power Campaign Report</h1>
+  <div class="subtitle">{subtitle}</div>
+</div>
+</header>
+
+<div class="container">
+  <div class="info-grid">
+{self._format_baseline(state['baseline'])}    <div class="info-card">
+      <div class="info-label">Generated</div>
+      <div class="info-value">{report_time}</div>
+    </div>
+  </div>
+"""]
+        for name in metric_names:
+            parts.append(f'  <div class="section-title">{escape(name)}</div>\n')
+            parts.append('  <div class="table-wrap">\n  <table>\n    <thead>\n      <tr>\n')
+            parts.append('        <th>Configuration</th><th>URL</th><th>Runs</th><th>Steady Power (mW)</th><th>Energy per Frame (mJ)</th>')
+            parts.append('\n      </tr>\n    </thead>\n    <tbody>\n')
+            for row in rows:
+                metric = row['metrics'][name]
+                # Configurations are compared to the first one of the same URL
+                reference = next(other for other in rows if other['config']['url'] == row['config']['url'])['metrics'][name]
+                parts.append(f'      <tr><td>{escape(row["config"]["label"])}</td><td>{escape(row["config"]["url"])}</td><td>{row["runs"]}</td>')
+                parts.append(format_cell(metric['power'], reference['power']))
+                parts.append(format_cell(metric['energy_per_frame'], reference['energy_per_frame']))
+                parts.append('</tr>\n')
+            parts.append('    </tbody>\n  </table>\n  </div>\n')
+        parts.append('  <div class="subtitle">&plusmn; is the 95% confidence interval across runs, '
+                     'the change is relative to the first configuration on the same URL.</div>\n')
+
+        parts.append('  <div class="section-title">Runs</div>\n')
+        parts.append('  <div class="table-wrap">\n  <table>\n    <thead>\n      <tr>\n')
+        parts.append('        <th>#</th><th>Configuration</th><th>Round</th><th>Cooldown (s)</th><th>Idle Power (mW)</th><th>Background (%)</th><th>Trace</th>')
+        parts.append('\n      </tr>\n    </thead>\n    <tbody>\n')
+        for position, (index, round_index) in enumerate(state['order']):
+            record = state['runs'].get(str(position))
+            if not record:
+                continue
+            idle_power = f'{record["idle_power"]:,.1f}' if record['idle_power'] is not None else '-'
+            cooldown = f'{record["cooldown"]:.0f}' if record['cooldown'] is not None else '-'
+            noise = record.get('noise')
+            background = '-'
+            style = ''
+            if noise:
+                background = f'{noise["background"]}'
+                if noise['violations']:
+                    background += f' ({", ".join(noise["violations"])})'
+                    style = ' style="color:var(--orange)"'
+            parts.append(f'      <tr{style}><td>{position + 1}</td><td>{escape(configs[index]["label"])}</td><td>{round_index + 1}</td>'
+                         f'<td>{cooldown}</td><td>{idle_power}</td><td>{background}</td><td>{escape(os.path.basename(record["trace"]))}</td></tr>\n')
+        parts.append('    </tbody>\n  </table>\n  </div>\n</div>\n</body>\n</html>\n')
+
+        with open(html_path, 'w', encoding='utf-8') as f:
+            f.write(''.join(parts))
+        for row in rows:
+            values = ', '.join(f'{name} {row["metrics"][name]["power"][0]:,.1f} mW' for name in metric_names if row['metrics'][name]['power'])
+            logger.info(f'{row["config"]["label"]} on {row["config"]["url"]}: {values}')
+        logger.info(f'Campaign report created: {html_path}')
+
+    def _generate_html_report(self, samples, html_path, trace_files):
+        """Generate an HTML report summarizing power consumption across iterations."""
+        has_iterations = self.repeat > 1
+
+        summary = []
+        for name in samples.series:
+            stat = samples.get_summary(name)
+            stat['name'] = name
+            stat['iters'] = {}
+            if has_iterations:
+                for it in range(1, self.repeat + 1):
+                    stat['iters'][it] = samples.get_summary(name, it)
+            summary.append(stat)
+
+        # Build per-iteration averages for chart data
+        metric_names = [s['name'] for s in summary]
+        self._log_phases(samples, metric_names)
+        chart_iter_data = {}
+        if has_iterations:
+            for it in range(1, self.repeat + 1):
+                chart_iter_data[it] = [s['iters'].get(it, {}).get('avg', 0) for s in summary]
+
+        # Color assignments per metric (up to 6)
+        metric_colors = ['#3498db', '#e74c3c', '#2ecc71', '#f39c12', '#9b59b6', '#1abc9c']
+
+        # Generate timestamp
+        report_time = time.strftime('%Y-%m-%d %H:%M:%S')
+
+        # ---- Build HTML ----
+        html = []
+        html.append(f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>Power Consumption Report</title>
+<style>
+{self.REPORT_STYLE}
 </style>
 </head>
 <body>
@@ -1000,7 +2634,7 @@ examples:
     </div>
     <div class="info-card">
       <div class="info-label">URL</div>
-      <div class="info-value"><a href="{self.url}" target="_blank">{self.url}</a></div>
+      <div class="info-value"><a href="{escape(self.url)}" target="_blank">{escape(self.url)}</a></div>
     </div>
     <div class="info-card">
       <div class="info-label">Duration</div>
@@ -1011,8 +2645,12 @@ examples:
       <div class="info-value">{self.cooldown}s between runs</div>
     </div>
     <div class="info-card">
+      <div class="info-label">Browser Launches</div>
+      <div class="info-value">{self._format_launches()}</div>
+    </div>
+{self._format_overhead()}    <div class="info-card">
       <div class="info-label">Total Samples</div>
-      <div class="info-value">{len(power_events):,}</div>
+      <div class="info-value">{samples.count:,}</div>
     </div>
     <div class="info-card">
       <div class="info-label">Generated</div>
@@ -1028,11 +2666,11 @@ examples:
             color = metric_colors[idx % len(metric_colors)]
             html.append(f"""    <div class="metric-card" style="--mc-color: {color}">
       <style>.metric-card:nth-child({idx + 1})::before {{ background: {color}; }}</style>
-      <div class="mc-name">{stat['name']}</div>
+      <div class="mc-name">{escape(stat['name'])}</div>
       <div class="mc-avg" style="color: {color}">{stat['avg']:,.1f} <span class="mc-unit">mW avg</span></div>
       <div class="mc-stats">
-        <div class="mc-stat"><div class="mc-stat-label">Min</div><div class="mc-stat-value min">{stat['min']:,}</div></div>
-        <div class="mc-stat"><div class="mc-stat-label">Max</div><div class="mc-stat-value max">{stat['max']:,}</div></div>
+        <div class="mc-stat"><div class="mc-stat-label">Min</div><div class="mc-stat-value min">{stat['min']:,.1f}</div></div>
+        <div class="mc-stat"><div class="mc-stat-label">Max</div><div class="mc-stat-value max">{stat['max']:,.1f}</div></div>
         <div class="mc-stat"><div class="mc-stat-label">Median</div><div class="mc-stat-value med">{stat['med']:,.1f}</div></div>
         <div class="mc-stat"><div class="mc-stat-label">Std Dev</div><div class="mc-stat-value std">{stat['std']:,.1f}</div></div>
       </div>
@@ -1041,6 +2679,83 @@ examples:
 
         html.append("  </div>\n")
 
+        # ---- Time series ----
+        html.append('  <div class="section-title">Power Over Time</div>\n')
+        for idx, stat in enumerate(summary):
+            html.append(self._build_time_series(samples, stat, metric_colors[idx % len(metric_colors)]))
+
+        # ---- Workload phases ----
+        phase_rows = self._get_phase_rows(samples, metric_names)
+        html.append('  <div class="section-title">Workload Phases</div>\n')
+        html.append('  <div class="table-wrap">\n  <table>\n    <thead>\n      <tr>\n')
+        html.append('        <th>Phase</th><th>Duration (s)</th><th>Runs</th>')
+        for name in metric_names:
+            html.append(f'<th>{escape(name)} (mW)</th><th>{escape(name)} (mJ)</th>')
+        html.append('\n      </tr>\n    </thead>\n    <tbody>\n')
+        for row in phase_rows:
+            style = ' style="font-weight:700"' if row['total'] else ''
+            html.append(f'      <tr{style}><td>{escape(row["name"])}</td><td>{row["duration"]:,.2f}</td><td>{row["runs"]}</td>')
+            for name in metric_names:
+                power, energy = row['metrics'].get(name, [0.0, 0.0])
+                html.append(f'<td>{power:,.1f}</td><td>{energy:,.1f}</td>')
+            html.append('</tr>\n')
+        html.append('    </tbody>\n  </table>\n  </div>\n')
+        warmup_note = f', the first {self.warmup:g}s after the page load are warm-up' if self.warmup else ''
+        html.append(f'  <div class="subtitle">Phases start at page markers (navigation, first frame, load, performance.mark()){warmup_note}. '
+                    'Values are averages over the runs that have the phase.</div>\n')
+
+        # ---- Energy per frame ----
+        frame_rows = self._get_frame_rows(samples, metric_names)
+        if frame_rows:
+            html.append('  <div class="section-title">Energy per Frame</div>\n')
+            html.append('  <div class="table-wrap">\n  <table>\n    <thead>\n      <tr>\n')
+            html.append('        <th>Metric</th><th>Runs</th><th>Frame Rate (FPS)</th><th>Energy per Frame (mJ)</th><th>Frames per Joule</th>')
+            html.append('\n      </tr>\n    </thead>\n    <tbody>\n')
+            for row in frame_rows:
+                html.append(f'      <tr><td>{escape(row["name"])}</td><td>{row["runs"]}</td>')
+                for value, ci in [row['fps'], row['energy_per_frame'], row['frames_per_joule']]:
+                    html.append(f'<td>{value:,.2f} &plusmn; {ci:,.2f}</td>')
+                html.append('</tr>\n')
+            html.append('    </tbody>\n  </table>\n  </div>\n')
+            html.append('  <div class="subtitle">Over the steady state of each run, frames drawn by the page\'s compositor. '
+                        '&plusmn; is the 95% confidence interval across runs.</div>\n')
+
+        # ---- Page metrics ----
+        if self.page_metrics:
+            html.append('  <div class="section-title">Page Metrics</div>\n')
+            html.append('  <div class="table-wrap">\n  <table>\n    <thead>\n      <tr>\n')
+            html.append('        <th>Run</th><th>Load (s)</th><th>Main Thread Tasks (s)</th><th>Script (s)</th><th>Layout (s)</th>'
+                        '<th>Style (s)</th><th>JS Heap (MB)</th>')
+            html.append('\n      </tr>\n    </thead>\n    <tbody>\n')
+            for it, metrics in sorted(self.page_metrics.items()):
+                html.append(f'      <tr><td>#{it}</td>')
+                for name in ['load'] + self.PAGE_METRICS:
+                    if name not in metrics:
+                        html.append('<td>-</td>')
+                    elif name == 'JSHeapUsedSize':
+                        html.append(f'<td>{metrics[name] / 1048576:,.1f}</td>')
+                    else:
+                        html.append(f'<td>{metrics[name]:,.2f}</td>')
+                html.append('</tr>\n')
+            html.append('    </tbody>\n  </table>\n  </div>\n')
+            html.append('  <div class="subtitle">Collected from the page over DevTools while the browser traces.</div>\n')
+
+        if self.noise:
+            html.append('  <div class="section-title">Host Noise</div>\n')
+            html.append('  <div class="table-wrap">\n  <table>\n    <thead>\n      <tr>\n')
+            html.append('        <th>Run</th><th>CPU (%)</th><th>Background (%)</th><th>Background Max (%)</th><th>CPU Freq (MHz)</th>'
+                        '<th>Temperature (C)</th><th>Top Background Processes</th><th>Noisy</th>')
+            html.append('\n      </tr>\n    </thead>\n    <tbody>\n')
+            for it, noise in sorted(self.noise.items()):
+                style = ' style="color:var(--orange)"' if noise['violations'] else ''
+                top = ', '.join(f'{escape(name)} {cpu}%' for name, cpu in noise['top']) or '-'
+                html.append(f'      <tr{style}><td>#{it}</td><td>{noise["cpu"]}</td><td>{noise["background"]}</td>'
+                            f'<td>{noise["background_max"]}</td><td>{noise["frequency"] or "-"}</td><td>{noise["temperature"] or "-"}</td>'
+                            f'<td>{top}</td><td>{", ".join(noise["violations"]) or "-"}</td></tr>\n')
+            html.append('    </tbody>\n  </table>\n  </div>\n')
+            html.append('  <div class="subtitle">Sampled on the host while each iteration traced, the browser and this script '
+                        'are the workload, every other process is background. % are of the whole machine.</div>\n')
+
         # ---- Bar Chart (per-iteration comparison) ----
         if has_iterations:
             # Find global max for scaling bars
@@ -1060,7 +2775,7 @@ examples:
 """)
             for m_idx, m_name in enumerate(metric_names):
                 html.append(f'    <div class="chart-row">\n')
-                html.append(f'      <div class="chart-label">{m_name}</div>\n')
+                html.append(f'      <div class="chart-label">{escape(m_name)}</div>\n')
                 html.append(f'      <div class="chart-bar-group">\n')
                 for it in range(1, self.repeat + 1):
                     val = chart_iter_data[it][m_idx]
@@ -1078,7 +2793,7 @@ examples:
         # ---- Detailed data table ----
         html.append('  <div class="section-title">Detailed Statistics</div>\n')
         html.append('  <div class="table-wrap">\n  <table>\n    <thead>\n      <tr>\n')
-        html.append('        <th>Metric</th><th>Average</th><th>Median</th><th>Min</th><th>Max</th><th>Std Dev</th><th>Samples</th>\n')
+        html.append('        <th>Metric</th><th>Average</th><th>Median</th><th>Min</th><th>Max</th><th>P5</th><th>P95</th><th>Std Dev</th><th>Samples</th>\n')
         if has_iterations:
             for it in range(1, self.repeat + 1):
                 html.append(f'        <th class="iter-header">Run {it} Avg</th>\n')
@@ -1086,11 +2801,13 @@ examples:
 
         for stat in summary:
             html.append(f'      <tr>\n')
-            html.append(f'        <td>{stat["name"]}</td>\n')
+            html.append(f'        <td>{escape(stat["name"])}</td>\n')
             html.append(f'        <td>{stat["avg"]:,.2f}</td>\n')
             html.append(f'        <td>{stat["med"]:,.1f}</td>\n')
-            html.append(f'        <td>{stat["min"]:,}</td>\n')
-            html.append(f'        <td>{stat["max"]:,}</td>\n')
+            html.append(f'        <td>{stat["min"]:,.1f}</td>\n')
+            html.append(f'        <td>{stat["max"]:,.1f}</td>\n')
+            html.append(f'        <td>{stat["p5"]:,.1f}</td>\n')
+            html.append(f'        <td>{stat["p95"]:,.1f}</td>\n')
             html.append(f'        <td>{stat["std"]:,.1f}</td>\n')
             html.append(f'        <td>{stat["count"]:,}</td>\n')
             if has_iterations:
@@ -1107,16 +2824,18 @@ examples:
             for it in range(1, self.repeat + 1):
                 html.append(f'  <h3 style="font-size:15px;color:var(--accent);margin:16px 0 8px;">Run {it}</h3>\n')
                 html.append('  <div class="table-wrap">\n  <table>\n    <thead>\n      <tr>\n')
-                html.append('        <th>Metric</th><th>Average</th><th>Median</th><th>Min</th><th>Max</th><th>Std Dev</th><th>Samples</th>\n')
+                html.append('        <th>Metric</th><th>Average</th><th>Median</th><th>Min</th><th>Max</th><th>P5</th><th>P95</th><th>Std Dev</th><th>Samples</th>\n')
                 html.append('      </tr>\n    </thead>\n    <tbody>\n')
                 for stat in summary:
                     d = stat['iters'].get(it, {})
                     html.append(f'      <tr>\n')
-                    html.append(f'        <td>{stat["name"]}</td>\n')
+                    html.append(f'        <td>{escape(stat["name"])}</td>\n')
                     html.append(f'        <td>{d.get("avg",0):,.2f}</td>\n')
                     html.append(f'        <td>{d.get("med",0):,.1f}</td>\n')
-                    html.append(f'        <td>{d.get("min",0):,}</td>\n')
-                    html.append(f'        <td>{d.get("max",0):,}</td>\n')
+                    html.append(f'        <td>{d.get("min",0):,.1f}</td>\n')
+                    html.append(f'        <td>{d.get("max",0):,.1f}</td>\n')
+                    html.append(f'        <td>{d.get("p5",0):,.1f}</td>\n')
+                    html.append(f'        <td>{d.get("p95",0):,.1f}</td>\n')
                     html.append(f'        <td>{d.get("std",0):,.1f}</td>\n')
                     html.append(f'        <td>{d.get("count",0):,}</td>\n')
                     html.append(f'      </tr>\n')
@@ -1131,7 +2850,7 @@ examples:
     </ul>
   </details>
 """.format(count=len(trace_files),
-           items="\n      ".join(f"<li>{os.path.basename(f)}</li>" for f in trace_files)))
+           items="\n      ".join(f"<li>{escape(os.path.basename(f))}</li>" for f in trace_files)))
 
         # ---- Footer ----
         html.append(f"""
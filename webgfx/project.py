@@ -4,6 +4,7 @@ import shutil
 import subprocess
 
 from util.base import Util, Program, ChromiumRepo, Timer
+from misc.testhelper import TestSupervisor
 
 
 def _apply_gn_arg_overrides(args_path, overrides):
@@ -23,6 +24,13 @@ def _apply_gn_arg_overrides(args_path, overrides):
         f.write(gn_args)
 
 
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
 def _enlistment_roots(root_dir):
     roots = []
     for path in (os.path.abspath(root_dir), os.path.realpath(root_dir)):
@@ -154,6 +162,8 @@ class Project(Program):
         if self.fuzzer:
             self.out_dir += "_fuzzer"
 
+        self.out_dir_isolated = False
+
         self.exit_on_error = False
         self.root_dir = root_dir
         self.result_dir = result_dir
@@ -617,7 +627,18 @@ class Project(Program):
             shutil.rmtree(f'{backup_path}/out')
 
     def run(
-        self, target, combos, rev, run_dry=False, run_filter="all", validation='disabled', jobs=1, warp=None, index=0
+        self,
+        target,
+        combos,
+        rev,
+        run_dry=False,
+        run_filter="all",
+        validation='disabled',
+        jobs=1,
+        warp=None,
+        index=0,
+        stall_timeout=0,
+        max_fail_rate=0,
     ):
         if rev not in ["out", "backup"]:
             Util.impossible()
@@ -699,7 +720,14 @@ class Project(Program):
                 # elif combo == "2.0.1":
                 #    TestExpectation.update("webgl2_cts_tests", target_rev_dir)
 
-                run_args = f"--browser=release_{self.target_cpu}"
+                if self.out_dir_isolated:
+                    if Util.HOST_OS == Util.WINDOWS:
+                        browser_exe = "chrome.exe"
+                    else:
+                        browser_exe = "chrome"
+                    run_args = f"--browser=exact --browser-executable={self.repo_dir}/{self.out_dir}/{browser_exe}"
+                else:
+                    run_args = f"--browser=release_{self.target_cpu}"
 
                 if run_dry:
                     # run_args += ' --test-filter=*copy-texture-image-same-texture*::*ext-texture-norm16*'
@@ -772,15 +800,30 @@ class Project(Program):
                 run_dir = project_rev_dir
             Util.chdir(run_dir, verbose=True)
 
+            if target == "angle":
+                watch_file = f"{run_dir}/output.json"
+            else:
+                watch_file = result_file
+            supervisor = TestSupervisor(
+                f"{target}-{combo}-{index}",
+                f"{self.result_dir}/progress.jsonl",
+                stall_timeout=stall_timeout,
+                max_fail_rate=max_fail_rate,
+                watch_files=[watch_file] if watch_file else [],
+            )
+
             timer = Timer()
             Util.info(cmd)
-            os.system(cmd)
-            Util.append_file(self.run_log, f"{target}-{combo} run{self.SEPARATOR}{timer.stop()}")
+            _, status = supervisor.run(cmd)
+            run_info = timer.stop()
+            if status != TestSupervisor.STATUS_DONE:
+                run_info += f" ({status})"
+            Util.append_file(self.run_log, f"{target}-{combo} run{self.SEPARATOR}{run_info}")
 
             # Postprocess the result
             if target == "angle":
                 if rev == "out":
-                    output_file = f"{self.repo_dir}/out/release_{self.target_cpu}/output.json"
+                    output_file = f"{self.repo_dir}/{self.out_dir}/output.json"
                     # TestExpectation.update('angle_end2end_tests', f'{self.repo_dir}')
                 else:
                     output_file = (
@@ -1017,6 +1060,27 @@ class Project(Program):
         finally:
             Util.chdir(original_dir)
 
+    def isolate_out_dir(self, suffix):
+        """
+        Run from a hardlinked copy of the out dir, so concurrent runs can put different files (like the WARP DLL)
+        into their own out dir without touching the shared one.
+        """
+        src_dir = f"{self.repo_dir}/{self.out_dir}"
+        isolated_out_dir = f"{self.out_dir}{suffix}"
+        dst_dir = f"{self.repo_dir}/{isolated_out_dir}"
+        if not os.path.exists(src_dir):
+            Util.error(f"{src_dir} does not exist")
+
+        # Recreate the copy so it always matches the latest build. Hardlinks make this cheap, and obj files are not
+        # needed to run tests.
+        if os.path.exists(dst_dir):
+            shutil.rmtree(dst_dir)
+        Util.info(f"Linking {src_dir} to {dst_dir}")
+        shutil.copytree(src_dir, dst_dir, ignore=shutil.ignore_patterns("obj"), copy_function=_link_or_copy)
+
+        self.out_dir = isolated_out_dir
+        self.out_dir_isolated = True
+
     def _copy_warp_dll(self, warp):
         """
         Copy WARP DLL from warp/ folder to the output directory.
@@ -1032,6 +1096,9 @@ class Project(Program):
             return
 
         Util.info(f'Copying {warp} WARP DLL from {src} to {dst}')
+        # The dst may be a hardlink shared with another out dir, so replace it instead of writing through it
+        if os.path.exists(dst):
+            os.remove(dst)
         shutil.copy2(src, dst)
 
     def _remove_warp_dll(self):
@@ -0,0 +1,117 @@
+import json
+from pathlib import Path
+import sys
+import tempfile
+import unittest
+
+
+WEBGFX_DIR = Path(__file__).resolve().parents[1]
+TOOLKIT_DIR = WEBGFX_DIR.parent
+sys.path.insert(0, str(TOOLKIT_DIR))
+sys.path.insert(0, str(WEBGFX_DIR))
+
+from misc.testhelper import TestResult
+from warp import diff_results, welch_t_test
+
+
+def make_result(pass_pass=(), pass_fail=(), fail_fail=(), times=None):
+    result = TestResult()
+    result.pass_pass = list(pass_pass)
+    result.pass_fail = list(pass_fail)
+    result.fail_fail = list(fail_fail)
+    result.times = dict(times or {})
+    return result
+
+
+class DiffResultsTest(unittest.TestCase):
+    def test_per_test_matrix_and_timing(self):
+        old = {
+            "angle-d3d11-0": make_result(
+                pass_pass=["A.pass", "A.regress", "A.old_only"],
+                pass_fail=["A.improve"],
+                fail_fail=["A.broken"],
+                times={"A.pass": 1.0, "A.regress": 2.0, "A.improve": 0.5},
+            )
+        }
+        new = {
+            "angle-d3d11-0": make_result(
+                pass_pass=["A.pass", "A.improve", "A.new_only"],
+                pass_fail=["A.regress", "A.broken"],
+                times={"A.pass": 3.0, "A.regress": 1.5, "A.improve": 0.5},
+            )
+        }
+
+        diff = diff_results(old, new)
+
+        self.assertEqual(diff["regressions"], ["angle-d3d11-0: A.regress"])
+        self.assertEqual(diff["improvements"], ["angle-d3d11-0: A.improve"])
+        self.assertEqual(diff["persistent"], ["angle-d3d11-0: A.broken"])
+        self.assertEqual(diff["old_only"], ["angle-d3d11-0: A.old_only"])
+        self.assertEqual(diff["new_only"], ["angle-d3d11-0: A.new_only"])
+        self.assertEqual(
+            diff["timing"],
+            [
+                ["angle-d3d11-0: A.pass", 1.0, 3.0],
+                ["angle-d3d11-0: A.improve", 0.5, 0.5],
+                ["angle-d3d11-0: A.regress", 2.0, 1.5],
+            ],
+        )
+
+    def test_result_missing_on_one_side(self):
+        old = {"dawn-d3d12-0": make_result(pass_pass=["B.one"])}
+
+        diff = diff_results(old, {})
+
+        self.assertEqual(diff["old_only"], ["dawn-d3d12-0: B.one"])
+        self.assertEqual(diff["regressions"], [])
+
+
+class WelchTTestTest(unittest.TestCase):
+    def test_matches_reference_values(self):
+        t, df, p = welch_t_test([1, 2, 3, 4, 5], [2, 3, 4, 5, 6])
+        self.assertAlmostEqual(t, 1.0)
+        self.assertAlmostEqual(df, 8.0)
+        self.assertAlmostEqual(p, 0.346594, places=5)
+
+    def test_clear_slowdown_is_significant(self):
+        t, _, p = welch_t_test([10.0, 10.5, 9.8, 10.1], [12.0, 12.4, 11.9, 12.2])
+        self.assertGreater(t, 0)
+        self.assertLess(p, 0.001)
+
+    def test_not_enough_samples(self):
+        self.assertEqual(welch_t_test([1.0], [2.0, 3.0]), [0.0, 0.0, 1.0])
+
+
+class TestResultTimesTest(unittest.TestCase):
+    def test_times_are_parsed_from_json_results(self):
+        with tempfile.TemporaryDirectory(prefix="webgfx-warp-") as temp:
+            typ_file = Path(temp) / "webgl-2.0.1-0.log"
+            typ_file.write_text(
+                json.dumps(
+                    {
+                        "tests": {
+                            "conformance": {
+                                "a.html": {"expected": "PASS", "actual": "PASS", "times": [0.25]},
+                                "b.html": {"expected": "PASS", "actual": "FAIL FAIL", "times": [1.0, 2.0]},
+                            }
+                        }
+                    }
+                ),
+                encoding="utf-8",
+            )
+            dawn_file = Path(temp) / "dawn-d3d12-0.json"
+            dawn_file.write_text(
+                json.dumps({"testsuites": [{"name": "C", "testsuite": [{"name": "one", "time": "0.012s"}]}]}),
+                encoding="utf-8",
+            )
+
+            typ_result = TestResult(str(typ_file), "gtest_angle")
+            dawn_result = TestResult(str(dawn_file), "dawn")
+
+        self.assertEqual(typ_result.times, {"conformance/a.html": 0.25, "conformance/b.html": 2.0})
+        self.assertEqual(typ_result.pass_fail, ["conformance/b.html"])
+        self.assertEqual(dawn_result.times, {"C.one": 0.012})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,8 +2,10 @@
 # pylint: disable=line-too-long, missing-function-docstring, missing-module-docstring, missing-class-docstring
 
 import argparse
+import math
 import os
 import re
+import statistics
 import subprocess
 import sys
 
@@ -33,20 +35,169 @@ sys.path.append(SCRIPT_DIR)
 sys.path.append(SCRIPT_DIR + '/..')
 
 from util.base import Util
+from misc.testhelper import TestResult
+from webgfx import get_result_type
+
+
+def _passed(result):
+    return set(result.pass_pass) | set(result.fail_pass)
+
+
+def _failed(result):
+    return set(result.pass_fail) | set(result.fail_fail)
+
+
+def diff_results(old_results, new_results):
+    """
+    Compare two runs test by test.
+
+    Args:
+        old_results: Result name (like angle-d3d11-0) -> TestResult of the old WARP
+        new_results: Result name -> TestResult of the new WARP
+
+    Returns:
+        A dict with the sorted test lists regressions, improvements, persistent, old_only and new_only, and timing,
+        a list of [test, old seconds, new seconds] for tests timed in both runs, slowest delta first.
+    """
+    diff = {'regressions': [], 'improvements': [], 'persistent': [], 'old_only': [], 'new_only': [], 'timing': []}
+    for name in sorted(set(old_results) | set(new_results)):
+        old_result = old_results.get(name, TestResult())
+        new_result = new_results.get(name, TestResult())
+        old_passed, old_failed = _passed(old_result), _failed(old_result)
+        new_passed, new_failed = _passed(new_result), _failed(new_result)
+        old_tests = old_passed | old_failed
+        new_tests = new_passed | new_failed
+
+        # Prefix the result name, as the same test may run in several combos
+        def _add(category, tests):
+            diff[category].extend(f'{name}: {test}' for test in sorted(tests))
+
+        _add('regressions', old_passed & new_failed)
+        _add('improvements', old_failed & new_passed)
+        _add('persistent', old_failed & new_failed)
+        _add('old_only', old_tests - new_tests)
+        _add('new_only', new_tests - old_tests)
+
+        for test in sorted(set(old_result.times) & set(new_result.times)):
+            diff['timing'].append([f'{name}: {test}', old_result.times[test], new_result.times[test]])
+
+    diff['timing'].sort(key=lambda timing: timing[2] - timing[1], reverse=True)
+    return diff
+
+
+def _betacf(a, b, x):
+    # Continued fraction of the incomplete beta function, evaluated with the modified Lentz method
+    tiny = 1e-300
+    qab, qap, qam = a + b, a + 1.0, a - 1.0
+    c = 1.0
+    d = 1.0 - qab * x / qap
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, 301):
+        m2 = 2 * m
+        aa = m * (b - m) * x / ((qam + m2) * (a + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / (d if abs(d) > tiny else tiny)
+        c = 1.0 + aa / c
+        c = c if abs(c) > tiny else tiny
+        h *= d * c
+        aa = -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / (d if abs(d) > tiny else tiny)
+        c = 1.0 + aa / c
+        c = c if abs(c) > tiny else tiny
+        delta = d * c
+        h *= delta
+        if abs(delta - 1.0) < 1e-12:
+            break
+    return h
+
+
+def _betainc(a, b, x):
+    """Regularized incomplete beta function I_x(a, b)."""
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    log_front = math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log(1.0 - x)
+    if x < (a + 1.0) / (a + b + 2.0):
+        return math.exp(log_front) * _betacf(a, b, x) / a
+    return 1.0 - math.exp(log_front) * _betacf(b, a, 1.0 - x) / b
+
+
+def welch_t_test(samples, other_samples):
+    """
+    Two-sided Welch's t-test.
+
+    Returns:
+        [t, degrees of freedom, p-value], t is positive when other_samples has the larger mean.
+    """
+    count, other_count = len(samples), len(other_samples)
+    if count < 2 or other_count < 2:
+        return [0.0, 0.0, 1.0]
+
+    mean_diff = statistics.fmean(other_samples) - statistics.fmean(samples)
+    var = statistics.variance(samples) / count
+    other_var = statistics.variance(other_samples) / other_count
+    if var + other_var == 0:
+        # No noise at all, any difference is real
+        if mean_diff == 0:
+            return [0.0, 0.0, 1.0]
+        return [math.copysign(math.inf, mean_diff), 0.0, 0.0]
+
+    t = mean_diff / math.sqrt(var + other_var)
+    df = (var + other_var) ** 2 / (var**2 / (count - 1) + other_var**2 / (other_count - 1))
+    return [t, df, _betainc(df / 2.0, 0.5, df / (df + t * t))]
 
 
 class WarpRegression:
+    WARP_TYPES = ['old', 'new']
+
     def __init__(self):
         parser = argparse.ArgumentParser(description='WARP Regression Test')
         parser.add_argument('--target', dest='target', help='target name', required=True)
         parser.add_argument('--run-filter', dest='run_filter', help='test filter', default='*')
         parser.add_argument('--run-combo', dest='run_combo', help='run combo', default='all')
         parser.add_argument('--run-dry', dest='run_dry', help='dry run', action='store_true')
+        parser.add_argument('--root-dir', dest='root_dir', help='dir to run webgfx.py from', default='d:/r')
+        parser.add_argument(
+            '--run-serial',
+            dest='run_serial',
+            help='run old and new WARP one after another instead of side by side, to compare their timing',
+            action='store_true',
+        )
+        parser.add_argument(
+            '--report-timing',
+            dest='report_timing',
+            help='max tests in each timing list of the report',
+            type=int,
+            default=20,
+        )
+        parser.add_argument(
+            '--versions',
+            dest='versions',
+            help='WARP versions under webgfx/warp to compare the performance of, split by comma, or all',
+        )
+        parser.add_argument('--baseline', dest='baseline', help='baseline version, default is the first one')
+        parser.add_argument(
+            '--repeat', dest='repeat', help='runs per version to estimate the noise', type=int, default=3
+        )
+        parser.add_argument('--slowest', dest='slowest', help='slowest tests listed per version', type=int, default=10)
+        parser.add_argument('--alpha', dest='alpha', help='significance level of slowdowns', type=float, default=0.05)
+        parser.add_argument(
+            '--min-slowdown',
+            dest='min_slowdown',
+            help='min slowdown percentage to report, filters tiny but significant ones',
+            type=float,
+            default=5,
+        )
         parser.add_argument('--email', dest='email', help='send email with results', action='store_true')
 
         parser.epilog = """
 examples:
 {0} {1} --target angle --run-filter "BufferDataTestES3.BufferResizing/*D3D11"
+{0} {1} --target angle --run-filter "BufferDataTestES3.BufferResizing/*D3D11" --run-serial
+{0} {1} --target dawn --run-filter BindGroupTests --versions 1.0.18,1.0.19,1.0.20 --baseline 1.0.18 --repeat 5
 """.format(
             Util.PYTHON, parser.prog
         )
@@ -56,118 +207,184 @@ examples:
         self.filter = args.run_filter
         self.run_combo = args.run_combo
         self.run_dry = args.run_dry
+        self.root_dir = args.root_dir
+        self.run_serial = args.run_serial
+        self.report_timing = args.report_timing
         self.send_email = args.email
 
-        self.results = {
-            'old': {'passed': 0, 'failed': 0, 'skipped': 0, 'failures': []},
-            'new': {'passed': 0, 'failed': 0, 'skipped': 0, 'failures': []},
-        }
-
-    def _run_test(self, warp_type):
-        # Run webgfx.py with --warp option from d:\r
-        run_dir = 'd:/r'
+        self.versions = []
+        if args.versions == 'all':
+            warp_dir = f'{SCRIPT_DIR}/warp'
+            self.versions = sorted(
+                version for version in os.listdir(warp_dir) if os.path.isdir(f'{warp_dir}/{version}')
+            )
+        elif args.versions:
+            self.versions = args.versions.split(',')
+        self.baseline = args.baseline or (self.versions[0] if self.versions else None)
+        if self.versions and self.baseline not in self.versions:
+            parser.error(f'--baseline {self.baseline} is not in --versions')
+        self.repeat = args.repeat
+        self.slowest = args.slowest
+        self.alpha = args.alpha
+        self.min_slowdown = args.min_slowdown
+
+        timestamp = Util.get_datetime()
+        self.result_dir = f'{self.root_dir}/result/warp-{timestamp}'
+        self.results = {}
+        self.diff = None
+
+    def _get_cmd(self, warp_type, repeat=1):
+        # Each WARP type gets its own out dir copy and result dir, so both can run at the same time
         cmd = f'python3.exe webgfx.py --target {self.target} --run --warp {warp_type}'
+        cmd += f' --run-out-suffix _warp_{warp_type} --run-result-dir {self.result_dir}/{warp_type}'
+        if repeat > 1:
+            cmd += f' --repeat {repeat}'
         if self.filter and self.filter != '*':
             cmd += f' --run-filter {self.filter}'
         if self.run_combo and self.run_combo != 'all':
             cmd += f' --run-combo {self.run_combo}'
         if self.run_dry:
             cmd += ' --run-dry'
-
-        Util.info(f'Running: {cmd} (in {run_dir})')
-
-        # Run from d:\r directory
-        original_dir = os.getcwd()
-        os.chdir(run_dir)
-
-        try:
-            # Use Popen to show output in real-time
-            process = subprocess.Popen(
-                cmd,
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
+        return cmd
+
+    def _run_tests(self):
+        # WARP is CPU-bound, side by side runs skew each other's timing, so only serial runs compare it
+        processes = []
+        for warp_type in self.WARP_TYPES:
+            result_dir = f'{self.result_dir}/{warp_type}'
+            Util.ensure_dir(result_dir)
+            log_file = f'{result_dir}/webgfx.log'
+            cmd = self._get_cmd(warp_type)
+            Util.info(f'Running: {cmd} (in {self.root_dir}, log: {log_file})')
+            log = open(log_file, 'w', encoding='utf-8')
+            process = subprocess.Popen(cmd, shell=True, cwd=self.root_dir, stdout=log, stderr=subprocess.STDOUT)
+            processes.append([warp_type, process, log])
+            if self.run_serial:
+                self._wait_run(warp_type, process, log)
+
+        if not self.run_serial:
+            for warp_type, process, log in processes:
+                self._wait_run(warp_type, process, log)
+
+    def _wait_run(self, warp_type, process, log):
+        if process.wait():
+            Util.warning(f'{warp_type} WARP run exited with {process.returncode}')
+        log.close()
+
+    def _load_results(self, warp_type):
+        results = {}
+        result_dir = f'{self.result_dir}/{warp_type}'
+        for result_file in sorted(os.listdir(result_dir)):
+            test_type = get_result_type(result_file)
+            if not test_type:
+                continue
+            results[os.path.splitext(result_file)[0]] = TestResult(f'{result_dir}/{result_file}', test_type)
+        return results
+
+    def _run_matrix(self):
+        # Versions run one after another, concurrent runs would skew each other's timing
+        for version in self.versions:
+            result_dir = f'{self.result_dir}/{version}'
+            Util.ensure_dir(result_dir)
+            cmd = self._get_cmd(version, repeat=self.repeat)
+            Util.info(f'Running: {cmd} (in {self.root_dir})')
+            with open(f'{result_dir}/webgfx.log', 'w', encoding='utf-8') as log:
+                if subprocess.call(cmd, shell=True, cwd=self.root_dir, stdout=log, stderr=subprocess.STDOUT):
+                    Util.warning(f'{version} WARP run exited with an error')
+
+    def _load_durations(self, version):
+        """Return [test -> durations of all repeats, failures per repeat, total seconds per repeat]."""
+        durations = {}
+        failures = {}
+        seconds = {}
+        for name, result in self._load_results(version).items():
+            # Result names end with the repeat index, like angle-d3d11-2
+            name, index = name.rsplit('-', 1)
+            failures[index] = failures.get(index, 0) + len(_failed(result))
+            seconds[index] = seconds.get(index, 0.0) + sum(result.times.values())
+            for test, duration in result.times.items():
+                durations.setdefault(f'{name}: {test}', []).append(duration)
+        return [durations, list(failures.values()), list(seconds.values())]
+
+    def _generate_matrix_report(self, matrix):
+        report = []
+        report.append('=' * 60)
+        report.append('WARP Performance Matrix Report')
+        report.append('=' * 60)
+        report.append('')
+        report.append(f'Target: {self.target}')
+        report.append(f'Filter: {self.filter}')
+        report.append(f'Baseline: {self.baseline}')
+        report.append(f'Repeat: {self.repeat}')
+        report.append(f'Results: {self.result_dir}')
+        report.append('')
+        report.append('-' * 60)
+        report.append('Throughput')
+        report.append('-' * 60)
+        report.append(f"{'Version':12} {'Tests':>8} {'Failed':>8} {'Time (s)':>10} {'Tests/s':>10} {'Noise':>8}")
+        for version in self.versions:
+            durations, failures, seconds = matrix[version]
+            time_per_run = statistics.fmean(seconds) if seconds else 0.0
+            tests_per_second = len(durations) / time_per_run if time_per_run else 0.0
+            failed = statistics.fmean(failures) if failures else 0
+            # Median coefficient of variation across repeats tells how much of a difference is noise
+            cvs = [
+                statistics.stdev(samples) / statistics.fmean(samples)
+                for samples in durations.values()
+                if len(samples) > 1 and statistics.fmean(samples) > 0
+            ]
+            noise = f'{statistics.median(cvs) * 100:.1f}%' if cvs else 'n/a'
+            report.append(
+                f'{version:12} {len(durations):>8} {failed:>8.1f} {time_per_run:>10.3f} {tests_per_second:>10.2f} {noise:>8}'
             )
+        report.append('')
 
-            output_lines = []
-            for line in process.stdout:
-                print(line, end='')  # Display output in real-time
-                output_lines.append(line)
-
-            process.wait()
-            output = ''.join(output_lines)
-
-            # Parse the report output for PASS_FAIL failures
-            self._parse_report_output(output, warp_type)
-            self._display_run_report(output, warp_type)
-        except subprocess.TimeoutExpired:
-            Util.warning(f'Test timed out for {warp_type} WARP')
-        except Exception as e:
-            Util.warning(f'Error running test: {e}')
-        finally:
-            os.chdir(original_dir)
-
-    def _parse_report_output(self, output, warp_type):
-        """Parse the report output from webgfx.py to extract PASS_FAIL failures"""
-        failures = []
-
-        # Find [PASS_FAIL] section and extract test names
-        in_pass_fail_section = False
-        for line in output.split('\n'):
-            line = line.strip()
-
-            # [INFO] means we've exited the PASS_FAIL section
-            if line.startswith('[INFO]'):
-                in_pass_fail_section = False
+        for version in self.versions:
+            durations = matrix[version][0]
+            slowest = sorted(durations.items(), key=lambda item: statistics.fmean(item[1]), reverse=True)
+            if not slowest:
                 continue
+            report.append('-' * 60)
+            report.append(f'Slowest {min(self.slowest, len(slowest))} tests with {version} (mean s)')
+            report.append('-' * 60)
+            for test, samples in slowest[: self.slowest]:
+                report.append(f'  {test}: {statistics.fmean(samples):.3f}')
+            report.append('')
 
-            if line == '[PASS_FAIL]':
-                in_pass_fail_section = True
-                continue
-            elif line.startswith('[') and line.endswith(']'):
-                # Another section started, stop parsing PASS_FAIL
-                in_pass_fail_section = False
+        if self.repeat < 2:
+            report.append('Significance needs --repeat 2 or more')
+            report.append('')
+        base_durations = matrix[self.baseline][0]
+        for version in self.versions:
+            if version == self.baseline:
                 continue
+            slowdowns = []
+            for test, samples in matrix[version][0].items():
+                base_samples = base_durations.get(test)
+                if not base_samples:
+                    continue
+                base_mean, mean = statistics.fmean(base_samples), statistics.fmean(samples)
+                if base_mean <= 0 or mean < base_mean * (1 + self.min_slowdown / 100):
+                    continue
+                _, _, p = welch_t_test(base_samples, samples)
+                if p < self.alpha:
+                    slowdowns.append([test, base_mean, mean, p])
+            slowdowns.sort(key=lambda slowdown: slowdown[2] / slowdown[1], reverse=True)
+            report.append('-' * 60)
+            report.append(f'Significant slowdowns of {version} against {self.baseline} ({len(slowdowns)} tests)')
+            report.append('-' * 60)
+            for test, base_mean, mean, p in slowdowns:
+                report.append(
+                    f'  {test}: {base_mean:.3f} -> {mean:.3f}, {(mean / base_mean - 1) * 100:+.1f}%, p={p:.4f}'
+                )
+            report.append('')
 
-            if in_pass_fail_section and line:
-                # Each non-empty line in PASS_FAIL section is a test name
-                failures.append(line)
-
-        # Also parse summary line for counts: "PASS_FAIL X, FAIL_PASS Y, ..."
-        summary_match = re.search(r'PASS_FAIL\s+(\d+)', output)
-        if summary_match:
-            self.results[warp_type]['failed'] = int(summary_match.group(1))
-        else:
-            self.results[warp_type]['failed'] = len(failures)
-
-        # Parse PASS_PASS count
-        pass_match = re.search(r'PASS_PASS\s+(\d+)', output)
-        if pass_match:
-            self.results[warp_type]['passed'] = int(pass_match.group(1))
-
-        self.results[warp_type]['failures'] = failures
-
-    def _display_run_report(self, output, warp_type):
-        """Display report after each test run"""
-        print('')
-        print('=' * 60)
-        print(f'{warp_type.upper()} WARP Test Results')
-        print('=' * 60)
-        print(f"Passed:  {self.results[warp_type]['passed']}")
-        print(f"Failed:  {self.results[warp_type]['failed']}")
-        print(f"Skipped: {self.results[warp_type]['skipped']}")
-
-        if self.results[warp_type]['failures']:
-            print('')
-            print(f"Failed tests ({len(self.results[warp_type]['failures'])}):")
-            for test in self.results[warp_type]['failures']:
-                print(f'  {test}')
-        print('=' * 60)
-        print('')
+        report.append('=' * 60)
+        return '\n'.join(report)
 
     def _generate_report(self):
         """Generate comparison report"""
+        diff = self.diff
         report = []
         report.append('=' * 60)
         report.append('WARP Regression Test Report')
@@ -175,62 +392,62 @@ examples:
         report.append('')
         report.append(f'Target: {self.target}')
         report.append(f'Filter: {self.filter}')
+        report.append(f'Results: {self.result_dir}')
         report.append('')
         report.append('-' * 60)
         report.append('Summary')
         report.append('-' * 60)
         report.append(f"{'':20} {'Old WARP':>15} {'New WARP':>15}")
-        report.append(f"{'Passed':20} {self.results['old']['passed']:>15} {self.results['new']['passed']:>15}")
-        report.append(f"{'Failed':20} {self.results['old']['failed']:>15} {self.results['new']['failed']:>15}")
-        report.append(f"{'Skipped':20} {self.results['old']['skipped']:>15} {self.results['new']['skipped']:>15}")
+        counts = {}
+        for warp_type in self.WARP_TYPES:
+            passed = failed = 0
+            for result in self.results[warp_type].values():
+                passed += len(_passed(result))
+                failed += len(_failed(result))
+            counts[warp_type] = [passed, failed]
+        report.append(f"{'Passed':20} {counts['old'][0]:>15} {counts['new'][0]:>15}")
+        report.append(f"{'Failed':20} {counts['old'][1]:>15} {counts['new'][1]:>15}")
         report.append('')
 
-        # Find regressions (failures in new but not in old)
-        old_failures = set(self.results['old']['failures'])
-        new_failures = set(self.results['new']['failures'])
-
-        regressions = new_failures - old_failures
-        improvements = old_failures - new_failures
-        persistent_failures = old_failures & new_failures
-
-        if old_failures:
-            report.append('-' * 60)
-            report.append(f'Old WARP Failures ({len(old_failures)} tests):')
-            report.append('-' * 60)
-            for test in sorted(old_failures):
-                report.append(f'  {test}')
-            report.append('')
-
-        if new_failures:
+        sections = [
+            ['regressions', 'Regressions ({} tests passed in old WARP but failed in new)'],
+            ['persistent', 'Persistent Failures ({} tests failed in both old and new WARP)'],
+            ['improvements', 'Improvements ({} tests failed in old WARP but passed in new)'],
+            ['old_only', 'Old WARP Only ({} tests ran only with old WARP)'],
+            ['new_only', 'New WARP Only ({} tests ran only with new WARP)'],
+        ]
+        for category, title in sections:
+            if not diff[category]:
+                continue
             report.append('-' * 60)
-            report.append(f'New WARP Failures ({len(new_failures)} tests):')
+            report.append(title.format(len(diff[category])))
             report.append('-' * 60)
-            for test in sorted(new_failures):
+            for test in diff[category]:
                 report.append(f'  {test}')
             report.append('')
 
-        if regressions:
+        timing = diff['timing']
+        if timing and not self.run_serial:
             report.append('-' * 60)
-            report.append(f'Regressions ({len(regressions)} tests passed in old WARP but failed in new):')
-            report.append('-' * 60)
-            for test in sorted(regressions):
-                report.append(f'  {test}')
+            report.append('Timing is not compared, old and new WARP ran side by side, use --run-serial to compare it')
             report.append('')
-
-        if persistent_failures:
+        elif timing:
+            old_total = sum(old_time for _, old_time, _ in timing)
+            new_total = sum(new_time for _, _, new_time in timing)
             report.append('-' * 60)
-            report.append(f'Persistent Failures ({len(persistent_failures)} tests failed in both old and new WARP):')
+            report.append(f'Timing ({len(timing)} tests timed in both runs)')
             report.append('-' * 60)
-            for test in sorted(persistent_failures):
-                report.append(f'  {test}')
-            report.append('')
-
-        if improvements:
-            report.append('-' * 60)
-            report.append(f'Improvements ({len(improvements)} tests failed in old WARP but passed in new):')
-            report.append('-' * 60)
-            for test in sorted(improvements):
-                report.append(f'  {test}')
+            report.append(f"{'Total (s)':20} {old_total:>15.3f} {new_total:>15.3f}")
+            for title, tests in [
+                ['Slowdowns', [t for t in timing if t[2] > t[1]][: self.report_timing]],
+                ['Speedups', [t for t in reversed(timing) if t[2] < t[1]][: self.report_timing]],
+            ]:
+                if not tests:
+                    continue
+                report.append('')
+                report.append(f'{title} (old s -> new s, delta):')
+                for test, old_time, new_time in tests:
+                    report.append(f'  {test}: {old_time:.3f} -> {new_time:.3f}, {new_time - old_time:+.3f}')
             report.append('')
 
         report.append('=' * 60)
@@ -241,10 +458,7 @@ examples:
         """Send email with the report"""
         subject = f'WARP Regression Test Report - {self.target}'
 
-        old_failures = set(self.results['old']['failures'])
-        new_failures = set(self.results['new']['failures'])
-        regressions = new_failures - old_failures
-
+        regressions = self.diff['regressions']
         if regressions:
             subject += f' - {len(regressions)} REGRESSIONS'
         else:
@@ -255,17 +469,30 @@ examples:
 
     def run(self):
         """Run the regression test"""
+        if self.versions:
+            Util.info(f"Starting WARP performance matrix for {self.target}: {', '.join(self.versions)}")
+            self._run_matrix()
+            matrix = {version: self._load_durations(version) for version in self.versions}
+            report = self._generate_matrix_report(matrix)
+            print(report)
+            Util.append_file(f'{self.result_dir}/report.txt', report)
+            if self.send_email:
+                Util.send_email(subject=f'WARP Performance Matrix Report - {self.target}', content=report)
+            return
+
         Util.info(f'Starting WARP regression test for: {self.target}')
 
-        # Run with old WARP
-        self._run_test('old')
+        # Run old and new WARP side by side, or one after another to compare their timing
+        self._run_tests()
 
-        # Run with new WARP
-        self._run_test('new')
+        for warp_type in self.WARP_TYPES:
+            self.results[warp_type] = self._load_results(warp_type)
+        self.diff = diff_results(self.results['old'], self.results['new'])
 
         # Generate report
         report = self._generate_report()
         print(report)
+        Util.append_file(f'{self.result_dir}/report.txt', report)
 
         # Send email if requested
         if self.send_email:
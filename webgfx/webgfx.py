@@ -17,6 +17,15 @@ from edge_sync import EdgeSyncError, EdgeSyncFix
 from project import configure_depot_tools_path, detect_project, Project
 
 
+def get_result_type(result_file):
+    """Return the TestResult type of a result file name, or None if it's not a test result."""
+    if "angle" in result_file or "webgl" in result_file or "webgpu" in result_file:
+        return "gtest_angle"
+    if "dawn" in result_file:
+        return "dawn"
+    return None
+
+
 class Webgfx(Program):
     SKIP_CASES = {
         # Util.LINUX: ['WebglConformance_conformance2_textures_misc_tex_3d_size_limit'],
@@ -110,6 +119,27 @@ class Webgfx(Program):
         )
         parser.add_argument("--run-jobs", dest="run_jobs", help="run jobs", default=0)
         parser.add_argument("--run-dry", dest="run_dry", help="dry run", action="store_true")
+        parser.add_argument(
+            "--run-out-suffix",
+            dest="run_out_suffix",
+            help="run from a hardlinked copy of the out dir with this suffix, so concurrent runs don't share it",
+            default="",
+        )
+        parser.add_argument("--run-result-dir", dest="run_result_dir", help="result dir, default is result/<timestamp>")
+        parser.add_argument(
+            "--run-stall-timeout",
+            dest="run_stall_timeout",
+            help="minutes without test progress before a run is killed, 0 to disable",
+            type=int,
+            default=30,
+        )
+        parser.add_argument(
+            "--run-max-fail-rate",
+            dest="run_max_fail_rate",
+            help="failure percentage that aborts a run, 0 to disable",
+            type=int,
+            default=0,
+        )
         parser.add_argument("--repeat", dest="repeat", help="repeat tests n times", type=int, default=1)
         parser.add_argument(
             "--warp", dest="warp", help="use WARP DLL version (e.g. '1.0.18', '1.0.19', '1.0.20') or 'system' for system WARP", default=None
@@ -140,6 +170,7 @@ examples:
 {0} {1} --batch --target dawn
 {0} {1} --target angle --run --run-filter EXTBlendFuncExtendedDrawTest
 {0} {1} --target webgl --run --run-combo 2
+{0} {1} --target angle --run --warp 1.0.20 --run-out-suffix _warp_new --run-result-dir d:/r/result/warp/new
 {0} {1} --target dawn_perf_tests --root-dir d:/r/dawn --makefile --build
 {0} {1} --target gl_unittests --root-dir d:/r/cr --makefile --build --backup
 {0} {1} --target chrome --root-dir d:/r/edge --edge-sync-fix apply --sync --makefile --build
@@ -172,7 +203,10 @@ examples:
             except EdgeSyncError as error:
                 Util.error(str(error))
 
-        self.result_dir = f"{root_dir}/result/{self.timestamp}"
+        if args.run_result_dir:
+            self.result_dir = args.run_result_dir
+        else:
+            self.result_dir = f"{root_dir}/result/{self.timestamp}"
 
         self.run_log = f"{self.result_dir}/run.log"
         Util.ensure_nofile(self.run_log)
@@ -268,6 +302,8 @@ examples:
             if args.download:
                 project.download()
             if args.run or args.batch:
+                if args.run_out_suffix and self.run_rev == "out":
+                    project.isolate_out_dir(args.run_out_suffix)
                 self.run(project, target)
             if args.upload:
                 project.upload()
@@ -297,6 +333,8 @@ examples:
                 jobs=self.run_jobs,
                 warp=self.args.warp,
                 index=i,
+                stall_timeout=self.args.run_stall_timeout,
+                max_fail_rate=self.args.run_max_fail_rate,
             )
 
     def report(self):
@@ -307,11 +345,8 @@ examples:
         summary = "Final summary:\n"
         details = "Final details:\n"
         for result_file in os.listdir(self.result_dir):
-            if "angle" in result_file or "webgl" in result_file or "webgpu" in result_file:
-                test_type = "gtest_angle"
-            elif "dawn" in result_file:
-                test_type = "dawn"
-            else:
+            test_type = get_result_type(result_file)
+            if not test_type:
                 continue
 
             result = TestResult(f"{self.result_dir}/{result_file}", test_type)
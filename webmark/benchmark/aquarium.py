@@ -38,7 +38,7 @@ class aquarium(Benchmark):
         element_id = 'setSetting' + str(index)
         driver.find_element_by_id(element_id).click()
         time.sleep(5)
-        self.result = self.get_result_periodic(driver)
+        self.result = self.get_result_fps(driver)
 
     def get_result_one(self, driver):
         return self.e.get_attribute('innerText')
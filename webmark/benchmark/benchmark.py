@@ -3,6 +3,7 @@ import platform
 import re
 import subprocess
 import sys
+import threading
 
 HOST_OS = sys.platform
 if HOST_OS == 'win32':
@@ -28,6 +29,8 @@ sys.path.append(script_dir)
 sys.path.append(script_dir + '/..')
 
 from util.base import * # pylint: disable=unused-wildcard-import
+from selenium.common.exceptions import NoSuchElementException, TimeoutException, WebDriverException
+from benchmark import registry, stats
 
 category_info = {
     'comprehensive': 'Comprehensive',
@@ -43,6 +46,59 @@ category_info = {
     'render': 'PageRendering',
 }
 
+# Url of the local asset server that serves the mirrored corpus, set by webmark when a case uses path_type builtin
+builtin_webserver = ''
+
+# How many measured rounds each case needed to converge in adaptive mode, used as the starting point of later runs
+ITERATION_PLAN_FILE = '%s/iteration_plan.json' % ScriptRepo.IGNORE_WEBMARK_RESULT_DIR
+# Cases may run in parallel and update the plan at the same time
+iteration_plan_lock = threading.Lock()
+
+# Resolves once the expression of a state (CONFIG['waits'] of the state) is true, instead of polling the state over
+# WebDriver. The expression is checked in the page on every DOM mutation and every few ms. The script gives up after
+# the timeout, so the state is still checked from time to time. A navigation ends the script with an error.
+WAIT_SCRIPT = '''
+    var expression = arguments[0];
+    var timeout = arguments[1];
+    var done = arguments[arguments.length - 1];
+    var finished = false;
+    var observer = null;
+    var timers = [];
+    function check() {
+      try {
+        return !!(new Function('return (' + expression + ');'))();
+      } catch (e) {
+        return false;
+      }
+    }
+    function finish(value) {
+      if (finished) {
+        return;
+      }
+      finished = true;
+      if (observer) {
+        observer.disconnect();
+      }
+      timers.forEach(clearTimeout);
+      timers.forEach(clearInterval);
+      done(value);
+    }
+    function onChange() {
+      if (check()) {
+        finish(true);
+      }
+    }
+    if (check()) {
+      finish(true);
+      return;
+    }
+    observer = new MutationObserver(onChange);
+    observer.observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+    // Page variables don't show in the DOM, but checking them in the page costs no round trip
+    timers.push(setInterval(onChange, 50));
+    timers.push(setTimeout(function() { finish(false); }, timeout));
+'''
+
 metric_info = {
     'score': 'Score(+)',
     'fps': 'FPS(+)',
@@ -55,19 +111,8 @@ class Benchmark(object):
         self.driver = driver
 
         # handle states
-        funcs = [func for func in dir(self) if callable(getattr(self, func))]
-        self.states = []
+        self.states = [[getattr(self, cond), getattr(self, act)] for cond, act in registry.get_states(self.__class__)]
         self.run_fail = False
-        count = 0
-        pattern_cond = re.compile('cond(\d+)')
-        for func in funcs:
-            match = pattern_cond.match(func)
-            if match:
-                count_temp = int(match.group(1))
-                if count_temp > count:
-                    count = count_temp
-        for i in range(count + 1):
-            self.states.append([getattr(self, 'cond' + str(i)), getattr(self, 'act' + str(i))])
 
         # handle general members
         config = self.CONFIG
@@ -79,10 +124,25 @@ class Benchmark(object):
             'path_type': 'internal',
             'timeout': 300,
             'sleep': 3,
+            # event waits in the page for the expression of a state (CONFIG['waits']) before checking it, states
+            # without one are checked every sleep seconds. poll checks every state every sleep seconds.
+            'wait_mode': 'event',
             'times_run': 1,
             'times_skip': 0,
             'dryrun': False,
             'stat': 'average',
+            'outlier': 'none',
+            'confidence': 0.95,
+            # Adaptive mode: with ci_target (CI half-width in percent of the result) set, rounds repeat until
+            # the first value converges, between times_min and times_max measured rounds or until time_budget seconds.
+            'ci_target': 0,
+            'times_min': 3,
+            'times_max': 20,
+            'time_budget': 0,
+            # FPS benchmarks: raf records every frame with requestAnimationFrame for frame_duration seconds, or over
+            # the whole test of pages that run one on their own. periodic reads the page's own FPS result instead.
+            'frame_sampler': 'raf',
+            'frame_duration': 10,
             'orientation': 'landscape',
             'device_id': 'NA',
             'target_os': 'NA',
@@ -103,19 +163,33 @@ class Benchmark(object):
                 self.__dict__[key] = members[key]
 
         # handle path
-        key = 'path'
-        if hasattr(case, key):
-            self.__dict__[key] = getattr(case, key)
-        elif key in config:
-            if self.version in config[key]:
-                self.__dict__[key] = config[key][self.version][self.path_type]
+        self.path = self.get_url(case)
+
+    @classmethod
+    def get_url(cls, case):
+        # Url the case opens, from its config and CONFIG, so it's known without a driver or a benchmark instance
+        config = cls.CONFIG
+        path_type = getattr(case, 'path_type', config.get('path_type', 'internal'))
+        if hasattr(case, 'path'):
+            path = case.path
+        else:
+            paths = registry.get_paths(config, getattr(case, 'version', config.get('version', 'NA')))
+            # The builtin corpus mirrors the layout of the internal web server
+            if path_type == 'builtin' and 'builtin' not in paths:
+                path = paths['internal']
             else:
-                self.__dict__[key] = config[key][self.path_type]
-        if self.path_type == 'internal':
-            if not re.match('http', self.__dict__[key]):
-                self.__dict__[key] = Util.INTERNAL_WEBSERVER_WEBBENCH + '/' + self.__dict__[key]
-        elif self.path_type == 'local':
-            self.__dict__[key] = 'file:///data/local/tmp/' + self.__dict__[key]
+                path = paths[path_type]
+        if path_type == 'internal':
+            if not re.match('http', path):
+                path = Util.INTERNAL_WEBSERVER_WEBBENCH + '/' + path
+        elif path_type == 'builtin':
+            if not builtin_webserver:
+                Util.error('The builtin web server is not started for ' + config.get('name', case.name))
+            if not re.match('http', path):
+                path = builtin_webserver + '/' + path
+        elif path_type == 'local':
+            path = 'file:///data/local/tmp/' + path
+        return path
 
     def get_result(self, driver):
         if self.dryrun:
@@ -140,101 +214,263 @@ class Benchmark(object):
 
         return [str(round(result, 2))]
 
+    def get_result_fps(self, driver):
+        if self.frame_sampler == 'periodic':
+            return self.get_result_periodic(driver)
+        return self.get_result_frames(driver, self.frame_duration)
+
+    def get_result_frames(self, driver, duration):
+        # The whole series comes back in one round trip, instead of one WebDriver call per sample
+        script = '''
+    var duration = arguments[0];
+    var done = arguments[arguments.length - 1];
+    var timestamps = [];
+    function tick(timestamp) {
+      timestamps.push(timestamp);
+      if (timestamp - timestamps[0] < duration) {
+        requestAnimationFrame(tick);
+      } else {
+        done(timestamps);
+      }
+    }
+    requestAnimationFrame(tick);
+        '''
+        driver.set_script_timeout(duration + 30)
+        return self._get_frame_result(driver.execute_async_script(script, duration * 1000))
+
+    def start_frames(self, driver):
+        # For pages that run their test on their own, record every frame in the page until stop_frames()
+        script = '''
+    var recorder = window.webmarkFrames = {timestamps: [], stopped: false};
+    function tick(timestamp) {
+      if (!recorder.stopped) {
+        recorder.timestamps.push(timestamp);
+        requestAnimationFrame(tick);
+      }
+    }
+    requestAnimationFrame(tick);
+        '''
+        driver.execute_script(script)
+
+    def stop_frames(self, driver):
+        # The frames recorded since start_frames() come back in one round trip
+        script = '''
+    var recorder = window.webmarkFrames;
+    if (!recorder) {
+      return [];
+    }
+    recorder.stopped = true;
+    return recorder.timestamps;
+        '''
+        return self._get_frame_result(driver.execute_script(script))
+
+    def _get_frame_result(self, timestamps):
+        frames = stats.frame_stats(timestamps)
+        Util.info('Frame result: %s frames, p50 %sms, p95 %sms, p99 %sms, jank %s' % (
+            frames['frames'], round(frames['p50'], 2), round(frames['p95'], 2), round(frames['p99'], 2), frames['jank']))
+        # FPS stays the first value, frame times and jank count follow as sub results
+        return [str(round(frames[key], 2)) for key in ['fps', 'p50', 'p95', 'p99', 'jank']]
+
     # Each specific benchmark only returns result in string format, we will convert them to float here.
     def run(self):
-            Util.info('Begin to run "%s" version "%s"' % (self.name, self.version))
+        Util.info('Begin to run "%s" version "%s"' % (self.name, self.version))
+        if self.stat not in stats.STAT_FUNCS:
+            Util.error('Unknown stat %s for %s' % (self.stat, self.name))
+        adaptive = self.ci_target > 0
+        if adaptive:
+            # Warm-up rounds come on top of the measured ones
+            times_check = self.times_skip + max(self._get_planned_times(), 2)
+            times_run = self.times_skip + max(self.times_max, 2)
+        else:
             times_run = self.times_run
-            times_skip = self.times_skip
-            driver = self.driver
-
-            results = []
-            for i in range(times_run):
-                self.result = []
-                self.state = 0
-                if not self.dryrun:
-                    print(self.path)
-                    driver.get(self.path)
-                    try:
-                        WebDriverWait(driver, self.timeout, self.sleep).until(self._is_finished)
-                    except Exception:
-                        self.run_fail = True
-                if times_skip > 0:
-                    times_skip = times_skip - 1
-                    continue
-                result = self.get_result(driver)
+            if self.times_skip >= times_run:
+                Util.error('times_skip %s leaves no round to measure for %s' % (self.times_skip, self.name))
+
+        # The first times_skip rounds are warm-up, they run the same way but their results are dropped
+        results = []
+        self.round_times = []
+        # [seconds waiting for the page, seconds driving it] of each measured round
+        self.round_waits = []
+        start_time = time.time()
+        for i in range(times_run):
+            round_start_time = time.time()
+            result = self._run_round()
+            if i < self.times_skip:
+                Util.info('Warm-up result: ' + ','.join([str(x) for x in result]))
+            else:
                 Util.info('Round result: ' + ','.join([str(x) for x in result]))
                 results.append([float(x) for x in result])
-                if self.run_fail:
+                self.round_times.append(time.time() - round_start_time)
+                self.round_waits.append([self.wait_time, self.work_time])
+            if self.run_fail:
+                break
+
+            if adaptive and i + 1 >= times_check:
+                if self._is_converged(results):
+                    Util.info('Converged after %s rounds' % len(results))
                     break
+                if self.time_budget and time.time() - start_time >= self.time_budget:
+                    Util.warning('%s did not converge in the time budget of %ss' % (self.name, self.time_budget))
+                    break
+        else:
+            if adaptive:
+                Util.warning('%s did not converge in %s rounds' % (self.name, len(results)))
+
+        if len(results) == 0:
+            Util.error('There is no result for ' + self.name)
+        if adaptive and not self.run_fail and not self.dryrun:
+            # Save the fewest rounds that would have converged, so the plan can also shrink
+            times_needed = len(results)
+            for count in range(max(self.times_min, 2), len(results)):
+                if self._is_converged(results[:count], verbose=False):
+                    times_needed = count
+                    break
+            self._save_planned_times(times_needed)
+
+        # Each round may report several values (total score and sub scores), every one gets its own statistics
+        self.samples = results
+        self.summaries = []
+        count_result = min(len(result) for result in results)
+        for i in range(count_result):
+            values = [result[i] for result in results]
+            summary = stats.summarize(values, self.stat, self.outlier, self.confidence)
+            if summary['outliers']:
+                Util.info('Outliers dropped: ' + ','.join(str(x) for x in summary['outliers']))
+            self.summaries.append(summary)
+
+        outputs = [self.category, self.__class__.__name__, self.version, self.metric]
+        outputs.append(','.join(str(round(summary['value'], 2)) for summary in self.summaries))
+        cis = ','.join('%s~%s' % (round(summary['ci_low'], 2), round(summary['ci_high'], 2)) for summary in self.summaries)
+        self.result_line = 'Case result: %s | CI%d: %s | CV: %s%%' % (','.join(outputs), round(self.confidence * 100), cis, round(self.summaries[0]['cv'] * 100, 2))
+        if self.round_waits:
+            self.result_line += ' | Wait/Work: %ss/%ss' % (round(sum(x[0] for x in self.round_waits), 2), round(sum(x[1] for x in self.round_waits), 2))
+        return self.result_line
 
-            count_results = len(results)
-            if count_results == 0:
-                Util.error('There is no result for ' + self.name)
+    def _is_converged(self, results, verbose=True):
+        values = [result[0] for result in results]
+        summary = stats.summarize(values, self.stat, self.outlier, self.confidence)
+        if summary['value'] == 0:
+            return False
+        half_width = (summary['ci_high'] - summary['ci_low']) / 2 / abs(summary['value']) * 100
+        if verbose:
+            Util.info('CI half-width: %s%% (target %s%%)' % (round(half_width, 2), self.ci_target))
+        return half_width <= self.ci_target
 
-            results = sorted(results, key=lambda i: i[0])
-            results_final = []
-            if self.stat == 'median':
-                count_results = len(results)
-                if count_results % 2:
-                    results_final = results[(count_results - 1) / 2]
+    def _get_plan_key(self):
+        return '%s|%s|%s' % (self.__class__.__name__, self.version, self.stat)
+
+    def _get_planned_times(self):
+        if os.path.exists(ITERATION_PLAN_FILE):
+            try:
+                with open(ITERATION_PLAN_FILE) as f:
+                    plan = json.load(f)
+                if self._get_plan_key() in plan:
+                    return min(max(plan[self._get_plan_key()], self.times_min), self.times_max)
+            except ValueError:
+                Util.warning('Ignore the broken iteration plan ' + ITERATION_PLAN_FILE)
+        return self.times_min
+
+    def _save_planned_times(self, times):
+        with iteration_plan_lock:
+            plan = {}
+            if os.path.exists(ITERATION_PLAN_FILE):
+                try:
+                    with open(ITERATION_PLAN_FILE) as f:
+                        plan = json.load(f)
+                except ValueError:
+                    plan = {}
+            plan[self._get_plan_key()] = times
+            Util.ensure_dir(os.path.dirname(ITERATION_PLAN_FILE))
+            Util.dump_json(ITERATION_PLAN_FILE, plan)
+
+    def _run_round(self):
+        self.result = []
+        self.state = 0
+        self.wait_time = 0.0
+        self.work_time = 0.0
+        if not self.dryrun:
+            print(self.path)
+            self.driver.get(self.path)
+            try:
+                if self.wait_mode == 'poll':
+                    round_start_time = time.time()
+                    WebDriverWait(self.driver, self.timeout, self.sleep).until(self._is_finished)
+                    self.wait_time = time.time() - round_start_time - self.work_time
                 else:
-                    results_total = results[(count_results - 1) / 2]
-                    count_result = len(results[0])
-                    for i in range(count_result):
-                        results_total[i] += results[(count_results - 1) / 2 + 1][i]
-                    for i in range(count_result):
-                        results_final.append(round(results_total[i] / 2, 2))
-            elif self.stat == 'average':
-                results_total = results[0]
-                count_result = len(results[0])
-                for i in range(1, count_results):
-                    for j in range(count_result):
-                        results_total[j] += results[i][j]
-
-                for i in range(count_result):
-                    results_final.append(round(results_total[i] / count_results, 2))
-            elif self.stat == 'min' or self.stat == 'max':
-                if self.stat == 'min':
-                    results_final = results[0]
+                    self._wait_states()
+            except Exception:
+                self.run_fail = True
+            Util.info('Wait %ss, work %ss' % (round(self.wait_time, 2), round(self.work_time, 2)))
+        return self.get_result(self.driver)
+
+    def _wait_states(self):
+        waits = self.CONFIG.get('waits', {})
+        deadline = time.time() + self.timeout
+        while self.state < len(self.states):
+            cond, act = self.states[self.state]
+            wait_start = time.time()
+            try:
+                ready = cond(self.driver)
+            except NoSuchElementException:
+                ready = False
+            if not ready:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise TimeoutException('%s timed out in state %s' % (self.name, self.state))
+                if self.state in waits:
+                    self._wait_page(waits[self.state], min(remaining, self.sleep))
                 else:
-                    results_final = results[-1]
-
-            outputs = []
-            for item in ['category', 'name', 'version', 'metric', 'result']:
-                if item == 'category':
-                    outputs.append(self.category)
-                elif item == 'name':
-                    outputs.append(self.__class__.__name__)
-                elif item == 'version':
-                    outputs.append(self.version)
-                elif item == 'metric':
-                    outputs.append(self.metric)
-                elif item == 'result':
-                    outputs.append(','.join(str(x) for x in results_final))
-            return 'Case result: ' + ','.join(outputs)
+                    # Nothing tells when the state is reached, checking it more often would only add driver traffic
+                    time.sleep(min(remaining, self.sleep))
+                self.wait_time += time.time() - wait_start
+                continue
+            self.wait_time += time.time() - wait_start
+
+            act_start = time.time()
+            if act:
+                act(self.driver)
+            self.work_time += time.time() - act_start
+            self.state += 1
+
+    def _wait_page(self, expression, timeout):
+        self.driver.set_script_timeout(timeout + 10)
+        try:
+            self.driver.execute_async_script(WAIT_SCRIPT, expression, int(timeout * 1000))
+        except WebDriverException:
+            # The page navigated away or the script was blocked, the state is checked again right away
+            time.sleep(0.1)
 
     def inject_jperf(self, driver):
         if self.path_type == 'internal':
             js = '%s/jperf/jperf.js' % Util.INTERNAL_WEBSERVER_WEBBENCH
+        elif self.path_type == 'builtin':
+            js = '%s/jperf/jperf.js' % builtin_webserver
         else:
             js = 'https://raw.githubusercontent.com/gyagp/webbench/master/jperf/jperf.js'
         self.inject_js(driver, js)
 
     def inject_js(self, driver, js):
+        # Return once the script is loaded instead of sleeping a fixed time
         script = '''
+    var done = arguments[arguments.length - 1];
     var script = document.createElement('script');
     script.type = 'text/javascript';
     script.src = '%s';
+    script.onload = function() { done(true); };
+    script.onerror = function() { done(false); };
     document.head.appendChild(script);
         ''' % js
-        driver.execute_script('{' + script + '}')
-        time.sleep(3)
+        driver.set_script_timeout(30)
+        if not driver.execute_async_script('{' + script + '}'):
+            Util.warning('Failed to load ' + js)
 
     def _is_finished(self, driver):
         if self.states[self.state][0](driver):
             act = self.states[self.state][1]
+            act_start = time.time()
             if act:
                 act(driver)
+            self.work_time += time.time() - act_start
             self.state += 1
             if self.state == len(self.states):
                 return True
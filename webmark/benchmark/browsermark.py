@@ -42,8 +42,14 @@ class browsermark(Benchmark):
         if self.version == '2.0' and self.path_type == 'external':
             if not case.username or not case.password:
                 error('Username and password are needed to run this case')
-            self.path = self.path.replace('username', case.username)
-            self.path = self.path.replace('password', case.password)
+
+    @classmethod
+    def get_url(cls, case):
+        url = super(browsermark, cls).get_url(case)
+        # The corporate site of 2.0 takes the credentials of the case
+        if 'username:password@' in url and getattr(case, 'username', '') and getattr(case, 'password', ''):
+            url = url.replace('username:password@', '%s:%s@' % (case.username, case.password))
+        return url
 
     def cond0(self, driver):
         if self.version == '2.0' and self.path_type == 'external' and driver.find_elements_by_id('continent'):
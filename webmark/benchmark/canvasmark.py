@@ -6,6 +6,9 @@ class canvasmark(Benchmark):
         'name': 'canvasmark',
         'version': '2013',
         'metric': metric_info['score'],
+        'waits': {
+            1: "document.getElementById('results') && document.getElementById('results').textContent.trim() != ''",
+        },
         'path': {
             'external': 'http://www.kevs3d.co.uk/dev/canvasmark/',
             'internal': 'webbench/canvas2d/canvasmark/'
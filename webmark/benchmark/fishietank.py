@@ -54,7 +54,7 @@ class fishietank(Benchmark):
         index = (self.counts_fish.index(self.count_fish) + 1) * 2
         self.e[index].click()
         time.sleep(5)
-        self.result = self.get_result_periodic(driver)
+        self.result = self.get_result_fps(driver)
 
     def get_result_one(self, driver):
         pattern = re.compile('(\d+\.?\d*) FPS')
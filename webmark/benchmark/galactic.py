@@ -38,7 +38,7 @@ class galactic(Benchmark):
             return False
 
     def act0(self, driver):
-        self.result = self.get_result_periodic(driver)
+        self.result = self.get_result_fps(driver)
 
     def get_result_one(self, driver):
         return str(driver.execute_script('return gFpsData.AvgFps'))
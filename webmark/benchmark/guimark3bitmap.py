@@ -6,6 +6,9 @@ class guimark3bitmap(Benchmark):
         'name': 'GUIMark3 bitmap',
         'version': 'nocache',
         'metric': metric_info['fps'],
+        'waits': {
+            1: "document.getElementById('testlabel') && document.getElementById('testlabel').textContent.indexOf('Test Results:') != -1",
+        },
         'path': {
             'nocache': {
                 'external': 'http://www.craftymind.com/factory/guimark3/bitmap/GM3_JS_Bitmap.html',
@@ -31,6 +34,8 @@ class guimark3bitmap(Benchmark):
 
     def act0(self, driver):
         self.e.click()
+        if self.frame_sampler == 'raf':
+            self.start_frames(driver)
 
     def cond1(self, driver):
         self.e = driver.find_element_by_id('testlabel')
@@ -40,6 +45,9 @@ class guimark3bitmap(Benchmark):
             return False
 
     def act1(self, driver):
+        if self.frame_sampler == 'raf':
+            self.result = self.stop_frames(driver)
+            return
         pattern = re.compile('(\d+\.?\d*) fps')
         match = pattern.search(self.e.text)
         self.result.append(match.group(1))
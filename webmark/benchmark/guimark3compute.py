@@ -5,6 +5,9 @@ class guimark3compute(Benchmark):
         'category': category_info['canvas2d'],
         'name': 'GUIMark3 Compute',
         'metric': metric_info['fps'],
+        'waits': {
+            1: "document.getElementById('testlabel') && document.getElementById('testlabel').textContent.indexOf('Test Results:') != -1",
+        },
         'path': {
             'external': 'http://www.craftymind.com/factory/guimark3/compute/GM3_JS_Compute.html',
             'internal': 'webbench/canvas2d/guimark3/compute/GM3_JS_Compute.html'
@@ -22,6 +25,8 @@ class guimark3compute(Benchmark):
 
     def act0(self, driver):
         self.e.click()
+        if self.frame_sampler == 'raf':
+            self.start_frames(driver)
 
     def cond1(self, driver):
         self.e = driver.find_element_by_id('testlabel')
@@ -31,6 +36,9 @@ class guimark3compute(Benchmark):
             return False
 
     def act1(self, driver):
+        if self.frame_sampler == 'raf':
+            self.result = self.stop_frames(driver)
+            return
         pattern = re.compile('(\d+\.?\d*) fps')
         match = pattern.search(self.e.text)
         self.result.append(match.group(1))
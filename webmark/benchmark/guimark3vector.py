@@ -5,6 +5,9 @@ class guimark3vector(Benchmark):
         'category': category_info['canvas2d'],
         'name': 'GUIMark3 Vector',
         'metric': metric_info['fps'],
+        'waits': {
+            1: "document.getElementById('testlabel') && document.getElementById('testlabel').textContent.indexOf('Test Results:') != -1",
+        },
         'path': {
             'external': 'http://www.craftymind.com/factory/guimark3/vector/GM3_JS_Vector.html',
             'internal': 'webbench/canvas2d/guimark3/vector/GM3_JS_Vector.html'
@@ -21,6 +24,8 @@ class guimark3vector(Benchmark):
 
     def act0(self, driver):
         self.e.click()
+        if self.frame_sampler == 'raf':
+            self.start_frames(driver)
 
     def cond1(self, driver):
         self.e = driver.find_element_by_id('testlabel')
@@ -30,6 +35,9 @@ class guimark3vector(Benchmark):
             return False
 
     def act1(self, driver):
+        if self.frame_sampler == 'raf':
+            self.result = self.stop_frames(driver)
+            return
         pattern = re.compile('(\d+\.?\d*) fps')
         match = pattern.search(self.e.text)
         self.result.append(match.group(1))
@@ -6,6 +6,9 @@ class jetstream(Benchmark):
         'name': 'JetStream',
         'version': '1.1',
         'metric': metric_info['score'],
+        'waits': {
+            1: "document.getElementsByClassName('score').length > 0",
+        },
         'path': {
             '1.1': {
                 'external': 'http://browserbench.org/JetStream/',
@@ -6,6 +6,10 @@ class octane(Benchmark):
         'name': 'Octane',
         'version': '2.0',
         'metric': metric_info['score'],
+        'waits': {
+            # main-banner shows the score when all tests are done
+            1: "document.getElementById('main-banner') && document.getElementById('main-banner').textContent.indexOf('Score:') != -1",
+        },
         'path': {
             '2.0': {
                 'external': 'http://octane-benchmark.googlecode.com/svn/latest/index.html',
@@ -20,7 +20,7 @@ class postercircle(CssBenchmark):
 
     def act0(self, driver):
         time.sleep(5)
-        self.result = self.get_result_periodic(driver)
+        self.result = self.get_result_fps(driver)
 
     def get_result_one(self, driver):
         return self.get_css_fps(driver)
@@ -0,0 +1,95 @@
+import importlib
+import re
+import threading
+
+# Case name in config -> module of the benchmark. The benchmark class has the same name as the case.
+# Modules are only imported when a case needs them.
+BENCHMARKS = {
+    'aquarium': 'benchmark.aquarium',
+    'browsermark': 'benchmark.browsermark',
+    'canvasmark': 'benchmark.canvasmark',
+    'cubemap': 'benchmark.cubemap',
+    'fallingleaves': 'benchmark.fallingleaves',
+    'fishietank': 'benchmark.fishietank',
+    'galactic': 'benchmark.galactic',
+    'guimark3bitmap': 'benchmark.guimark3bitmap',
+    'guimark3compute': 'benchmark.guimark3compute',
+    'guimark3vector': 'benchmark.guimark3vector',
+    'jetstream': 'benchmark.jetstream',
+    'kraken': 'benchmark.kraken',
+    'octane': 'benchmark.octane',
+    'postercircle': 'benchmark.postercircle',
+    'speedreading': 'benchmark.speedreading',
+    'sunspider': 'benchmark.sunspider',
+    'toonshading': 'benchmark.toonshading',
+    'webxprt': 'benchmark.webxprt',
+}
+
+PATH_TYPES = ['internal', 'external', 'local', 'builtin']
+
+_classes = {}
+_states = {}
+_lock = threading.Lock()
+
+def register(name, module):
+    BENCHMARKS[name] = module
+
+def get_class(name):
+    with _lock:
+        if name not in _classes:
+            if name not in BENCHMARKS:
+                raise KeyError('Unknown benchmark %s, known ones are %s' % (name, ', '.join(sorted(BENCHMARKS))))
+            _classes[name] = getattr(importlib.import_module(BENCHMARKS[name]), name)
+        return _classes[name]
+
+def get_states(benchmark_class):
+    # Names of the [condN, actN] methods of a benchmark class, in order. They only depend on the class,
+    # so they are found once instead of introspecting every instance.
+    with _lock:
+        if benchmark_class not in _states:
+            pattern_cond = re.compile(r'cond(\d+)$')
+            count = 0
+            for func in dir(benchmark_class):
+                match = pattern_cond.match(func)
+                if match and callable(getattr(benchmark_class, func)):
+                    count = max(count, int(match.group(1)))
+            _states[benchmark_class] = [['cond' + str(i), 'act' + str(i)] for i in range(count + 1)]
+        return _states[benchmark_class]
+
+def get_paths(config, version):
+    # CONFIG['path'] is either keyed by version, {version: {path_type: path}}, or flat, {path_type: path}, shared by
+    # the cases of every version. Return the paths of the version, or None if they are keyed by version without it.
+    paths = config.get('path', {})
+    if any(isinstance(value, dict) for value in paths.values()):
+        return paths.get(version)
+    return paths
+
+def get_url(case):
+    # Url a case opens, without building its benchmark
+    return get_class(case.name).get_url(case)
+
+def validate(case):
+    # Return the problems of a config case, so a bad config fails before any benchmark runs
+    errors = []
+    try:
+        benchmark_class = get_class(case.name)
+    except (KeyError, ImportError, AttributeError) as e:
+        return ['%s: %s' % (case.name, e)]
+
+    for cond, act in get_states(benchmark_class):
+        if not hasattr(benchmark_class, cond) or not hasattr(benchmark_class, act):
+            errors.append('%s: %s or %s is missing' % (case.name, cond, act))
+
+    config = benchmark_class.CONFIG
+    path_type = getattr(case, 'path_type', config.get('path_type', 'internal'))
+    if path_type not in PATH_TYPES:
+        errors.append('%s: unknown path_type %s' % (case.name, path_type))
+    elif not hasattr(case, 'path'):
+        version = getattr(case, 'version', config.get('version', 'NA'))
+        paths = get_paths(config, version)
+        if paths is None:
+            errors.append('%s: unknown version %s' % (case.name, version))
+            return errors
+        if path_type not in paths and not (path_type == 'builtin' and 'internal' in paths):
+            errors.append('%s: no %s path' % (case.name, path_type))
+    return errors
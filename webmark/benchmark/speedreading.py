@@ -5,6 +5,10 @@ class speedreading(Benchmark):
         'category': category_info['canvas2d'],
         'name': 'SpeedReading',
         'metric': metric_info['fps'],
+        'waits': {
+            0: 'startButtonVisible',
+            1: 'tryAgainButtonVisible',
+        },
         'version': 'mod',
         'path': {
             'setinterval': {
@@ -27,9 +31,14 @@ class speedreading(Benchmark):
 
     def act0(self, driver):
         driver.execute_script('StartButtonClicked()')
+        if self.frame_sampler == 'raf':
+            self.start_frames(driver)
 
     def cond1(self, driver):
         return driver.execute_script('return tryAgainButtonVisible')
 
     def act1(self, driver):
-        self.result = [driver.execute_script('fps = Math.floor(1000 / perf.averageDrawTime); return (fps > 57) ? 60 : fps;')]
+        if self.frame_sampler == 'raf':
+            self.result = self.stop_frames(driver)
+        else:
+            self.result = [driver.execute_script('fps = Math.floor(1000 / perf.averageDrawTime); return (fps > 57) ? 60 : fps;')]
@@ -0,0 +1,141 @@
+import math
+import random
+
+# Statistics of benchmark samples. Each function takes a list of floats.
+
+def mean(values):
+    return sum(values) / len(values)
+
+def median(values):
+    values = sorted(values)
+    count = len(values)
+    middle = count // 2
+    if count % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2
+
+def geomean(values):
+    # Only defined for positive values, a zero score makes the whole geomean meaningless
+    if any(value <= 0 for value in values):
+        return 0.0
+    return math.exp(sum(math.log(value) for value in values) / len(values))
+
+def stddev(values):
+    count = len(values)
+    if count < 2:
+        return 0.0
+    m = mean(values)
+    return math.sqrt(sum((value - m) ** 2 for value in values) / (count - 1))
+
+def cv(values):
+    m = mean(values)
+    if m == 0:
+        return 0.0
+    return stddev(values) / abs(m)
+
+# Values of the 'stat' member of Benchmark
+STAT_FUNCS = {
+    'average': mean,
+    'mean': mean,
+    'median': median,
+    'geomean': geomean,
+    'min': min,
+    'max': max,
+}
+
+def bootstrap_ci(values, func=mean, confidence=0.95, resamples=1000, seed=0):
+    # Percentile bootstrap. A fixed seed keeps the interval of the same samples stable across runs.
+    if len(values) < 2:
+        return [func(values), func(values)]
+    rng = random.Random(seed)
+    count = len(values)
+    estimates = sorted(func([values[rng.randrange(count)] for _ in range(count)]) for _ in range(resamples))
+    alpha = (1 - confidence) / 2
+    low = estimates[int(alpha * (resamples - 1))]
+    high = estimates[int(math.ceil((1 - alpha) * (resamples - 1)))]
+    return [low, high]
+
+def permutation_test(values, other_values, resamples=2000, seed=0):
+    # Two-sided p-value of the difference of the means. Makes no assumption on the distribution,
+    # which suits the few and skewed samples of browser benchmarks.
+    if len(values) < 2 or len(other_values) < 2:
+        return 1.0
+    rng = random.Random(seed)
+    observed = abs(mean(values) - mean(other_values))
+    pooled = list(values) + list(other_values)
+    count = len(values)
+    extreme = 0
+    for _ in range(resamples):
+        rng.shuffle(pooled)
+        if abs(mean(pooled[:count]) - mean(pooled[count:])) >= observed - 1e-12:
+            extreme += 1
+    return (extreme + 1) / (resamples + 1)
+
+def reject_outliers(values, method='none'):
+    # Return [kept values, outliers]. iqr drops values beyond 1.5 IQR from the quartiles,
+    # mad drops values whose modified z-score is above 3.5.
+    if method == 'none' or len(values) < 4:
+        return [list(values), []]
+
+    if method == 'iqr':
+        ordered = sorted(values)
+        q1 = percentile(ordered, 25)
+        q3 = percentile(ordered, 75)
+        low = q1 - 1.5 * (q3 - q1)
+        high = q3 + 1.5 * (q3 - q1)
+        is_outlier = lambda value: value < low or value > high
+    elif method == 'mad':
+        m = median(values)
+        mad = median([abs(value - m) for value in values])
+        if mad == 0:
+            return [list(values), []]
+        is_outlier = lambda value: 0.6745 * abs(value - m) / mad > 3.5
+    else:
+        raise ValueError('Unknown outlier method: %s' % method)
+
+    kept = [value for value in values if not is_outlier(value)]
+    outliers = [value for value in values if is_outlier(value)]
+    return [kept, outliers]
+
+def summarize(values, stat='average', outlier='none', confidence=0.95):
+    if stat not in STAT_FUNCS:
+        raise ValueError('Unknown stat: %s' % stat)
+    kept, outliers = reject_outliers(values, outlier)
+    func = STAT_FUNCS[stat]
+    ci_low, ci_high = bootstrap_ci(kept, func, confidence)
+    return {
+        'value': func(kept),
+        'mean': mean(kept),
+        'median': median(kept),
+        'geomean': geomean(kept),
+        'stddev': stddev(kept),
+        'cv': cv(kept),
+        'ci_low': ci_low,
+        'ci_high': ci_high,
+        'count': len(kept),
+        'outliers': outliers,
+    }
+
+def percentile(ordered, percent):
+    # ordered must be sorted. Linear interpolation between the closest ranks.
+    position = (len(ordered) - 1) * percent / 100.0
+    lower = int(math.floor(position))
+    upper = int(math.ceil(position))
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def frame_stats(timestamps):
+    # Frame statistics from requestAnimationFrame timestamps in ms. A jank is a frame that took more than
+    # twice the median frame time, so it doesn't depend on the refresh rate of the display.
+    frame_times = [timestamps[i] - timestamps[i - 1] for i in range(1, len(timestamps))]
+    if not frame_times or timestamps[-1] <= timestamps[0]:
+        return {'fps': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'jank': 0, 'frames': 0}
+    ordered = sorted(frame_times)
+    p50 = percentile(ordered, 50)
+    return {
+        'fps': len(frame_times) * 1000.0 / (timestamps[-1] - timestamps[0]),
+        'p50': p50,
+        'p95': percentile(ordered, 95),
+        'p99': percentile(ordered, 99),
+        'jank': len([frame_time for frame_time in frame_times if frame_time > 2 * p50]),
+        'frames': len(frame_times),
+    }
@@ -22,7 +22,7 @@ class toonshading(Benchmark):
             return False
 
     def act0(self, driver):
-        self.result = self.get_result_periodic(driver)
+        self.result = self.get_result_fps(driver)
 
     def get_result_one(self, driver):
         return self.e.get_attribute('innerText')
@@ -0,0 +1,157 @@
+import csv
+import os
+import platform
+import re
+import subprocess
+import sys
+
+HOST_OS = sys.platform
+if HOST_OS == 'win32':
+    lines = subprocess.Popen('dir %s' % __file__.replace('/', '\\'), shell=True, stdout=subprocess.PIPE).stdout.readlines()
+    for line in lines:
+        match = re.search(r'\[(.*)\]', line.decode('utf-8'))
+        if match:
+            script_dir = os.path.dirname(match.group(1)).replace('\\', '/')
+            break
+    else:
+        script_dir = sys.path[0]
+else:
+    lines = subprocess.Popen('ls -l %s' % __file__, shell=True, stdout=subprocess.PIPE).stdout.readlines()
+    for line in lines:
+        match = re.search(r'.* -> (.*)', line.decode('utf-8'))
+        if match:
+            script_dir = os.path.dirname(match.group(1))
+            break
+    else:
+        script_dir = sys.path[0]
+
+sys.path.append(script_dir)
+sys.path.append(script_dir + '/..')
+
+
+from util.base import * # pylint: disable=unused-wildcard-import
+from benchmark import stats
+
+class Compare():
+    # Compare browsers over the structured results of many webmark runs. Rounds of the same case are pooled per
+    # browser and each browser is tested against the baseline one.
+    def __init__(self):
+        self._parse_args()
+        args = self.program.args
+
+        rounds = []
+        for path in args.results:
+            for result_file in self._get_result_files(path):
+                rounds.extend(self._load_rounds(result_file))
+        if not args.software_gl:
+            # GPU cases that ran on software GL aren't comparable with the hardware ones
+            count = len(rounds)
+            rounds = [record for record in rounds if str(record.get('software_gl', False)) != 'True']
+            if count > len(rounds):
+                Util.warning('Ignore %s rounds on software GL' % (count - len(rounds)))
+        if not args.noisy:
+            # Background activity of the host slowed these down, not the browser
+            count = len(rounds)
+            rounds = [record for record in rounds if str(record.get('noisy', False)) != 'True']
+            if count > len(rounds):
+                Util.warning('Ignore %s rounds of noisy cases' % (count - len(rounds)))
+        if not rounds:
+            Util.error('No round results in %s' % ', '.join(args.results))
+
+        # [case, version, metric] -> browser -> values
+        samples = {}
+        browsers = []
+        for record in rounds:
+            browser = '%s %s' % (record['browser'], record['browser_version'])
+            if browser not in browsers:
+                browsers.append(browser)
+            key = (record['case'], record['version'], record['metric'])
+            samples.setdefault(key, {}).setdefault(browser, []).append(record['values'][0])
+
+        baseline = args.baseline or browsers[0]
+        if baseline not in browsers:
+            Util.error('Unknown baseline %s, browsers are %s' % (baseline, ', '.join(browsers)))
+        others = [browser for browser in browsers if browser != baseline]
+        self._report(samples, baseline, others, args.alpha)
+
+    def _report(self, samples, baseline, others, alpha):
+        header = ['Case', 'Version', 'Metric', baseline] + others
+        rows = []
+        for key in sorted(samples):
+            browser_values = samples[key]
+            row = list(key)
+            base_values = browser_values.get(baseline, [])
+            row.append(self._format_mean(base_values))
+            for browser in others:
+                values = browser_values.get(browser, [])
+                if not values or not base_values:
+                    row.append(self._format_mean(values))
+                    continue
+                base_mean = stats.mean(base_values)
+                ratio = stats.mean(values) / base_mean if base_mean else 0.0
+                p = stats.permutation_test(values, base_values)
+                # + is significantly better than baseline, - significantly worse, nothing for noise
+                flag = ''
+                if p < alpha:
+                    higher_is_better = not key[2].endswith('(-)')
+                    flag = '+' if (ratio > 1) == higher_is_better else '-'
+                row.append('%s x%s p=%s %s' % (self._format_mean(values), round(ratio, 3), round(p, 3), flag))
+            rows.append(row)
+
+        widths = [max(len(str(row[i])) for row in [header] + rows) for i in range(len(header))]
+        lines = [' | '.join(str(cell).ljust(widths[i]) for i, cell in enumerate(row)).rstrip() for row in [header] + rows]
+        lines.insert(1, '-+-'.join('-' * width for width in widths))
+        print('\n'.join(lines))
+        print('\nBaseline is %s, significance is a permutation test at alpha %s: + better, - worse' % (baseline, alpha))
+
+    @staticmethod
+    def _format_mean(values):
+        if not values:
+            return 'NA'
+        return '%s (n=%s)' % (round(stats.mean(values), 2), len(values))
+
+    @staticmethod
+    def _get_result_files(path):
+        if os.path.isfile(path):
+            return [path]
+        if os.path.isdir(path):
+            return sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith(('.jsonl', '.csv')))
+        Util.warning('%s is not a valid file or dir' % path)
+        return []
+
+    @staticmethod
+    def _load_rounds(result_file):
+        rounds = []
+        with open(result_file, encoding='utf-8', newline='') as f:
+            if result_file.endswith('.csv'):
+                for row in csv.DictReader(f):
+                    if row['record'] == 'round' and row['values']:
+                        row['values'] = [float(value) for value in row['values'].split(';')]
+                        rounds.append(row)
+            else:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    record = json.loads(line)
+                    if record['record'] == 'round' and record['values']:
+                        rounds.append(record)
+        return rounds
+
+    def _parse_args(self):
+        parser = argparse.ArgumentParser(description='Compare browsers over the structured results of webmark runs')
+        parser.epilog='''
+examples:
+{0} {1} ignore/webmark/result
+{0} {1} a.jsonl b.jsonl --baseline "chrome 120.0.6099.71"
+'''.format(Util.PYTHON, parser.prog)
+
+        parser.add_argument('results', nargs='+', help='jsonl or csv result files, or dirs of them')
+        parser.add_argument('--baseline', dest='baseline', help='browser to compare against, "<name> <version>". Default is the first one found')
+        parser.add_argument('--software-gl', dest='software_gl', help='keep GPU results produced on software GL', action='store_true')
+        parser.add_argument('--noisy', dest='noisy', help='keep results of cases flagged as noisy', action='store_true')
+        parser.add_argument('--alpha', dest='alpha', help='significance level', type=float, default=0.05)
+        self.program = Program(parser)
+
+if __name__ == '__main__':
+    Compare()
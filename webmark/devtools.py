@@ -0,0 +1,88 @@
+import asyncio
+import threading
+
+from util.base import * # pylint: disable=unused-wildcard-import
+from power_measurement.cdp import CdpClient, get_browser_ws_url
+
+# Performance.getMetrics values recorded per case, durations are seconds of main-thread work of the page's renderer
+PAGE_METRICS = ['TaskDuration', 'ScriptDuration', 'LayoutDuration', 'RecalcStyleDuration', 'JSHeapUsedSize']
+
+# Seconds to wait for the answer of a DevTools command
+COMMAND_TIMEOUT = 10
+
+def get_debugger_address(driver):
+    # ChromeDriver and EdgeDriver report the DevTools address of the browser they drive
+    capabilities = getattr(driver, 'capabilities', {}) or {}
+    for key in ['goog:chromeOptions', 'ms:edgeOptions']:
+        address = capabilities.get(key, {}).get('debuggerAddress')
+        if address:
+            return address
+    return None
+
+class PageMetrics():
+    # Main-thread work and JS heap of the page a case runs on. Chromium only counts the durations while the
+    # Performance domain is enabled, so it's enabled before the case runs and read after it, over a DevTools
+    # connection of our own next to WebDriver's. It stays open in between on an event loop in a thread.
+    # Empty for browsers without DevTools.
+    def __init__(self, driver):
+        self.driver = driver
+        self.loop = None
+        self.thread = None
+        self.client = None
+        self.page = None
+
+    def start(self):
+        address = get_debugger_address(self.driver)
+        if not address:
+            return
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        try:
+            self._call(self._start(get_browser_ws_url(address), self.driver.current_url))
+        except Exception as e:
+            Util.warning('Failed to record the page metrics: %s' % e)
+            self._close()
+
+    def stop(self):
+        # Return the metrics since start()
+        if not self.page:
+            self._close()
+            return {}
+        try:
+            result = self._call(self.page.send('Performance.getMetrics', timeout=COMMAND_TIMEOUT))
+        except Exception as e:
+            Util.warning('Failed to get the page metrics: %s' % e)
+            return {}
+        finally:
+            self._close()
+        values = {metric['name']: metric['value'] for metric in result['metrics']}
+        return {name: round(values[name], 3) for name in PAGE_METRICS if name in values}
+
+    async def _start(self, ws_url, url):
+        self.client = await CdpClient(ws_url).connect()
+        targets = (await self.client.send('Target.getTargets', timeout=COMMAND_TIMEOUT))['targetInfos']
+        pages = [target for target in targets if target['type'] == 'page']
+        if not pages:
+            return
+        # The session follows the tab when the case navigates it
+        target = next((target for target in pages if target['url'] == url), pages[0])
+        self.page = await self.client.attach(target['targetId'])
+        await self.page.send('Performance.enable', timeout=COMMAND_TIMEOUT)
+
+    def _call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(COMMAND_TIMEOUT * 2)
+
+    def _close(self):
+        if not self.loop:
+            return
+        if self.client:
+            try:
+                # Detaching disables the Performance domain again
+                self._call(self.client.close())
+            except Exception:
+                pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.loop = self.thread = self.client = self.page = None
@@ -0,0 +1,82 @@
+import os
+import re
+import shutil
+import subprocess
+
+from util.base import * # pylint: disable=unused-wildcard-import
+
+# Renderers that mean WebGL runs on the CPU. Only known ones, an unknown renderer is assumed to be a GPU.
+SOFTWARE_RENDERER_PATTERN = re.compile(r'SwiftShader|llvmpipe|softpipe|Microsoft Basic Render', re.I)
+
+RENDERER_SCRIPT = '''
+    var canvas = document.createElement('canvas');
+    var gl = canvas.getContext('webgl') || canvas.getContext('experimental-webgl');
+    if (!gl) {
+      return '';
+    }
+    var info = gl.getExtension('WEBGL_debug_renderer_info');
+    return gl.getParameter(info ? info.UNMASKED_RENDERER_WEBGL : gl.RENDERER);
+'''
+
+def get_display_mode(mode):
+    # auto uses the desktop if there is one, else Xvfb if it's installed, else headless browsers.
+    # Only Linux has a choice, other systems always use their desktop.
+    if Util.HOST_OS != Util.LINUX:
+        return 'native'
+    if mode != 'auto':
+        return mode
+    if os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY'):
+        return 'native'
+    if shutil.which('Xvfb'):
+        return 'xvfb'
+    return 'headless'
+
+def get_renderer(driver):
+    try:
+        return driver.execute_script(RENDERER_SCRIPT) or 'NA'
+    except Exception as e:
+        Util.warning('Failed to get the WebGL renderer: %s' % e)
+        return 'NA'
+
+def is_software_renderer(renderer):
+    # 'NA' means the renderer couldn't be read, which says nothing about software GL
+    if not renderer or renderer == 'NA':
+        return False
+    return bool(SOFTWARE_RENDERER_PATTERN.search(renderer))
+
+class VirtualDisplay():
+    # An Xvfb server for GPU-less Linux workers without a desktop. Browsers started while it runs draw on it.
+    def __init__(self, display=99, size='1920x1080x24'):
+        self.display = display
+        self.size = size
+        self.process = None
+        self.old_display = None
+
+    def start(self):
+        # Take the first free display number, a worker may run several webmarks
+        while os.path.exists('/tmp/.X11-unix/X%s' % self.display) or os.path.exists('/tmp/.X%s-lock' % self.display):
+            self.display += 1
+        self.process = subprocess.Popen(['Xvfb', ':%s' % self.display, '-screen', '0', self.size, '-nolisten', 'tcp'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for _ in range(50):
+            if os.path.exists('/tmp/.X11-unix/X%s' % self.display):
+                break
+            if self.process.poll() is not None:
+                Util.error('Xvfb failed to start on display :%s' % self.display)
+            time.sleep(0.1)
+        self.old_display = os.environ.get('DISPLAY')
+        os.environ['DISPLAY'] = ':%s' % self.display
+        Util.info('Started Xvfb on display :%s' % self.display)
+
+    def stop(self):
+        if not self.process:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        if self.old_display is None:
+            os.environ.pop('DISPLAY', None)
+        else:
+            os.environ['DISPLAY'] = self.old_display
+        self.process = None
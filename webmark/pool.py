@@ -0,0 +1,202 @@
+import shutil
+import tempfile
+import threading
+import urllib.parse
+
+from util.base import * # pylint: disable=unused-wildcard-import
+from display import get_renderer
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+class BrowserInstance():
+    def __init__(self, browser, driver, profile_dir, launch_time, renderer):
+        self.key = BrowserPool.get_key(browser)
+        self.driver = driver
+        self.profile_dir = profile_dir
+        self.launch_time = launch_time
+        # WebGL renderer, to tell GPU results from software rendering ones
+        self.renderer = renderer
+        # Launched for the case holding it, so the case pays the cold start
+        self.fresh = True
+        self.warmed_urls = set()
+
+class BrowserPool():
+    # Browsers are kept between cases and suites, each on its own profile, so profile creation, shader compilation
+    # and other first-run work are paid once instead of polluting the first rounds of every suite.
+    # With cold_start, every case gets a new browser on an empty profile and its launch time is recorded.
+    def __init__(self, cold_start=False, prewarm=0, extra_options=''):
+        self.cold_start = cold_start
+        # Added to the options of every browser, like --headless=new on Linux workers without a display
+        self.extra_options = extra_options
+        # Seconds to show a case's page before it runs for the first time on a browser, to fill the shader caches
+        self.prewarm = prewarm
+        self.idle = {}
+        self.busy = {}
+        self.lock = threading.Lock()
+        self.launch_times = []
+        self.reuses = 0
+
+    @staticmethod
+    def get_key(browser):
+        return (browser.name, browser.path, browser.options, browser.webdriver_path)
+
+    def fill(self, browser, count):
+        # Launch the browsers a suite needs up front and together, so their start-up overlaps
+        if self.cold_start:
+            return
+        with self.lock:
+            missing = count - len(self.idle.get(self.get_key(browser), []))
+        threads = [threading.Thread(target=self._fill_one, args=(browser,)) for _ in range(missing)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def _fill_one(self, browser):
+        instance = self._launch(browser)
+        if instance:
+            # Nobody waited for this launch
+            instance.fresh = False
+            with self.lock:
+                self.idle.setdefault(instance.key, []).append(instance)
+
+    def acquire(self, browser, prewarm_urls=None):
+        instance = None
+        with self.lock:
+            idle = self.idle.get(self.get_key(browser), [])
+            if idle and not self.cold_start:
+                instance = idle.pop()
+                self.reuses += 1
+        if not instance:
+            instance = self._launch(browser)
+            if not instance:
+                Util.error('Failed to launch ' + browser.name)
+        if self.prewarm and not self.cold_start:
+            for url in prewarm_urls or []:
+                if url not in instance.warmed_urls:
+                    self._prewarm(instance, url)
+        with self.lock:
+            self.busy[instance.driver] = instance
+        return instance.driver
+
+    def release(self, driver):
+        with self.lock:
+            instance = self.busy.pop(driver)
+        instance.fresh = False
+        if self.cold_start or not self._reset(instance):
+            self._quit(instance)
+            return
+        with self.lock:
+            self.idle.setdefault(instance.key, []).append(instance)
+
+    def get_launch_time(self, driver):
+        # Launch time of the browser if it was started for its current case, 0 if it was reused or launched ahead
+        with self.lock:
+            instance = self.busy.get(driver)
+        if instance and instance.fresh:
+            return instance.launch_time
+        return 0
+
+    def get_renderer(self, driver):
+        with self.lock:
+            instance = self.busy.get(driver)
+        return instance.renderer if instance else 'NA'
+
+    def get_stats(self):
+        with self.lock:
+            return [len(self.launch_times), sum(self.launch_times), self.reuses]
+
+    def get_saved_time(self, stats_before):
+        # Each reuse saves an average launch
+        launches, launch_time, reuses = self.get_stats()
+        if not launches:
+            return 0
+        return (reuses - stats_before[2]) * launch_time / launches
+
+    def close(self):
+        with self.lock:
+            instances = [instance for idle in self.idle.values() for instance in idle] + list(self.busy.values())
+            self.idle = {}
+            self.busy = {}
+        for instance in instances:
+            self._quit(instance)
+
+    def _launch(self, browser):
+        profile_dir = tempfile.mkdtemp(prefix='webmark-profile-')
+        options = ('%s %s --user-data-dir=%s' % (browser.options, self.extra_options, profile_dir)).strip()
+        start_time = time.time()
+        try:
+            driver = Util.get_webdriver(browser_name=browser.name, browser_path=browser.path, browser_options=options, webdriver_path=browser.webdriver_path)
+        except Exception as e:
+            Util.warning('Failed to launch %s: %s' % (browser.name, e))
+            shutil.rmtree(profile_dir, ignore_errors=True)
+            return None
+        launch_time = time.time() - start_time
+        with self.lock:
+            self.launch_times.append(launch_time)
+        renderer = get_renderer(driver)
+        Util.info('Launched %s in %ss, renderer %s' % (browser.name, round(launch_time, 2), renderer))
+        return BrowserInstance(browser, driver, profile_dir, launch_time, renderer)
+
+    def _prewarm(self, instance, url):
+        Util.info('Prewarm %s for %ss' % (url, self.prewarm))
+        try:
+            instance.driver.get(url)
+            time.sleep(self.prewarm)
+            instance.warmed_urls.add(url)
+        except Exception as e:
+            Util.warning('Failed to prewarm %s: %s' % (url, e))
+        self._reset(instance)
+
+    def _reset(self, instance):
+        # Drop what the case left behind, extra windows and the cookies and storage of its origin, but keep the
+        # HTTP and shader caches that make the browser warm
+        driver = instance.driver
+        try:
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+            url = urllib.parse.urlsplit(driver.current_url)
+            if url.scheme in ['http', 'https']:
+                origin = '%s://%s' % (url.scheme, url.netloc)
+                if hasattr(driver, 'execute_cdp_cmd'):
+                    driver.execute_cdp_cmd('Storage.clearDataForOrigin', {'origin': origin, 'storageTypes': 'cookies,file_systems,indexeddb,local_storage,service_workers,websql'})
+                else:
+                    driver.delete_all_cookies()
+                    driver.execute_script('try { localStorage.clear(); sessionStorage.clear(); } catch (e) {}')
+            driver.get('about:blank')
+            self._unpin_cores(driver)
+            return True
+        except Exception as e:
+            Util.warning('Failed to reset the browser, it will be replaced: %s' % e)
+            return False
+
+    @staticmethod
+    def _unpin_cores(driver):
+        # Parallel cases pin their browser to a slice of the cores. Give it back the cores a new browser would get,
+        # or later cases, GPU and serial ones too, would run on the slice.
+        if not psutil or not hasattr(psutil.Process, 'cpu_affinity'):
+            return
+        process = getattr(getattr(driver, 'service', None), 'process', None)
+        if not process:
+            return
+        cores = psutil.Process().cpu_affinity()
+        browser_process = psutil.Process(process.pid)
+        for p in [browser_process] + browser_process.children(recursive=True):
+            try:
+                if p.cpu_affinity() != cores:
+                    p.cpu_affinity(cores)
+            except psutil.NoSuchProcess:
+                pass
+
+    def _quit(self, instance):
+        try:
+            instance.driver.quit()
+        except Exception:
+            pass
+        shutil.rmtree(instance.profile_dir, ignore_errors=True)
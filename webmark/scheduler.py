@@ -0,0 +1,83 @@
+import queue
+import threading
+
+from util.base import * # pylint: disable=unused-wildcard-import
+from benchmark.benchmark import category_info
+from benchmark import registry
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# JS engine and storage suites only need CPU time, so they can share the machine. Everything else touches the GPU
+# or the compositor and gets the machine alone.
+CPU_CATEGORIES = ['js', 'localstorage', 'fileop']
+
+class Scheduler():
+    def __init__(self, suite, parallel):
+        self.suite = suite
+        self.parallel = parallel
+
+    def run(self):
+        gpu_cases = []
+        cpu_cases = []
+        for case in self.suite.cases:
+            if self.is_cpu_case(case):
+                cpu_cases.append(case)
+            else:
+                gpu_cases.append(case)
+
+        # GPU cases go first, with nothing else running
+        for case in gpu_cases:
+            self.suite.run_case(case)
+
+        if not cpu_cases:
+            return
+        jobs = min(self.parallel, len(cpu_cases))
+        Util.info('Run %s CPU cases with %s browsers' % (len(cpu_cases), jobs))
+        case_queue = queue.Queue()
+        for case in cpu_cases:
+            case_queue.put(case)
+        workers = [threading.Thread(target=self._work, args=(case_queue, i, jobs)) for i in range(jobs)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+    @staticmethod
+    def is_cpu_case(case):
+        if hasattr(case, 'category'):
+            category = case.category
+        else:
+            category = registry.get_class(case.name).CONFIG.get('category', '')
+        for key in CPU_CATEGORIES:
+            if category in [key, category_info[key]]:
+                return True
+        return False
+
+    def _work(self, case_queue, index, jobs):
+        # Each browser of the pool has its own profile, so caches and storage of concurrent cases don't mix
+        while True:
+            try:
+                case = case_queue.get_nowait()
+            except queue.Empty:
+                break
+            self.suite.run_case(case, lambda driver: self._pin_cores(driver, index, jobs))
+
+    @staticmethod
+    def _pin_cores(driver, index, jobs):
+        # Give each browser its own slice of cores, renderers started later inherit the affinity
+        if not psutil:
+            Util.warning('psutil is not installed, browsers are not pinned to cores')
+            return
+        cpu_count = psutil.cpu_count()
+        cores_per_job = max(cpu_count // jobs, 1)
+        cores = [core % cpu_count for core in range(index * cores_per_job, (index + 1) * cores_per_job)]
+        try:
+            process = psutil.Process(driver.service.process.pid)
+            for p in [process] + process.children(recursive=True):
+                p.cpu_affinity(cores)
+            Util.info('Pin browser %s to cores %s' % (index, ','.join(str(core) for core in cores)))
+        except (AttributeError, psutil.Error) as e:
+            Util.warning('Failed to pin browser %s to cores: %s' % (index, e))
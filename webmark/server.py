@@ -0,0 +1,256 @@
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+import threading
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from util.base import * # pylint: disable=unused-wildcard-import
+
+# Files bigger than this are streamed from disk instead of being kept in memory
+MAX_CACHED_FILE_SIZE = 64 * 1024 * 1024
+# Memory for the contents of all cached files, files beyond it are streamed like the big ones
+MAX_CACHED_TOTAL_SIZE = 1024 * 1024 * 1024
+
+class AssetCache():
+    def __init__(self, root_dir, max_total=MAX_CACHED_TOTAL_SIZE):
+        # Resolved, so that paths of requests can be checked against it after resolving them too
+        self.root_dir = os.path.realpath(root_dir)
+        self.max_total = max_total
+        # Bytes of file contents held in memory
+        self.total = 0
+        self.files = {}
+        self.lock = threading.Lock()
+
+    def prewarm(self):
+        count = 0
+        size = 0
+        streamed = 0
+        for dir_path, _, file_names in os.walk(self.root_dir):
+            for file_name in file_names:
+                asset = self.get(os.path.realpath(os.path.join(dir_path, file_name)))
+                if asset and asset['data'] is not None:
+                    count += 1
+                    size += asset['size']
+                elif asset and asset['size'] <= MAX_CACHED_FILE_SIZE:
+                    streamed += 1
+        Util.info('Cached %s files (%s MB) from %s' % (count, round(size / 1024 / 1024, 2), self.root_dir))
+        if streamed:
+            Util.warning('%s more files are streamed from disk, they don\'t fit in the %s MB of the cache' % (streamed, round(self.max_total / 1024 / 1024)))
+
+    def get(self, path):
+        # Return {data, size, etag, mtime, content_type} of a file under root_dir, or None
+        with self.lock:
+            asset = self.files.get(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if asset and asset['mtime'] == stat.st_mtime and asset['size'] == stat.st_size:
+            return asset
+
+        # The contents of the changed file make room for the new ones
+        released = asset['size'] if asset and asset['data'] is not None else 0
+        data = None
+        if stat.st_size <= MAX_CACHED_FILE_SIZE:
+            with self.lock:
+                if self.total - released + stat.st_size <= self.max_total:
+                    # Reserved before reading, so concurrent requests can't overrun the budget
+                    self.total += stat.st_size - released
+                    released = 0
+                    data = b''
+            if data is not None:
+                with open(path, 'rb') as f:
+                    data = f.read()
+        if data is not None:
+            etag = hashlib.sha1(data).hexdigest()
+        else:
+            etag = '%x-%x' % (int(stat.st_mtime), stat.st_size)
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        asset = {'data': data, 'size': stat.st_size, 'etag': '"%s"' % etag, 'mtime': stat.st_mtime, 'content_type': content_type}
+        with self.lock:
+            self.total -= released
+            self.files[path] = asset
+        return asset
+
+class AssetHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self._send(head=False)
+
+    def do_HEAD(self):
+        self._send(head=True)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _translate_path(self):
+        # Path of the file under the corpus a request asks for, or None if it points anywhere else
+        path = urllib.parse.unquote(urllib.parse.urlsplit(self.path).path)
+        # Backslashes and drive letters are separators and roots on Windows, they would escape the corpus
+        if '\\' in path or ':' in path or '\0' in path:
+            return None
+        path = posixpath.normpath(path).lstrip('/')
+        root_dir = self.server.cache.root_dir
+        full_path = os.path.realpath(os.path.join(root_dir, path))
+        if os.path.commonpath([root_dir, full_path]) != root_dir:
+            return None
+        if os.path.isdir(full_path):
+            full_path = os.path.join(full_path, 'index.html')
+        return full_path
+
+    def _send(self, head):
+        path = self._translate_path()
+        asset = self.server.cache.get(path) if path else None
+        if not asset:
+            self.send_error(404)
+            return
+
+        if self.headers.get('If-None-Match') == asset['etag']:
+            self.send_response(304)
+            self._send_cache_headers(asset)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        size = asset['size']
+        start, end = 0, size - 1
+        status = 200
+        range_header = self.headers.get('Range')
+        if range_header and self.headers.get('If-Range', asset['etag']) == asset['etag']:
+            match = re.match(r'bytes=(\d*)-(\d*)$', range_header.strip())
+            if not match or match.group(1) == match.group(2) == '':
+                self._send_range_error(size)
+                return
+            if match.group(1) == '':
+                # Suffix range, the last N bytes
+                start = max(size - int(match.group(2)), 0)
+            else:
+                start = int(match.group(1))
+                if match.group(2) != '':
+                    end = min(int(match.group(2)), size - 1)
+            if start > end or start >= size:
+                self._send_range_error(size)
+                return
+            status = 206
+
+        self.send_response(status)
+        self._send_cache_headers(asset)
+        self.send_header('Content-Type', asset['content_type'])
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end - start + 1))
+        if status == 206:
+            self.send_header('Content-Range', 'bytes %s-%s/%s' % (start, end, size))
+        self.end_headers()
+        if head:
+            return
+
+        if asset['data'] is not None:
+            self.wfile.write(asset['data'][start:end + 1])
+        else:
+            with open(path, 'rb') as f:
+                f.seek(start)
+                remaining = end - start + 1
+                while remaining > 0:
+                    chunk = f.read(min(remaining, 1024 * 1024))
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+                    remaining -= len(chunk)
+
+    def _send_cache_headers(self, asset):
+        # The corpus only changes through a new mirror, so browsers may keep everything
+        self.send_header('ETag', asset['etag'])
+        self.send_header('Cache-Control', 'public, max-age=31536000')
+        self.send_header('Access-Control-Allow-Origin', '*')
+
+    def _send_range_error(self, size):
+        self.send_response(416)
+        self.send_header('Content-Range', 'bytes */%s' % size)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+class AssetServer():
+    def __init__(self, root_dir, port=0, prewarm=True):
+        self.cache = AssetCache(root_dir)
+        if prewarm:
+            self.cache.prewarm()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), AssetHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.cache = self.cache
+        self.url = 'http://127.0.0.1:%s' % self.httpd.server_address[1]
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        Util.info('Serve %s at %s' % (self.cache.root_dir, self.url))
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+# Links in html, css and js. Quoted relative paths with a known asset extension catch files loaded by scripts.
+LINK_PATTERNS = [
+    re.compile(r'''(?:src|href|data)\s*=\s*["']([^"'#]+)["']''', re.I),
+    re.compile(r'''url\(\s*["']?([^"')]+)["']?\s*\)''', re.I),
+    re.compile(r'''["']([\w./-]+\.(?:js|json|css|html|png|jpe?g|gif|webp|svg|bmp|dds|ktx|obj|bin|glsl|vert|frag|wasm|mp3|ogg|wav|mp4|webm|woff2?|ttf))["']''', re.I),
+]
+CRAWL_TYPES = ['text/html', 'text/css', 'application/javascript', 'text/javascript', 'application/x-javascript']
+
+def mirror(url, target_dir, base_url=None, max_files=5000):
+    # Copy url and everything it links to under base_url (default is the directory of url) into target_dir,
+    # keeping the layout relative to base_url
+    if not base_url:
+        base_url = url[:url.rfind('/') + 1]
+    pending = [url]
+    seen = set(pending)
+    count = 0
+    while pending and count < max_files:
+        current = pending.pop(0)
+        relative = urllib.parse.unquote(urllib.parse.urlsplit(current[len(base_url):]).path)
+        if not relative or relative.endswith('/'):
+            relative += 'index.html'
+        target = os.path.join(target_dir, relative)
+        try:
+            with urllib.request.urlopen(current, timeout=60) as response:
+                data = response.read()
+                content_type = response.headers.get_content_type()
+        except Exception as e:
+            Util.warning('Failed to mirror %s: %s' % (current, e))
+            continue
+        Util.ensure_dir(os.path.dirname(target))
+        with open(target, 'wb') as f:
+            f.write(data)
+        count += 1
+
+        if content_type not in CRAWL_TYPES and not re.search(r'\.(html?|css|js)$', relative):
+            continue
+        text = data.decode('utf-8', errors='ignore')
+        for pattern in LINK_PATTERNS:
+            for link in pattern.findall(text):
+                link = urllib.parse.urljoin(current, link.strip())
+                link = urllib.parse.urldefrag(link)[0].split('?')[0]
+                if link.startswith(base_url) and link not in seen:
+                    seen.add(link)
+                    pending.append(link)
+    Util.info('Mirrored %s files from %s to %s' % (count, base_url, target_dir))
+    return count
+
+def get_mirror_base(url, path):
+    # Map a url to the corpus layout of path by their common trailing segments, so pages that load files
+    # from sibling directories (../shared/x.js) are mirrored too.
+    # For example https://webglsamples.org/aquarium/aquarium.html and webgl/webglsamples/aquarium/aquarium.html
+    # give [https://webglsamples.org/, webgl/webglsamples].
+    split_url = urllib.parse.urlsplit(url)
+    url_parts = split_url.path.split('/')
+    path_parts = path.split('/')
+    count = 0
+    while count < min(len(url_parts), len(path_parts)) and url_parts[-1 - count] == path_parts[-1 - count]:
+        count += 1
+    base_url = '%s://%s%s/' % (split_url.scheme, split_url.netloc, '/'.join(url_parts[:len(url_parts) - count]))
+    return [base_url, '/'.join(path_parts[:len(path_parts) - count])]
@@ -0,0 +1,143 @@
+import csv
+import hashlib
+import json
+import threading
+import time
+
+from util.base import * # pylint: disable=unused-wildcard-import
+
+CSV_FIELDS = [
+    'record', 'run', 'time', 'browser', 'browser_version', 'gpu', 'gpu_driver', 'config_hash', 'suite', 'case',
+    'category', 'version', 'metric', 'round', 'values', 'value', 'ci_low', 'ci_high', 'cv', 'wall',
+    'wait', 'work', 'launch', 'renderer', 'software_gl', 'noisy', 'background', 'launches', 'reuses', 'saved',
+]
+
+class ResultSink():
+    # One text line per case as before, plus one structured record per round and per case.
+    # The files stay open for the whole run and cases running in parallel share them.
+    def __init__(self, result_dir, run, config_file, result_format='jsonl'):
+        self.run = run
+        self.result_format = result_format
+        self.lock = threading.Lock()
+        with open(config_file, 'rb') as f:
+            self.config_hash = hashlib.sha1(f.read()).hexdigest()
+        gpu_name, _, gpu_driver_ver, _, _ = Util.get_gpu_info()
+        self.gpu = gpu_name
+        self.gpu_driver = gpu_driver_ver
+
+        self.text_file = '%s/%s.txt' % (result_dir, run)
+        self.structured_file = '%s/%s.%s' % (result_dir, run, result_format)
+        Util.ensure_file(self.text_file)
+        self.text = open(self.text_file, 'a', encoding='utf-8')
+        self.structured = open(self.structured_file, 'a', encoding='utf-8', newline='')
+        if result_format == 'csv':
+            self.csv_writer = csv.DictWriter(self.structured, fieldnames=CSV_FIELDS)
+            self.csv_writer.writeheader()
+
+    def write_case(self, suite, case, benchmark, driver, wall, browser_info):
+        # browser_info has the launch seconds if the browser was started for this case, its WebGL renderer,
+        # whether a GPU case ran on software GL, the DevTools metrics of the page with --page-metrics and the noise of
+        # the host while the case ran
+        # driver.capabilities has browserVersion with W3C WebDriver and version with the legacy protocol
+        capabilities = getattr(driver, 'capabilities', {}) or {}
+        common = {
+            'run': self.run,
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'browser': suite.browser.name,
+            'browser_version': capabilities.get('browserVersion', capabilities.get('version', 'NA')),
+            'gpu': self.gpu,
+            'gpu_driver': self.gpu_driver,
+            'config_hash': self.config_hash,
+            'suite': suite.name,
+            'case': case.name,
+            'category': benchmark.category,
+            'version': benchmark.version,
+            'metric': benchmark.metric,
+            'renderer': browser_info.get('renderer', 'NA'),
+            'software_gl': browser_info.get('software_gl', False),
+            'noisy': bool(browser_info.get('noise', {}).get('violations')),
+        }
+
+        records = []
+        for index, values in enumerate(benchmark.samples):
+            record = dict(common, record='round', round=index, values=values)
+            if index < len(benchmark.round_times):
+                record['wall'] = round(benchmark.round_times[index], 3)
+            if index < len(benchmark.round_waits):
+                # Time the harness waited for the page vs time it spent driving it
+                record['wait'] = round(benchmark.round_waits[index][0], 3)
+                record['work'] = round(benchmark.round_waits[index][1], 3)
+            records.append(record)
+        summaries = [dict(summary, outliers=list(summary['outliers'])) for summary in benchmark.summaries]
+        records.append(dict(common, record='case', samples=benchmark.samples, summaries=summaries, wall=round(wall, 3)))
+        if browser_info.get('launch'):
+            # Cold start of the browser the case ran on
+            records[-1]['launch'] = round(browser_info['launch'], 3)
+        if browser_info.get('page_metrics'):
+            records[-1]['page_metrics'] = browser_info['page_metrics']
+        if browser_info.get('noise'):
+            records[-1]['noise'] = browser_info['noise']
+
+        with self.lock:
+            flag = ' | Software GL: %s' % common['renderer'] if common['software_gl'] else ''
+            if common['noisy']:
+                flag += ' | Noisy: %s' % ', '.join(browser_info['noise']['violations'])
+            self.text.write(benchmark.result_line + ' | Wall: %ss%s\n' % (round(wall, 2), flag))
+            for record in records:
+                if self.result_format == 'csv':
+                    self.csv_writer.writerow(self._to_row(record))
+                else:
+                    self.structured.write(json.dumps(record) + '\n')
+            # Keep the buffered writers, but don't lose finished cases if the run dies later
+            self.text.flush()
+            self.structured.flush()
+
+    def write_suite(self, suite, stats, wall):
+        # stats is [launches, launch seconds, reuses, seconds saved by the reuses] of the browser pool
+        launches, launch_time, reuses, saved = stats
+        record = {
+            'record': 'suite',
+            'run': self.run,
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'browser': suite.browser.name,
+            'config_hash': self.config_hash,
+            'suite': suite.name,
+            'launches': launches,
+            'launch': round(launch_time, 3),
+            'reuses': reuses,
+            'saved': round(saved, 3),
+            'wall': round(wall, 3),
+        }
+        with self.lock:
+            self.text.write('Suite result: %s | Launches: %s (%ss) | Reuses: %s | Saved: %ss | Wall: %ss\n' % (
+                suite.name, launches, round(launch_time, 2), reuses, round(saved, 2), round(wall, 2)))
+            if self.result_format == 'csv':
+                self.csv_writer.writerow(self._to_row(record))
+            else:
+                self.structured.write(json.dumps(record) + '\n')
+            self.text.flush()
+            self.structured.flush()
+
+    def close(self):
+        with self.lock:
+            self.text.close()
+            self.structured.close()
+
+    @staticmethod
+    def _to_row(record):
+        row = {key: record.get(key, '') for key in CSV_FIELDS}
+        if record['record'] == 'suite':
+            return row
+        if record['record'] == 'round':
+            row['values'] = ';'.join(str(value) for value in record['values'])
+        else:
+            row['values'] = ';'.join(str(summary['value']) for summary in record['summaries'])
+            if record.get('noise'):
+                row['background'] = record['noise']['background']
+            if record['summaries']:
+                summary = record['summaries'][0]
+                row['value'] = summary['value']
+                row['ci_low'] = summary['ci_low']
+                row['ci_high'] = summary['ci_high']
+                row['cv'] = summary['cv']
+        return row
@@ -0,0 +1,62 @@
+from pathlib import Path
+import sys
+import types
+import unittest
+
+
+WEBMARK_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(WEBMARK_DIR))
+
+from benchmark import registry
+
+
+class Case:
+    def __init__(self, name, **attributes):
+        self.name = name
+        self.__dict__.update(attributes)
+
+
+def make_benchmark(name, paths):
+    # A benchmark module that doesn't need a browser, registered under the name of its case
+    benchmark_class = type(name, (), {
+        "CONFIG": {"version": "1.0", "path": paths},
+        "cond0": lambda self, driver: True,
+        "act0": lambda self, driver: None,
+    })
+    module = types.ModuleType("test_registry_" + name)
+    setattr(module, name, benchmark_class)
+    sys.modules[module.__name__] = module
+    registry.register(name, module.__name__)
+
+
+class ValidateTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        make_benchmark("flatmark", {"external": "http://flatmark.test/", "internal": "webbench/flatmark/"})
+        make_benchmark("versionmark", {
+            "1.0": {"external": "http://versionmark.test/1.0/", "internal": "webbench/versionmark/1.0/"},
+            "2.0": {"internal": "webbench/versionmark/2.0/"},
+        })
+
+    def test_flat_paths_serve_every_version(self):
+        self.assertEqual(registry.validate(Case("flatmark", version="1.1")), [])
+        self.assertEqual(registry.validate(Case("flatmark", version="1.1", path_type="external")), [])
+        self.assertEqual(registry.get_paths(registry.get_class("flatmark").CONFIG, "1.1")["internal"], "webbench/flatmark/")
+
+    def test_flat_paths_missing_path_type(self):
+        self.assertEqual(registry.validate(Case("flatmark", path_type="local")), ["flatmark: no local path"])
+
+    def test_versioned_paths(self):
+        self.assertEqual(registry.validate(Case("versionmark")), [])
+        self.assertEqual(registry.validate(Case("versionmark", version="2.0", path_type="builtin")), [])
+        self.assertEqual(registry.validate(Case("versionmark", version="2.0", path_type="external")), ["versionmark: no external path"])
+
+    def test_unknown_version(self):
+        self.assertEqual(registry.validate(Case("versionmark", version="3.0")), ["versionmark: unknown version 3.0"])
+
+    def test_explicit_path(self):
+        self.assertEqual(registry.validate(Case("versionmark", version="3.0", path="http://other.test/")), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
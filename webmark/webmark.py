@@ -28,12 +28,30 @@ sys.path.append(script_dir)
 sys.path.append(script_dir + '/..')
 
 from util.base import * # pylint: disable=unused-wildcard-import
+from devtools import PageMetrics
+from power_measurement.hostnoise import HostNoiseMonitor, parse_thresholds
+from display import VirtualDisplay, get_display_mode, is_software_renderer
+from pool import BrowserPool
+from scheduler import Scheduler
+from server import AssetServer, get_mirror_base, mirror
+from sink import ResultSink
+import benchmark.benchmark
+from benchmark import registry
 
-result_file = ''
+result_sink = None
+browser_pool = None
+# Skip GPU cases on browsers that render with software GL, instead of only flagging their results
+skip_software_gl = False
+# Record the main-thread work and JS heap of each case's page over DevTools
+record_page_metrics = False
+# Noise thresholds of the host while a case runs, None to not sample the host
+noise_thresholds = None
+# Times a noisy case runs again before its result is kept and flagged
+noise_reruns = 0
 
 class Webmark():
     def __init__(self):
-        global result_file
+        global result_sink, browser_pool, skip_software_gl, record_page_metrics, noise_thresholds, noise_reruns
 
         self._parse_args()
         args = self.program.args
@@ -45,20 +63,110 @@ class Webmark():
         data = json.load(f)
         f.close()
 
-        result_file = '%s/%s.txt' % (ScriptRepo.IGNORE_WEBMARK_RESULT_DIR, self.program.timestamp)
-        Util.ensure_file(result_file)
+        suites = Suites(data)
+        errors = []
+        for suite in suites.suites:
+            for case in suite.cases:
+                errors.extend(registry.validate(case))
+        if errors:
+            Util.error('Invalid config %s:\n%s' % (config_file, '\n'.join(errors)))
 
-        Suites(data).run()
+        if args.mirror:
+            self._mirror(suites, args.corpus, args.mirror_source)
+            return
+
+        result_sink = ResultSink(ScriptRepo.IGNORE_WEBMARK_RESULT_DIR, self.program.timestamp, config_file, args.result_format)
+        skip_software_gl = args.software_gl == 'skip'
+        record_page_metrics = args.page_metrics
+        if args.noisy != 'off':
+            try:
+                noise_thresholds = parse_thresholds(args.noise_thresholds)
+            except ValueError as e:
+                Util.error(str(e))
+            if not HostNoiseMonitor().available:
+                Util.warning('Host noise is not sampled, it needs psutil on this platform')
+                noise_thresholds = None
+        noise_reruns = 2 if args.noisy == 'rerun' else 0
+
+        display_mode = get_display_mode(args.display)
+        Util.info('Display mode: ' + display_mode)
+        display = None
+        extra_options = ''
+        if display_mode == 'xvfb':
+            display = VirtualDisplay()
+            display.start()
+        elif display_mode == 'headless':
+            extra_options = '--headless=new'
+        browser_pool = BrowserPool(args.cold_start, args.prewarm, extra_options)
+
+        server = None
+        if any(getattr(case, 'path_type', '') == 'builtin' for suite in suites.suites for case in suite.cases):
+            if not os.path.isdir(args.corpus):
+                Util.error('%s does not exist, populate it with --mirror first' % args.corpus)
+            server = AssetServer(args.corpus, args.server_port)
+            server.start()
+            benchmark.benchmark.builtin_webserver = server.url
+        try:
+            suites.run(args.parallel)
+        finally:
+            browser_pool.close()
+            result_sink.close()
+            if server:
+                server.stop()
+            if display:
+                display.stop()
+
+    def _mirror(self, suites, corpus, source):
+        # Mirror each case into the corpus with the layout of the internal web server, so the builtin
+        # path_type can reuse the internal paths
+        urls = []
+        if source == 'internal':
+            urls.append(['%s/jperf/jperf.js' % Util.INTERNAL_WEBSERVER_WEBBENCH, 'jperf/jperf.js'])
+        else:
+            urls.append(['https://raw.githubusercontent.com/gyagp/webbench/master/jperf/jperf.js', 'jperf/jperf.js'])
+        for suite in suites.suites:
+            for case in suite.cases:
+                config = registry.get_class(case.name).CONFIG
+                paths = registry.get_paths(config, getattr(case, 'version', config.get('version', 'NA'))) or {}
+                if 'internal' not in paths or source not in paths:
+                    Util.warning('%s has no %s path to mirror' % (case.name, source))
+                    continue
+                if source == 'internal':
+                    urls.append(['%s/%s' % (Util.INTERNAL_WEBSERVER_WEBBENCH, paths['internal']), paths['internal']])
+                else:
+                    urls.append([paths['external'], paths['internal']])
+
+        for url, path in urls:
+            base_url, base_path = get_mirror_base(url, path)
+            mirror(url, os.path.join(corpus, base_path), base_url)
 
     def _parse_args(self):
         parser = argparse.ArgumentParser(description='Automation tool to measure the performance of browser and web runtime with benchmarks')
         parser.epilog='''
 examples:
 {0} {1} --config config.json
+{0} {1} --config config.json --parallel 4
+{0} {1} --config config.json --mirror
+{0} {1} --config config.json --cold-start
+{0} {1} --config config.json --display headless --software-gl skip
+{0} {1} --config config.json --noisy rerun --noise-thresholds background=5
 '''.format(Util.PYTHON, parser.prog)
 
         parser.add_argument('--config', dest='config', help='config file to put in all the configurations')
         parser.add_argument('--dryrun', dest='codryrunnfig', help='dryrun')
+        parser.add_argument('--parallel', dest='parallel', help='max browsers to run CPU-bound cases concurrently, GPU-bound cases always run alone', type=int, default=1)
+        parser.add_argument('--result-format', dest='result_format', help='format of the structured results next to the text ones', choices=['jsonl', 'csv'], default='jsonl')
+        parser.add_argument('--mirror', dest='mirror', help='mirror the benchmarks in config into the corpus, for cases with path_type builtin', action='store_true')
+        parser.add_argument('--mirror-source', dest='mirror_source', help='where to mirror from, internal or external', choices=['internal', 'external'], default='internal')
+        parser.add_argument('--corpus', dest='corpus', help='dir of the mirrored benchmarks', default='%s/webmark/corpus' % ScriptRepo.IGNORE_DIR)
+        parser.add_argument('--cold-start', dest='cold_start', help='run every case in a new browser with an empty profile, instead of reusing warm browsers', action='store_true')
+        parser.add_argument('--prewarm', dest='prewarm', help='seconds to show each case page on a browser before it runs there for the first time, to fill the shader caches', type=int, default=0)
+        parser.add_argument('--display', dest='display', help='how browsers show on Linux, auto picks native with a desktop, else xvfb if installed, else headless', choices=['auto', 'native', 'xvfb', 'headless'], default='auto')
+        parser.add_argument('--software-gl', dest='software_gl', help='what to do with GPU cases when the browser renders with software GL', choices=['flag', 'skip'], default='flag')
+        parser.add_argument('--page-metrics', dest='page_metrics', help='record the main-thread work and JS heap of each case page over DevTools, Chromium browsers only', action='store_true')
+        parser.add_argument('--noisy', dest='noisy', help='what to do with cases the background activity of the host made noisy, flag their results, run them again or not sample the host', choices=['flag', 'rerun', 'off'], default='flag')
+        parser.add_argument('--noise-thresholds', dest='noise_thresholds', help='comma-separated name=value noise thresholds, of background, background_max and cpu (%% of the machine) and temperature (C), 0 disables one', default='')
+        parser.add_argument('--server-port', dest='server_port', help='port of the builtin web server', type=int, default=8765)
         self.program = Program(parser)
 
 class Suites():
@@ -71,9 +179,9 @@ class Suites():
         self.suites = []
         Format.format(self)
 
-    def run(self):
+    def run(self, parallel=1):
         for suite in self.suites:
-            suite.run()
+            suite.run(parallel)
 
 class Browser():
     FORMAT = [
@@ -100,16 +208,43 @@ class Suite():
         self.cases = []
         Format.format(self)
 
-    def run(self):
-        if Util.HOST_OS == Util.WINDOWS:
-            webdriver = Util.get_webdriver(browser_name=self.browser.name, browser_path=self.browser.path, browser_options=self.browser.options, webdriver_path=self.browser.webdriver_path)
-            for case in self.cases:
-                case.run(webdriver)
+    def run(self, parallel=1):
+        if Util.HOST_OS in [Util.WINDOWS, Util.LINUX]:
+            stats_before = browser_pool.get_stats()
+            start_time = time.time()
+            browser_pool.fill(self.browser, parallel)
+            if parallel > 1:
+                Scheduler(self, parallel).run()
+            else:
+                for case in self.cases:
+                    self.run_case(case)
 
-            try:
-                webdriver.quit()
-            except Exception:
-                pass
+            launches, launch_time, reuses = browser_pool.get_stats()
+            stats = [launches - stats_before[0], launch_time - stats_before[1], reuses - stats_before[2], browser_pool.get_saved_time(stats_before)]
+            Util.info('Browser launches: %s (%ss), reuses: %s, saved about %ss' % (stats[0], round(stats[1], 2), stats[2], round(stats[3], 2)))
+            result_sink.write_suite(self, stats, time.time() - start_time)
+
+    def run_case(self, case, on_acquire=None):
+        prewarm_urls = [case.get_url()] if browser_pool.prewarm else []
+        driver = browser_pool.acquire(self.browser, prewarm_urls)
+        try:
+            browser_info = {
+                'launch': browser_pool.get_launch_time(driver),
+                'renderer': browser_pool.get_renderer(driver),
+                'software_gl': False,
+            }
+            # Results of GPU cases on software GL say nothing about the GPU
+            if not Scheduler.is_cpu_case(case) and is_software_renderer(browser_info['renderer']):
+                if skip_software_gl:
+                    Util.warning('Skip %s, the browser renders with software GL (%s)' % (case.name, browser_info['renderer']))
+                    return
+                Util.warning('%s runs on software GL (%s), its result is flagged' % (case.name, browser_info['renderer']))
+                browser_info['software_gl'] = True
+            if on_acquire:
+                on_acquire(driver)
+            case.run(driver, self, browser_info)
+        finally:
+            browser_pool.release(driver)
 
 class Case():
     FORMAT = [
@@ -121,14 +256,36 @@ class Case():
         self.data = data
         Format.format(self)
 
-    def run(self, driver):
-        name = self.name
-        exec('from benchmark.' + name.lower() + ' import ' + name)
-        benchmark = eval(name)(driver, self)
-        result = benchmark.run()
-        f = open(result_file, 'a+')
-        f.write(result + '\n')
-        f.close()
+    def run(self, driver, suite, browser_info=None):
+        browser_info = browser_info or {}
+        for attempt in range(noise_reruns + 1):
+            benchmark = registry.get_class(self.name)(driver, self)
+            # Background processes, updates or indexing, steal CPU from the case, the browser isn't background
+            monitor = HostNoiseMonitor(noise_thresholds) if noise_thresholds else None
+            if monitor:
+                monitor.start()
+            page_metrics = PageMetrics(driver) if record_page_metrics else None
+            if page_metrics:
+                page_metrics.start()
+            start_time = time.time()
+            try:
+                benchmark.run()
+            finally:
+                if page_metrics:
+                    browser_info['page_metrics'] = page_metrics.stop()
+            noise = monitor.stop() if monitor else None
+            if not noise or not noise['violations']:
+                break
+            if attempt < noise_reruns:
+                Util.warning('%s was noisy (%s), run it again' % (self.name, ', '.join(noise['violations'])))
+            else:
+                Util.warning('%s is flagged as noisy: %s' % (self.name, ', '.join(noise['violations'])))
+        if noise:
+            browser_info['noise'] = noise
+        result_sink.write_case(suite, self, benchmark, driver, time.time() - start_time, browser_info)
+
+    def get_url(self):
+        return registry.get_url(self)
 
 class Format():
     NAME = 0
@@ -136,6 +293,13 @@ class Format():
     TYPE = 2  # A for Array, O for Object, P for Property
     DEFAULT = 3
 
+    # Class of the objects (O) and array elements (A) in config
+    CLASSES = {
+        'browser': Browser,
+        'suites': Suite,
+        'cases': Case,
+    }
+
     @staticmethod
     def format_has_member(format, member):
         for f in format:
@@ -167,10 +331,10 @@ class Format():
             if format_type == 'P':
                 instance.__dict__[format_name] = instance_data
             elif format_type == 'O':
-                instance.__dict__[format_name] = eval(format_name.capitalize())(instance_data)
+                instance.__dict__[format_name] = Format.CLASSES[format_name](instance_data)
             elif format_type == 'A':
                 for element in instance_data:
-                    instance.__dict__[format_name].append(eval(format_name.capitalize()[:-1])(element))
+                    instance.__dict__[format_name].append(Format.CLASSES[format_name](element))
 
         # set default
         for format in instance.FORMAT: